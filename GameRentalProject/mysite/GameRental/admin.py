@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib import admin
-from .models import User, Game, Rental, Review, Payment
+from .models import User, Game, Rental, Review, Payment, MonthlyRentalSummary, Reservation, OutboxTask
 
 class RentalAdminForm(forms.ModelForm):
     class Meta:
@@ -23,15 +23,16 @@ class UserAdmin(admin.ModelAdmin):
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'genre', 'platform', 'release_date', 'is_available')
+    list_display = ('id', 'title', 'genre', 'platform', 'release_date', 'total_copies', 'available_count')
     search_fields = ('title', 'genre', 'platform')
-    list_filter = ('genre', 'platform', 'is_available')
+    list_filter = ('genre', 'platform')
     ordering = ('-release_date',)
 
 @admin.register(Rental)
 class RentalAdmin(admin.ModelAdmin):
     form = RentalAdminForm
     list_display = ('id', 'user', 'game', 'rent_date', 'return_date', 'status')
+    list_select_related = ('user', 'game')
     list_filter = ('status', 'rent_date', 'return_date')
     search_fields = ('user__username', 'game__title')
     ordering = ('-rent_date',)
@@ -39,6 +40,7 @@ class RentalAdmin(admin.ModelAdmin):
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'game', 'rating', 'created_at')
+    list_select_related = ('user', 'game')
     search_fields = ('user__username', 'game__title')
     list_filter = ('rating', 'created_at')
     ordering = ('-created_at',)
@@ -46,6 +48,30 @@ class ReviewAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'rental', 'amount', 'payment_date', 'payment_method')
+    list_select_related = ('user', 'rental__user', 'rental__game')
     search_fields = ('user__username', 'rental__game__title')
     list_filter = ('payment_method', 'payment_date')
     ordering = ('-payment_date',)
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'game', 'status', 'created_at', 'held_until')
+    list_select_related = ('user', 'game')
+    search_fields = ('user__username', 'game__title')
+    list_filter = ('status',)
+    ordering = ('-id',)
+    # Stan rezerwacji zmieniają tylko operacje kolejki - razem z licznikami egzemplarzy gry
+    readonly_fields = ('status', 'held_until')
+
+@admin.register(OutboxTask)
+class OutboxTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'available_at', 'last_error')
+    list_filter = ('status', 'name')
+    ordering = ('available_at', 'id')
+
+@admin.register(MonthlyRentalSummary)
+class MonthlyRentalSummaryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'year', 'month', 'game', 'total')
+    list_select_related = ('game',)
+    list_filter = ('year', 'month')
+    ordering = ('-year', '-month', '-total')
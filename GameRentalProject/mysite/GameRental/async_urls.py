@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import async_views
+
+
+# Trasy odczytu obsługiwane pod ASGI przez widoki asynchroniczne (middleware.ASGIURLConfMiddleware).
+# Stoją przed trasami z urls.py - te same nazwy i adresy, więc reverse() daje ten sam wynik.
+urlpatterns = [
+    path('monthly-orders-summary/', async_views.MonthlyOrdersSummaryView.as_view(), name='monthly-orders-summary'),
+    path('user-rentals/<int:user_id>/', async_views.UserRentals.as_view(), name='user-rentals'),
+    path('games-by-title/<str:letter>/', async_views.GamesByTitle.as_view(), name='games-by-title'),
+    path('games/', async_views.GameList.as_view(), name='game-list'),
+    path('games/<int:pk>/', async_views.GameDetail.as_view(), name='game-detail'),
+]
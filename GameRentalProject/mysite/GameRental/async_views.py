@@ -0,0 +1,194 @@
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import views
+from .authentication import CachedTokenAuthentication
+from .filters import filter_rent_date
+from .metrics import track_view_task
+from .mixins import CatalogCacheMixin, project_queryset, row_serializer, sparse_fieldset
+from .models import Game, Rental, MonthlyRentalSummary
+from .pagination import GamePagination
+from .renderers import MeasuredJSONRenderer
+from .search import games_with_prefix
+from .serializers import GameSerializer, RentalSerializer
+
+
+# Widoki odczytu dla ASGI: uwierzytelnianie, zapytania (async ORM) i renderowanie bez
+# przechodzenia do wątku synchronicznego DRF. Odpowiedzi są bajt w bajt takie same jak
+# z widoków w views.py; pozostałe metody HTTP i przeglądarkowe API obsługują tamte widoki.
+class AsyncReadView(View):
+    sync_view = None
+    staff_only = False
+    authentication = CachedTokenAuthentication()
+    renderer = MeasuredJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Jak APIView - uwierzytelnianie tokenem nie używa CSRF
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        track_view_task()
+        if request.method != 'GET' and request.method != 'HEAD' or self.wants_browsable_api(request):
+            return await self.delegate(request, *args, **kwargs)
+        try:
+            await self.check_permissions(request)
+            response = await self.get(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.handle_exception(request, exc)
+        return self.finalize_response(response)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    def wants_browsable_api(self, request):
+        return 'format' in request.GET or 'text/html' in request.headers.get('Accept', '')
+
+    async def check_permissions(self, request):
+        result = await self.authentication.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+        if self.staff_only and not request.user.is_staff:
+            raise exceptions.PermissionDenied()
+
+    def handle_exception(self, request, exc):
+        # Format obsługi wyjątków DRF: {"detail": ...} albo treść błędu walidacji
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(request, data, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return response
+
+    def render(self, request, data, status_code=status.HTTP_200_OK):
+        content = self.renderer.render(data, self.renderer.media_type, {'request': request})
+        return HttpResponse(content, status=status_code, content_type=self.renderer.media_type)
+
+    def finalize_response(self, response):
+        # Nagłówki, które APIView.finalize_response dodaje do każdej odpowiedzi
+        if len(api_settings.DEFAULT_RENDERER_CLASSES) > 1:
+            patch_vary_headers(response, ['Accept'])
+        response['Allow'] = self.allowed_methods()
+        return response
+
+    def allowed_methods(self):
+        view = self.sync_view.cls(**self.sync_view.initkwargs)
+        for method, action in (getattr(self.sync_view, 'actions', None) or {}).items():
+            setattr(view, method, getattr(view, action))
+        if hasattr(view, 'get') and not hasattr(view, 'head'):
+            view.head = view.get
+        return ', '.join(view.allowed_methods)
+
+
+class MonthlyOrdersSummaryView(AsyncReadView):
+    sync_view = staticmethod(views.MonthlyOrdersSummaryView.as_view())
+    staff_only = True
+    read_replica = True
+
+    async def get(self, request):
+        month = request.GET.get('month', datetime.now().month)
+        year = request.GET.get('year', datetime.now().year)
+
+        try:
+            month = int(month)
+            year = int(year)
+            if not (1 <= month <= 12):
+                raise ValueError("Miesiąc musi być liczbą od 1 do 12.")
+        except ValueError:
+            return self.render(request, {"error": "Nieprawidłowe parametry miesiąca lub roku."},
+                               status.HTTP_400_BAD_REQUEST)
+
+        rentals = MonthlyRentalSummary.objects.filter(
+            year=year, month=month, total__gt=0
+        ).values('game__title').annotate(total_rentals=Sum('total'))
+
+        summary = [{"title": r['game__title'], "total_rentals": r['total_rentals']} async for r in rentals]
+        return self.render(request, summary)
+
+
+class GamesByTitle(CatalogCacheMixin, AsyncReadView):
+    sync_view = staticmethod(views.GamesByTitle.as_view())
+
+    async def get(self, request, letter):
+        return await self.acatalog_response(
+            request, lambda: self.games_by_title(letter), lambda *args: self.render(request, *args),
+        )
+
+    async def games_by_title(self, letter):
+        games = [game async for game in games_with_prefix(letter)]
+        if not games:
+            return {"message": "Brak gier zaczynających się na podaną literę."}, status.HTTP_404_NOT_FOUND
+        return GameSerializer(games, many=True).data, status.HTTP_200_OK
+
+
+class UserRentals(AsyncReadView):
+    sync_view = staticmethod(views.UserRentals.as_view())
+
+    async def get(self, request, user_id):
+        rentals = filter_rent_date(Rental.objects.filter(user_id=user_id), request.GET)
+        rentals = rentals.order_by('-rent_date', '-id')
+        rows = row_serializer(RentalSerializer)
+        if rows is not None:
+            return self.render(request, rows.data([row async for row in rows.queryset(rentals)]))
+        serializer = RentalSerializer([rental async for rental in rentals], many=True)
+        return self.render(request, serializer.data)
+
+
+class GameList(CatalogCacheMixin, AsyncReadView):
+    sync_view = staticmethod(views.GameViewSet.as_view({'get': 'list', 'post': 'create'}))
+    # Sortowanie ?ordering= jak w GameViewSet - paginator bierze kolejność z filtra
+    filter_backends = views.GameViewSet.filter_backends
+    ordering_fields = views.GameViewSet.ordering_fields
+
+    async def get(self, request):
+        return await self.acatalog_response(
+            request, lambda: self.game_page(request), lambda *args: self.render(request, *args),
+        )
+
+    async def game_page(self, request):
+        # Paginator korzysta z query_params i build_absolute_uri żądania DRF
+        request = Request(request)
+        fields, expand = sparse_fieldset(GameSerializer, request.query_params)
+        paginator = GamePagination()
+        ordering = tuple(field.lstrip('-') for field in paginator.get_ordering(request, Game.objects.all(), self))
+        rows = row_serializer(GameSerializer, fields, expand)
+        if rows is None:
+            queryset = project_queryset(Game.objects.all(), GameSerializer, fields, expand, ordering)
+        else:
+            queryset = rows.queryset(Game.objects.all(), ordering)
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        if rows is None:
+            data = GameSerializer(page, many=True, fields=fields, expand=expand).data
+        else:
+            data = rows.data(page)
+        return paginator.get_paginated_response(data).data, status.HTTP_200_OK
+
+
+class GameDetail(CatalogCacheMixin, AsyncReadView):
+    sync_view = staticmethod(views.GameViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+    }))
+
+    async def get(self, request, pk):
+        return await self.acatalog_response(
+            request, lambda: self.game(request, pk), lambda *args: self.render(request, *args),
+        )
+
+    async def game(self, request, pk):
+        fields, expand = sparse_fieldset(GameSerializer, request.GET)
+        try:
+            game = await project_queryset(Game.objects.all(), GameSerializer, fields, expand).aget(pk=pk)
+        except Game.DoesNotExist:
+            # Komunikat jak z get_object_or_404 w GenericAPIView.get_object
+            raise exceptions.NotFound("No %s matches the given query." % Game._meta.object_name)
+        return GameSerializer(game, fields=fields, expand=expand).data, status.HTTP_200_OK
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .cache import LRUCache, acache_get, acache_set
+from .conf import app_setting
+from .passwords import hash_password, verify_password
+
+
+# Cache tokenów: (użytkownik, token) trzymane w LRU procesu z TTL, a opcjonalnie także
+# we współdzielonym backendzie cache Django. Klucz to skrót SHA-256 tokenu, więc
+# same tokeny nigdy nie trafiają do cache.
+_tokens = LRUCache(maxsize=app_setting('TOKEN_CACHE_SIZE'), ttl=app_setting('TOKEN_CACHE_TTL'))
+_shared_stats = {'hits': 0, 'misses': 0}
+_shared_lock = threading.Lock()
+
+
+def token_cache_key(key):
+    return 'GameRental:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    alias = app_setting('TOKEN_CACHE_BACKEND')
+    return caches[alias] if alias else None
+
+
+def _count_shared(outcome):
+    with _shared_lock:
+        _shared_stats[outcome] += 1
+
+
+def invalidate_token(key):
+    cache_key = token_cache_key(key)
+    _tokens.discard(cache_key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(cache_key)
+
+
+def invalidate_user_tokens(user):
+    for key in Token.objects.filter(user=user).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+def token_cache_stats():
+    stats = _tokens.stats()
+    with _shared_lock:
+        stats['shared_hits'] = _shared_stats['hits']
+        stats['shared_misses'] = _shared_stats['misses']
+    return stats
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = _tokens.get(cache_key)
+        if cached is not None:
+            return cached
+
+        shared = _shared_cache()
+        if shared is not None:
+            cached = shared.get(cache_key)
+            _count_shared('misses' if cached is None else 'hits')
+            if cached is not None:
+                _tokens.set(cache_key, cached)
+                return cached
+
+        # Nieprawidłowe i nieaktywne tokeny nie są cache'owane - wyjątek z klasy bazowej
+        user, token = super().authenticate_credentials(key)
+        _tokens.set(cache_key, (user, token))
+        if shared is not None:
+            shared.set(cache_key, (user, token), app_setting('TOKEN_CACHE_TTL'))
+        return user, token
+
+    # Ścieżka dla widoków asynchronicznych - te same kroki co authenticate(), ale token
+    # z bazy i ze współdzielonego cache pobierany bez blokowania pętli zdarzeń
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.'))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = _tokens.get(cache_key)
+        if cached is not None:
+            return cached
+
+        shared = _shared_cache()
+        if shared is not None:
+            cached = await acache_get(shared, cache_key)
+            _count_shared('misses' if cached is None else 'hits')
+            if cached is not None:
+                _tokens.set(cache_key, cached)
+                return cached
+
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        _tokens.set(cache_key, (token.user, token))
+        if shared is not None:
+            await acache_set(shared, cache_key, (token.user, token), app_setting('TOKEN_CACHE_TTL'))
+        return token.user, token
+
+
+# ModelBackend ze sprawdzeniem hasła w puli (AUTHENTICATION_BACKENDS)
+class PooledModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Haszowanie także bez konta - czas odpowiedzi nie zdradza, czy użytkownik istnieje
+            hash_password(password)
+            return None
+        valid, updated = verify_password(password, user.password)
+        if updated:
+            user.password = updated
+            user.save(update_fields=['password'])
+        if valid and self.user_can_authenticate(user):
+            return user
+        return None
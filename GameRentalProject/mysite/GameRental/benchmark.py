@@ -0,0 +1,367 @@
+import json
+import platform
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from itertools import count
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import User, Game, Rental, Review, Payment, Reservation
+from .renderers import MeasuredJSONRenderer, orjson
+from .rows import RowSerializer
+from .serializers import GameSerializer, RentalSerializer, PaymentSerializer
+
+
+# Benchmark API: każda trasa z GameRental/urls.py jest wywoływana N razy (klient testowy
+# Django albo lokalny serwer WSGI), a wynik to percentyle czasu odpowiedzi, liczba zapytań
+# SQL i szczyt alokowanej pamięci na żądanie. Trasy zapisujące działają w transakcji,
+# która jest wycofywana, więc benchmark nie zmienia danych.
+URLCONF = 'GameRental.urls'
+PREFIX = '/GameRental/'
+BENCHMARK_USERNAME = 'benchmark_admin'
+HEAVY_ITERATIONS = 3
+
+
+def route_names(urlconf=URLCONF):
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver(urlconf).url_patterns)
+    return names
+
+
+def percentile(values, fraction):
+    # Percentyl metodą najbliższej rangi
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Sample:
+    # Przykładowe identyfikatory z bieżącej bazy - trasy szczegółów trafiają w istniejące wiersze
+    def __init__(self):
+        rentals = Rental.objects.order_by('-id')
+        self.user = User.objects.order_by('id').first()
+        self.game = Game.objects.order_by('id').first()
+        self.rental = rentals.filter(user=self.user).first() or rentals.first()
+        self.active_rental = rentals.filter(status='wypożyczona').first()
+        self.available_game = Game.objects.filter(available_count__gt=0).order_by('id').first()
+        self.review = Review.objects.order_by('-id').first()
+        self.payment = Payment.objects.order_by('-id').first()
+        self.reservation = Reservation.objects.order_by('-id').first()
+        self.letter = self.game.title[:1] if self.game else 'a'
+
+    def pk(self, name):
+        obj = getattr(self, name)
+        return obj.pk if obj is not None else 0
+
+
+Scenario = namedtuple('Scenario', 'name method path data heavy writes', defaults=(None, False, False))
+
+
+def _register_payload(serial):
+    n = next(serial)
+    return {'username': f'bench{n}', 'email': f'bench{n}@example.com', 'password': 'benchmark'}
+
+
+def scenarios(sample):
+    serial = count()
+    user_pk, game_pk = sample.pk('user'), sample.pk('game')
+    checkout_game = sample.available_game.pk if sample.available_game else game_pk
+    # heavy - haszowanie hasła lub pełny eksport, mniej iteracji; writes - zmienia dane
+    return [
+        Scenario('api-root', 'get', ''),
+        Scenario('monthly-orders-summary', 'get', 'monthly-orders-summary/'),
+        Scenario('register', 'post', 'register/', lambda: _register_payload(serial), heavy=True, writes=True),
+        Scenario('login', 'post', 'login/', {'username': BENCHMARK_USERNAME, 'password': 'benchmark'}, heavy=True),
+        Scenario('user-rentals', 'get', f'user-rentals/{user_pk}/'),
+        Scenario('games-by-title', 'get', f'games-by-title/{sample.letter}/'),
+        Scenario('games-search', 'get', f'games-search/?q={sample.letter}'),
+        Scenario('user-list', 'get', 'users/'),
+        Scenario('user-detail', 'get', f'users/{user_pk}/'),
+        Scenario('game-list', 'get', 'games/'),
+        Scenario('game-detail', 'get', f'games/{game_pk}/'),
+        Scenario('rental-list', 'get', 'rentals/'),
+        Scenario('rental-detail', 'get', f'rentals/{sample.pk("rental")}/'),
+        Scenario('rental-export', 'get', 'rentals/export/', heavy=True),
+        Scenario('rental-bulk-checkout', 'post', 'rentals/bulk-checkout/',
+                 {'items': [{'user': user_pk, 'game': checkout_game}]}, writes=True),
+        Scenario('rental-bulk-return', 'post', 'rentals/bulk-return/',
+                 {'ids': [sample.pk('active_rental')]}, writes=True),
+        Scenario('review-list', 'get', 'reviews/'),
+        Scenario('review-detail', 'get', f'reviews/{sample.pk("review")}/'),
+        Scenario('payment-list', 'get', 'payments/'),
+        Scenario('payment-detail', 'get', f'payments/{sample.pk("payment")}/'),
+        Scenario('payment-export', 'get', 'payments/export/', heavy=True),
+        Scenario('reservation-list', 'get', 'reservations/'),
+        Scenario('reservation-detail', 'get', f'reservations/{sample.pk("reservation")}/'),
+        Scenario('leaderboard', 'get', 'leaderboard/'),
+        Scenario('metrics', 'get', 'metrics/'),
+    ]
+
+
+def benchmark_token():
+    auth_user, created = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME, defaults={'is_staff': True},
+    )
+    if created:
+        auth_user.set_password('benchmark')
+        auth_user.save()
+    return Token.objects.get_or_create(user=auth_user)[0].key
+
+
+def _allowed_host():
+    # Przy DEBUG i pustym ALLOWED_HOSTS Django przyjmuje localhost
+    host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    return host.lstrip('.')
+
+
+class TestClientTransport:
+    name = 'client'
+    can_rollback = True
+    queries = 0
+
+    def __init__(self, token):
+        self.client = Client(HTTP_HOST=_allowed_host(), HTTP_AUTHORIZATION=f'Token {token}')
+
+    def request(self, method, path, data):
+        kwargs = {'data': json.dumps(data), 'content_type': 'application/json'} if data is not None else {}
+        response = getattr(self.client, method)(PREFIX + path, **kwargs)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(body)
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WSGIServerTransport:
+    # Prawdziwe żądania HTTP do serwera wsgiref w wątku; zapytania SQL liczone po stronie serwera
+    name = 'wsgi'
+    can_rollback = False
+
+    def __init__(self, token):
+        self.token = token
+        self.queries = 0
+        handler = WSGIHandler()
+
+        def app(environ, start_response):
+            with connection.execute_wrapper(self.count_query):
+                return list(handler(environ, start_response))
+
+        self.server = make_server('127.0.0.1', 0, app, handler_class=_QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, method, path, data):
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base + PREFIX + path, data=body, method=method.upper(), headers={
+            'Authorization': f'Token {self.token}', 'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read())
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Benchmark:
+    def __init__(self, iterations=50, warmup=3, transport='client', routes=None, track_allocations=True):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.transport_name = transport
+        self.routes = set(routes) if routes else None
+        self.track_allocations = track_allocations
+
+    def run(self):
+        token = benchmark_token()
+        transport = (WSGIServerTransport if self.transport_name == 'wsgi' else TestClientTransport)(token)
+        results, skipped = {}, []
+        try:
+            for scenario in scenarios(Sample()):
+                if self.routes is not None and scenario.name not in self.routes:
+                    continue
+                if scenario.writes and not transport.can_rollback:
+                    # Serwer WSGI ma własne połączenie - zapisów nie da się tu wycofać
+                    skipped.append(scenario.name)
+                    continue
+                results[scenario.name] = self.measure(transport, scenario)
+        finally:
+            transport.close()
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'transport': transport.name,
+                'iterations': self.iterations,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'rows': {model._meta.label: model.objects.count() for model in (User, Game, Rental, Review, Payment)},
+                'skipped': skipped,
+            },
+            'results': results,
+        }
+
+    def call(self, transport, scenario):
+        method, path, data = scenario.method, scenario.path, scenario.data
+        payload = data() if callable(data) else data
+        if not scenario.writes:
+            return transport.request(method, path, payload)
+        # Zapisy wycofywane - kolejne iteracje widzą te same dane
+        with transaction.atomic():
+            response = transport.request(method, path, payload)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, transport, scenario):
+        iterations = min(self.iterations, HEAVY_ITERATIONS) if scenario.heavy else self.iterations
+        for _ in range(self.warmup):
+            self.call(transport, scenario)
+
+        latencies, queries, statuses, size = [], [], set(), 0
+        for _ in range(iterations):
+            transport.queries = 0
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                status_code, size = self.call(transport, scenario)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(transport.queries if transport.name == 'wsgi' else len(ctx.captured_queries))
+            statuses.add(status_code)
+
+        peak_kib = None
+        if self.track_allocations and transport.name == 'client':
+            # Osobny przebieg - tracemalloc spowalnia wykonanie i zafałszowałby czasy
+            tracemalloc.start()
+            self.call(transport, scenario)
+            peak_kib = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+
+        return {
+            'method': scenario.method.upper(),
+            'path': PREFIX + scenario.path,
+            'status': sorted(statuses),
+            'iterations': iterations,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'queries': round(sum(queries) / len(queries), 2),
+            'peak_kib': peak_kib,
+            'response_bytes': size,
+        }
+
+
+def compare(current, baseline, tolerance=0.2):
+    # Regresja: p95 wolniejszy o więcej niż tolerancja albo więcej zapytań niż w bazowym pomiarze
+    rows, regressions = [], []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            rows.append((name, result, None, []))
+            continue
+        problems = []
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            problems.append(f"p95 {base['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if result['queries'] > base['queries']:
+            problems.append(f"zapytania {base['queries']} -> {result['queries']}")
+        if problems:
+            regressions.append(name)
+        rows.append((name, result, base, problems))
+    return rows, regressions
+
+
+# Mikrobenchmark serializacji list: ModelSerializer(many=True) na obiektach modeli kontra
+# RowSerializer na krotkach z values_list, ten sam JSONRenderer (i orjson, jeśli jest).
+# Gdy w bazie jest mniej wierszy niż `rows`, pobrane wiersze są powielane - mierzony czas
+# pobrania dotyczy tylko wierszy z bazy, czas serializacji zawsze `rows` wierszy.
+SERIALIZER_BENCHMARKS = {
+    'games': GameSerializer,
+    'rentals': RentalSerializer,
+    'payments': PaymentSerializer,
+}
+
+
+def _repeat_to(items, size):
+    if not items:
+        return items
+    return (items * (size // len(items) + 1))[:size]
+
+
+def _best_time(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2), result
+
+
+def serialization_benchmark(kinds=None, rows=10000, repeat=5):
+    renderer = MeasuredJSONRenderer()
+    results = {}
+    for kind in kinds or SERIALIZER_BENCHMARKS:
+        serializer_class = SERIALIZER_BENCHMARKS[kind]
+        fast = RowSerializer.for_serializer(serializer_class)
+        queryset = serializer_class.Meta.model.objects.order_by('id')[:rows]
+
+        fetch_objects_ms, objects = _best_time(lambda: list(queryset.all()), repeat)
+        fetch_rows_ms, values = _best_time(lambda: list(fast.queryset(queryset)), repeat)
+        objects, values = _repeat_to(objects, rows), _repeat_to(values, rows)
+
+        modes = {
+            'serializer': lambda: renderer.render(serializer_class(objects, many=True).data),
+            'rows': lambda: renderer.render(fast.data(values)),
+        }
+        if orjson is not None:
+            modes['rows+orjson'] = lambda: renderer.render_orjson(fast.data(values))
+        timings, outputs = {}, {}
+        for mode, function in modes.items():
+            timings[mode], outputs[mode] = _best_time(function, repeat)
+        baseline = timings['serializer']
+        results[kind] = {
+            'rows': len(values),
+            'db_rows': queryset.count(),
+            'fetch_ms': {'objects': fetch_objects_ms, 'rows': fetch_rows_ms},
+            'serialize_ms': timings,
+            'speedup': {mode: round(baseline / elapsed, 2) if elapsed else None for mode, elapsed in timings.items()},
+            'identical': all(output == outputs['serializer'] for output in outputs.values()),
+        }
+    return {
+        'meta': {'rows': rows, 'repeat': repeat, 'orjson': orjson is not None, 'python': platform.python_version()},
+        'results': results,
+    }
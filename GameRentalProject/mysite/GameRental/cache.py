@@ -0,0 +1,89 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.core.cache.backends.locmem import LocMemCache
+
+
+_caches = weakref.WeakSet()
+
+
+def clear_caches():
+    for cache in list(_caches):
+        cache.clear()
+
+
+# Wątkowo bezpieczny cache LRU z opcjonalnym TTL (w sekundach) i licznikami trafień
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = self.timer() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_if(self, predicate):
+        with self._lock:
+            for key in [k for k, (value, _) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Odczyt i zapis cache Django z kodu asynchronicznego. Backend w pamięci procesu nie
+# blokuje, więc jest wołany bezpośrednio - domyślne aget/aset przechodzą przez wątek.
+def _is_local(cache):
+    return isinstance(cache, LocMemCache)
+
+
+async def acache_get(cache, key, default=None):
+    if _is_local(cache):
+        return cache.get(key, default)
+    return await cache.aget(key, default)
+
+
+async def acache_set(cache, key, value, timeout):
+    if _is_local(cache):
+        cache.set(key, value, timeout)
+    else:
+        await cache.aset(key, value, timeout)
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+from .benchmark import PREFIX, Sample, _allowed_host, benchmark_token, percentile, scenarios
+
+
+# Współbieżność przy wolnych klientach: N klientów wysyła po R żądań, a każdy z nich
+# przez `delay` sekund wysyła żądanie i tyle samo odbiera odpowiedź. Pod WSGI ten czas
+# zajmuje jeden z W wątków roboczych, pod ASGI tylko czeka pętla zdarzeń. Aplikacje
+# Django są wywoływane w procesie (bez serwera HTTP), więc mierzony jest sam model obsługi.
+class SlowClientBenchmark:
+    def __init__(self, route='game-list', clients=50, requests=5, delay=0.05, workers=8):
+        paths = {scenario.name: scenario.path for scenario in scenarios(Sample())
+                 if scenario.method == 'get' and not scenario.writes}
+        if route not in paths:
+            raise ValueError(f"Nieznana trasa odczytu: {route}")
+        self.route = route
+        self.path = PREFIX + paths[route]
+        self.clients = clients
+        self.requests = requests
+        self.delay = delay
+        self.workers = workers
+        self.token = benchmark_token()
+        self.host = _allowed_host()
+
+    def run(self, modes=('asgi', 'wsgi')):
+        return {
+            'meta': {'route': self.route, 'path': self.path, 'clients': self.clients, 'requests': self.requests,
+                     'delay_ms': self.delay * 1000, 'wsgi_workers': self.workers},
+            'results': {mode: getattr(self, f'run_{mode}')() for mode in modes},
+        }
+
+    def summary(self, latencies, statuses, elapsed):
+        return {
+            'requests': len(latencies),
+            'status': sorted(set(statuses)),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'elapsed_s': round(elapsed, 3),
+        }
+
+    def run_asgi(self):
+        # Pętla zdarzeń w osobnym wątku, jak w serwerze ASGI - bez kontekstu wywołującego
+        with ThreadPoolExecutor(1) as loop_thread:
+            return loop_thread.submit(asyncio.run, self.asgi_clients()).result()
+
+    async def asgi_clients(self):
+        application = ASGIHandler()
+        latencies, statuses = [], []
+        path, _, query = self.path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', self.host.encode()), (b'authorization', f'Token {self.token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+
+        async def receive():
+            await asyncio.sleep(self.delay)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def client():
+            for _ in range(self.requests):
+                started = time.perf_counter()
+                response = {}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        response['status'] = message['status']
+                    elif not message.get('more_body'):
+                        await asyncio.sleep(self.delay)
+
+                await application(dict(scope), receive, send)
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.get('status'))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(self.clients)))
+        return self.summary(latencies, statuses, time.perf_counter() - started)
+
+    def run_wsgi(self):
+        application = WSGIHandler()
+        path, _, query = self.path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': self.host,
+            'HTTP_AUTHORIZATION': f'Token {self.token}', 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(),
+            'wsgi.errors': BytesIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        lock = threading.Lock()
+        latencies, statuses = [], []
+
+        def handle(submitted):
+            # Wątek jest zajęty przez cały czas wysyłania żądania i odbierania odpowiedzi
+            time.sleep(self.delay)
+            response = {}
+
+            def start_response(status, headers, exc_info=None):
+                response['status'] = int(status.split()[0])
+
+            body = application(dict(environ, **{'wsgi.input': BytesIO()}), start_response)
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            time.sleep(self.delay)
+            with lock:
+                latencies.append(time.perf_counter() - submitted)
+                statuses.append(response.get('status'))
+
+        def client(pool):
+            for _ in range(self.requests):
+                pool.submit(handle, time.perf_counter()).result()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as pool:
+            clients = [threading.Thread(target=client, args=(pool,)) for _ in range(self.clients)]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+        return self.summary(latencies, statuses, time.perf_counter() - started)
@@ -0,0 +1,63 @@
+from django.conf import settings
+
+
+# Domyślne ustawienia aplikacji, nadpisywane przez słownik GAME_RENTAL w settings.py
+DEFAULTS = {
+    'DOMAIN_USER_CACHE_SIZE': 10000,
+    # Unieważnienie obejmuje tylko bieżący proces - TTL ogranicza czas, przez jaki inne
+    # procesy serwera widzą zmienionego lub dezaktywowanego użytkownika
+    'DOMAIN_USER_CACHE_TTL': 60,
+    'TOKEN_CACHE_SIZE': 10000,
+    'TOKEN_CACHE_TTL': 300,
+    'TOKEN_CACHE_BACKEND': None,
+    'CATALOG_CACHE_BACKEND': 'default',
+    'CATALOG_CACHE_TTL': 600,
+    'BULK_MAX_ITEMS': 500,
+    'EXPORT_CHUNK_SIZE': 2000,
+    # URLconf dla żądań pod ASGI (widoki asynchroniczne odczytu); None - te same trasy co pod WSGI
+    'ASGI_URLCONF': None,
+    'METRICS_ENABLED': True,
+    'SLOW_QUERY_THRESHOLD_MS': 200,
+    'SLOW_QUERY_SAMPLE_RATE': 0.1,
+    'SLOW_QUERY_STACK_DEPTH': 8,
+    'SQLITE_PRAGMAS': {},
+    # Listy z values_list i skompilowanych pól serializera zamiast obiektów modeli
+    'FAST_LIST_SERIALIZATION': True,
+    # Kodowanie JSON przez orjson, jeśli jest zainstalowany
+    'FAST_JSON_RENDERER': False,
+    # Okna rankingu: nazwa -> okres półtrwania wyniku w godzinach
+    'LEADERBOARD_WINDOWS': {'trending': 24, 'week': 168, 'month': 720},
+    'LEADERBOARD_CACHE_SIZE': 100,
+    'LEADERBOARD_CACHE_TTL': 30,
+    'LEADERBOARD_MIN_SCORE': 0.01,
+    # Czas (w sekundach) na odbiór egzemplarza odłożonego dla pierwszego w kolejce
+    'RESERVATION_HOLD_TTL': 24 * 3600,
+    'RESERVATION_SWEEP_BATCH': 500,
+    # Kolejka zadań: wątki wykonujące zadania w procesie serwera zaraz po zatwierdzeniu
+    # transakcji (0 - tylko polecenie outbox_worker, które musi wtedy działać), dzierżawa
+    # i ponowienia. mysite/settings.py włącza wątki w profilu dev.
+    'OUTBOX_LOCAL_WORKERS': 0,
+    'OUTBOX_WORKER_THREADS': 4,
+    'OUTBOX_BATCH_SIZE': 100,
+    'OUTBOX_LEASE_SECONDS': 300,
+    'OUTBOX_RETRY_DELAY': 10,
+    'OUTBOX_MAX_ATTEMPTS': 8,
+    # Haszowanie haseł w puli procesów (0 - w wątku żądania) i limit zadań oczekujących,
+    # po którego przekroczeniu rejestracja i logowanie zwracają 503
+    'PASSWORD_HASH_WORKERS': 2,
+    'PASSWORD_HASH_QUEUE': 32,
+    # Limity prób logowania: zakres -> (maksymalna seria, prób na minutę)
+    'LOGIN_RATE_LIMITS': {'ip': (30, 30), 'username': (10, 10)},
+    'LOGIN_RATE_CACHE_SIZE': 10000,
+    # Alias bazy-repliki do odczytów (None - wszystko z bazy głównej), dopuszczalne opóźnienie
+    # repliki w sekundach, co ile sekund je sprawdzać i jak często (najwyżej) zapisywać znacznik
+    # zapisów, z którego jest liczone na SQLite
+    'REPLICA_DATABASE': None,
+    'REPLICA_LAG_TOLERANCE': 5,
+    'REPLICA_LAG_CHECK_INTERVAL': 1,
+    'REPLICA_HEARTBEAT_INTERVAL': 1,
+}
+
+
+def app_setting(name):
+    return getattr(settings, 'GAME_RENTAL', {}).get(name, DEFAULTS[name])
@@ -0,0 +1,148 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import clear_caches
+from .fixtures import refresh_derived_data
+from .models import User, Game, Rental, Review, Payment, MonthlyRentalSummary, Reservation
+from .services import ACTIVE, RETURNED
+
+
+# Generator syntetycznych danych do testów wydajności. Popularność gier ma rozkład
+# Zipfa (waga gry o randze k to 1 / k^skew), więc kilka tytułów dostaje większość
+# wypożyczeń i recenzji - jak w prawdziwej wypożyczalni. Wiersze powstają
+# generatorami i trafiają do bazy paczkami bulk_create.
+GENRES = ('Akcja', 'RPG', 'Strategia', 'Przygodowa', 'Strzelanka', 'Wyścigi', 'Sportowa', 'Logiczna')
+PLATFORMS = ('PC', 'PlayStation 5', 'Xbox Series X', 'Nintendo Switch')
+TITLE_WORDS = ('Ostatnia', 'Przygoda', 'Kosmiczni', 'Najeźdźcy', 'Zagadki', 'Wschodu', 'Galaktyczna', 'Misja',
+               'Mroczne', 'Królestwo', 'Legenda', 'Smoka', 'Cienie', 'Miasta', 'Wyprawa', 'Północ')
+PAYMENT_METHODS = ('karta', 'przelew', 'BLIK', 'gotówka')
+RATING_WEIGHTS = (1, 1, 3, 6, 5)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class DatasetGenerator:
+    def __init__(self, users=1000, games=200, rentals_per_user=10, reviews=2000, payment_ratio=0.8,
+                 active_ratio=0.1, waitlist=2, skew=1.1, days=365, seed=0, batch_size=5000, prefix='synthetic'):
+        self.users = users
+        self.games = games
+        self.rentals_per_user = rentals_per_user
+        self.reviews = reviews
+        self.payment_ratio = payment_ratio
+        self.active_ratio = active_ratio
+        self.waitlist = waitlist
+        self.skew = skew
+        self.days = days
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.counts = {}
+
+    def generate(self):
+        with transaction.atomic():
+            user_ids = self.create(User, self.user_rows())
+            game_ids = self.create(Game, self.game_rows())
+            self.game_weights = list(accumulate(1 / rank ** self.skew for rank in range(1, len(game_ids) + 1)))
+            self.create(Rental, self.rental_rows(user_ids, game_ids))
+            self.create(Reservation, self.reservation_rows(user_ids))
+            self.create(Review, self.review_rows(user_ids, game_ids))
+            self.create(Payment, self.payment_rows(user_ids))
+            refresh_derived_data()
+        clear_caches()
+        return self.counts
+
+    def create(self, model, rows):
+        count = 0
+        for batch in _batched(rows, self.batch_size):
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            count += len(batch)
+        self.counts[model._meta.label] = count
+        # Identyfikatory z bazy - nie każdy backend zwraca je z bulk_create
+        return list(model.objects.order_by('-id').values_list('id', flat=True)[:count])[::-1]
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.random.randrange(self.days * 86400))
+
+    def pick_game(self, game_ids):
+        return self.random.choices(game_ids, cum_weights=self.game_weights)[0]
+
+    def user_rows(self):
+        start = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        # Jeden skrót hasła dla wszystkich kont - haszowanie to najdroższa część rejestracji
+        password = make_password('benchmark')
+        for n in range(start, start + self.users):
+            yield User(username=f'{self.prefix}{n}', email=f'{self.prefix}{n}@example.com', password=password,
+                       date_joined=self.random_date())
+
+    def game_rows(self):
+        for n in range(self.games):
+            title = ' '.join(self.random.sample(TITLE_WORDS, 2)) + f' {n}'
+            yield Game(title=title, title_normalized=Game.normalize_title(title),
+                       genre=self.random.choice(GENRES), platform=self.random.choice(PLATFORMS),
+                       release_date=(self.now - timedelta(days=self.random.randrange(20 * 365))).date())
+
+    def rental_rows(self, user_ids, game_ids):
+        for user_id in user_ids:
+            count = round(self.random.expovariate(1 / self.rentals_per_user)) if self.rentals_per_user else 0
+            for _ in range(count):
+                rent_date = self.random_date()
+                return_date = min(rent_date + timedelta(days=self.random.randint(1, 21)), self.now)
+                yield Rental(user_id=user_id, game_id=self.pick_game(game_ids), rent_date=rent_date,
+                             return_date=return_date, status=RETURNED)
+
+        # Część gier jest aktualnie wypożyczona - po jednym aktywnym wypożyczeniu na grę;
+        # liczniki egzemplarzy przelicza rebuild_inventory
+        active = self.random.sample(game_ids, int(len(game_ids) * self.active_ratio)) if user_ids else []
+        self.active_games = active
+        for game_id in active:
+            yield Rental(user_id=self.random.choice(user_ids), game_id=game_id,
+                         rent_date=self.now - timedelta(days=self.random.randint(0, 14)), status=ACTIVE)
+
+    def reservation_rows(self, user_ids):
+        # Kolejki oczekujących na wypożyczone gry
+        for game_id in self.active_games:
+            for user_id in self.random.sample(user_ids, min(self.waitlist, len(user_ids))):
+                yield Reservation(user_id=user_id, game_id=game_id, created_at=self.now)
+
+    def review_rows(self, user_ids, game_ids):
+        if not user_ids or not game_ids:
+            return
+        for _ in range(self.reviews):
+            yield Review(user_id=self.random.choice(user_ids), game_id=self.pick_game(game_ids),
+                         rating=self.random.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                         comment=self.random.choice(('Polecam', 'Średnia', 'Świetna gra', None)),
+                         created_at=self.random_date())
+
+    def payment_rows(self, user_ids):
+        rentals = (
+            Rental.objects.filter(user_id__gte=user_ids[0], user_id__lte=user_ids[-1])
+            .values_list('id', 'user_id', 'rent_date')
+            .iterator(chunk_size=self.batch_size)
+        ) if user_ids else ()
+        for rental_id, user_id, rent_date in rentals:
+            if self.random.random() < self.payment_ratio:
+                yield Payment(user_id=user_id, rental_id=rental_id, payment_date=rent_date,
+                              amount=Decimal(self.random.randrange(500, 6000)) / 100,
+                              payment_method=self.random.choice(PAYMENT_METHODS))
+
+
+def clear_dataset():
+    # Jak polecenie flush - bez ładowania obiektów i sygnałów przy usuwaniu
+    tables = [model._meta.db_table for model in (Payment, Review, Reservation, Rental, MonthlyRentalSummary, Game, User)]
+    connection.ops.execute_sql_flush(
+        connection.ops.sql_flush(no_style(), tables, reset_sequences=True, allow_cascade=True)
+    )
+    refresh_derived_data()
+    clear_caches()
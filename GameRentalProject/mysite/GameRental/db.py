@@ -0,0 +1,15 @@
+from .conf import app_setting
+
+
+# Pragmy SQLite z ustawienia SQLITE_PRAGMAS, wykonywane przy otwarciu połączenia
+def apply_sqlite_pragmas(connection):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = app_setting('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not name.isidentifier() or not str(value).lstrip('-').isalnum():
+                raise ValueError(f"Nieprawidłowa pragma SQLite: {name}={value}")
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import ValidationError
+
+from .conf import app_setting
+from .filters import filter_rent_date
+from .models import Rental, Payment
+
+
+# Eksport pełnej historii wypożyczeń i płatności w CSV lub NDJSON.
+# Wiersze są czytane krotkami (values_list) porcjami z kursora bazy i zapisywane
+# na bieżąco, więc zużycie pamięci nie zależy od liczby wierszy.
+EXPORTS = {
+    'rentals': {
+        'model': Rental,
+        'date_field': 'rent_date',
+        'ordering': ('rent_date', 'id'),
+        'columns': ('id', 'user_id', 'game_id', 'game__title', 'rent_date', 'return_date', 'status'),
+    },
+    'payments': {
+        'model': Payment,
+        'date_field': 'payment_date',
+        'ordering': ('payment_date', 'id'),
+        'columns': ('id', 'user_id', 'rental_id', 'amount', 'payment_date', 'payment_method'),
+    },
+}
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_queryset(kind, params, queryset=None):
+    export = EXPORTS[kind]
+    if queryset is None:
+        queryset = export['model'].objects.all()
+    queryset = filter_rent_date(queryset, params, export['date_field'])
+    if params.get('user'):
+        try:
+            queryset = queryset.filter(user_id=int(params['user']))
+        except ValueError:
+            raise ValidationError({"error": "Nieprawidłowy identyfikator użytkownika."})
+    return queryset.order_by(*export['ordering']).values_list(*export['columns'])
+
+
+class _Echo:
+    # csv.writer zapisuje do "pliku", który po prostu zwraca zapisany tekst
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def export_chunks(kind, queryset, output_format, chunk_size=None):
+    chunk_size = chunk_size or app_setting('EXPORT_CHUNK_SIZE')
+    columns = EXPORTS[kind]['columns']
+    rows = queryset.iterator(chunk_size=chunk_size)
+    lines = csv_lines(columns, rows) if output_format == 'csv' else ndjson_lines(columns, rows)
+
+    # Łączenie linii w większe bloki - mniej zapisów do gniazda/pliku
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,74 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+# Filtrowanie po dacie wypożyczenia przedziałami półotwartymi [od, do).
+# Porównanie samej kolumny (zamiast rent_date__year/__month, które opakowują ją
+# w funkcję) pozwala bazie użyć indeksu na Rent_date.
+def _aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return _aware(start), _aware(end)
+
+
+def year_range(year):
+    return _aware(datetime(year, 1, 1)), _aware(datetime(year + 1, 1, 1))
+
+
+def _parse_bound(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, time.min)
+    return _aware(parsed)
+
+
+def rent_date_range(params):
+    try:
+        if 'year' in params:
+            year = int(params['year'])
+            if 'month' in params:
+                month = int(params['month'])
+                if not (1 <= month <= 12):
+                    raise ValueError(month)
+                return month_range(year, month)
+            return year_range(year)
+        start = _parse_bound(params['from']) if params.get('from') else None
+        end = _parse_bound(params['to']) if params.get('to') else None
+    except ValueError:
+        raise ValidationError({"error": "Nieprawidłowy zakres dat."})
+    return start, end
+
+
+def filter_rent_date(queryset, params, field='rent_date'):
+    start, end = rent_date_range(params)
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+class RentDateRangeFilter(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return filter_rent_date(queryset, request.query_params)
+
+
+# Sortowanie ?ordering= z kluczem głównym na końcu - remisy (np. ta sama średnia ocen)
+# mają stałą kolejność, więc stronicowanie kursorowe nie gubi ani nie powtarza wierszy
+class StableOrderingFilter(OrderingFilter):
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering = [*ordering, '-id' if ordering[0].startswith('-') else 'id']
+        return ordering
@@ -0,0 +1,301 @@
+import codecs
+import json
+import time
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from .cache import clear_caches
+from .inventory import rebuild_inventory
+from .leaderboard import rebuild_leaderboard
+from .models import User, Game, Rental, Review, Payment
+from .ratings import rebuild_game_ratings
+from .rollups import rebuild_monthly_summary
+from .search import rebuild_search_index
+from .users import link_auth_users
+from .versioning import GAME_CATALOG, bump_version
+
+
+# Szybkie ładowanie zrzutów w formacie dumpdata (data.json). Plik jest czytany
+# przyrostowo - w pamięci są tylko bieżący fragment tekstu i bufory po jednej
+# paczce na model - a modele wypożyczalni trafiają do bazy przez bulk_create
+# w kolejności zależności. Pozostałe modele (auth, admin...) idą ścieżką loaddata.
+# Typy zawartości i uprawnienia tworzą już migracje - wiersze ze zrzutu są dopasowywane
+# do istniejących po kluczu naturalnym, a odwołania do nich przepisywane na nowe klucze.
+LOAD_ORDER = (User, Game, Rental, Review, Payment)
+DEPENDENCIES = {
+    User: (),
+    Game: (),
+    Rental: (User, Game),
+    Review: (User, Game),
+    Payment: (User, Rental),
+}
+# Tabele wyliczane - po załadowaniu odbudowywane z danych źródłowych
+DERIVED_MODELS = {'gamerental.monthlyrentalsummary', 'gamerental.tableversion', 'gamerental.leaderboardscore',
+                  'gamerental.leaderboardepoch'}
+
+
+def refresh_derived_data(using='default'):
+    # bulk_create nie wysyła sygnałów - pochodne struktury odbudowujemy jednorazowo
+    link_auth_users(using)
+    rebuild_monthly_summary(using=using)
+    rebuild_game_ratings(using=using)
+    rebuild_inventory(using=using)
+    rebuild_leaderboard(using=using)
+    rebuild_search_index(using)
+    bump_version(GAME_CATALOG, using=using)
+
+
+def open_fixture(path):
+    # Kodowanie z BOM-u: zrzuty z Windows (PowerShell) są w UTF-16
+    with open(path, 'rb') as raw:
+        head = raw.read(4)
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    elif head.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    elif len(head) >= 2 and head[1] == 0:
+        encoding = 'utf-16-le'
+    elif len(head) >= 2 and head[0] == 0:
+        encoding = 'utf-16-be'
+    else:
+        encoding = 'utf-8'
+    return open(path, encoding=encoding, newline='')
+
+
+def iter_json_array(stream, read_size=1 << 20):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip(' \t\r\n')
+    if buffer[pos:pos + 1] != '[':
+        raise ValueError("Plik nie zawiera tablicy JSON.")
+    pos += 1
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buffer):
+            raise ValueError("Niekompletny plik JSON.")
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        pos = end
+        yield item
+
+
+# Pola usunięte z modeli, które mogą jeszcze występować w starszych zrzutach
+LEGACY_FIELDS = {
+    Game: {'is_available'},
+}
+
+
+class _ModelBuilder:
+    # Zamiana {"pk": ..., "fields": {...}} na instancję; konwertery pól przygotowane raz na model
+    def __init__(self, model):
+        self.model = model
+        self.fields = {name: None for name in LEGACY_FIELDS.get(model, ())}
+        for field in model._meta.concrete_fields:
+            self.fields[field.name] = (field.attname, field.to_python)
+
+    def build(self, pk, values):
+        kwargs = {}
+        for name, value in values.items():
+            try:
+                converter = self.fields[name]
+            except KeyError:
+                raise FieldDoesNotExist(f"{self.model._meta.label} nie ma pola {name}")
+            if converter is None:
+                continue
+            attname, to_python = converter
+            kwargs[attname] = None if value is None else to_python(value)
+        instance = self.model(pk=pk, **kwargs)
+        if self.model is Game:
+            # Wypożyczone egzemplarze przelicza rebuild_inventory po załadowaniu wypożyczeń
+            instance.title_normalized = Game.normalize_title(instance.title)
+            instance.available_count = instance.total_copies - instance.rented_count - instance.reserved_count
+        return instance
+
+
+class BulkLoader:
+    using = 'default'
+
+    def __init__(self, batch_size=5000, ignore_conflicts=False, exclude=(), defer_indexes=True,
+                 timer=time.perf_counter):
+        self.batch_size = batch_size
+        self.ignore_conflicts = ignore_conflicts
+        self.exclude = {label.lower() for label in exclude}
+        self.defer_indexes = defer_indexes
+        self.timer = timer
+        self.builders = {model: _ModelBuilder(model) for model in LOAD_ORDER}
+        self.buffers = defaultdict(list)
+        self.counts = Counter()
+        self.insert_time = Counter()
+        self.other_objects = 0
+        self.others = []
+        self.remapped = {ContentType: {}, Permission: {}}
+        self.tables = {model._meta.db_table for model in LOAD_ORDER}
+
+    def is_excluded(self, label):
+        app_label = label.split('.')[0]
+        return label in self.exclude or app_label in self.exclude
+
+    def load(self, path):
+        connection = connections[self.using]
+        started = self.timer()
+        with transaction.atomic(using=self.using):
+            with connection.constraint_checks_disabled():
+                dropped = self.drop_indexes() if self.defer_indexes else []
+                with open_fixture(path) as stream:
+                    for item in iter_json_array(stream):
+                        self.add(item)
+                for model in LOAD_ORDER:
+                    self.flush(model)
+                self.load_others()
+                self.restore_indexes(dropped)
+            connection.check_constraints(table_names=sorted(self.tables))
+            self.reset_sequences()
+            refresh_derived_data(self.using)
+        clear_caches()
+        return self.timer() - started
+
+    def add(self, item):
+        label = item['model'].lower()
+        if label in DERIVED_MODELS or self.is_excluded(label):
+            return
+        model = apps.get_model(item['model'])
+        if model not in self.builders:
+            # Modele spoza wypożyczalni są małe - zapisywane po przeczytaniu całego pliku,
+            # gdy znane są już wszystkie typy zawartości i uprawnienia
+            self.others.append((model, item))
+            return
+        buffer = self.buffers[model]
+        buffer.append(self.builders[model].build(item.get('pk'), item.get('fields', {})))
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        # Najpierw wiersze, do których odwołuje się ta paczka
+        for dependency in DEPENDENCIES[model]:
+            if self.buffers[dependency]:
+                self.flush(dependency)
+        rows = self.buffers.pop(model, None)
+        if not rows:
+            return
+        started = self.timer()
+        model.objects.using(self.using).bulk_create(rows, batch_size=self.batch_size,
+                                                    ignore_conflicts=self.ignore_conflicts)
+        self.insert_time[model] += self.timer() - started
+        self.counts[model] += len(rows)
+
+    def load_others(self):
+        others, self.others = self.others, []
+        for model, item in others:
+            if model is ContentType:
+                self.match(item, ContentType, {'app_label': item['fields']['app_label'],
+                                               'model': item['fields']['model']})
+        for model, item in others:
+            if model is Permission:
+                fields = self.remap(Permission, item['fields'])
+                self.match(item, Permission, {'content_type': self.content_type(fields['content_type']),
+                                              'codename': fields['codename'], 'defaults': {'name': fields['name']}})
+        for model, item in others:
+            if model not in self.remapped:
+                item['fields'] = self.remap(model, item.get('fields', {}))
+                self.load_other(item)
+
+    def match(self, item, model, lookup):
+        obj, _ = model._default_manager.db_manager(self.using).get_or_create(**lookup)
+        if item.get('pk') is not None:
+            self.remapped[model][item['pk']] = obj.pk
+        self.other_objects += 1
+
+    def content_type(self, value):
+        # Klucz naturalny ze zrzutu z --natural-foreign albo klucz główny po przepisaniu
+        if isinstance(value, list):
+            return ContentType.objects.db_manager(self.using).get_by_natural_key(*value)
+        return ContentType.objects.db_manager(self.using).get_for_id(value)
+
+    def remap(self, model, fields):
+        fields = dict(fields)
+        for field in (*model._meta.fields, *model._meta.many_to_many):
+            keys = self.remapped.get(field.related_model)
+            if not keys or fields.get(field.name) is None:
+                continue
+            if field.many_to_many:
+                fields[field.name] = [keys.get(value, value) if isinstance(value, int) else value
+                                      for value in fields[field.name]]
+            elif isinstance(fields[field.name], int):
+                fields[field.name] = keys.get(fields[field.name], fields[field.name])
+        return fields
+
+    def load_other(self, item):
+        for obj in serializers.deserialize('python', [item], using=self.using, handle_forward_references=True):
+            obj.save(using=self.using)
+            self.other_objects += 1
+            opts = obj.object._meta
+            self.tables.add(opts.db_table)
+            self.tables.update(field.remote_field.through._meta.db_table for field in opts.local_many_to_many)
+
+    def drop_indexes(self):
+        # Indeksy pomocnicze z Meta.indexes są budowane raz, po załadowaniu wszystkich wierszy
+        # (unikalne ograniczenia zostają - pilnują poprawności danych w trakcie ładowania)
+        dropped = [(model, index) for model in LOAD_ORDER for index in model._meta.indexes]
+        self.execute_ddl([index.remove_sql(model, self.schema_editor()) for model, index in dropped])
+        return dropped
+
+    def restore_indexes(self, dropped):
+        self.execute_ddl([index.create_sql(model, self.schema_editor()) for model, index in dropped])
+
+    def schema_editor(self):
+        # Tylko do generowania SQL - edytor SQLite nie może być otwarty wewnątrz transakcji
+        return connections[self.using].schema_editor(collect_sql=True)
+
+    def execute_ddl(self, statements):
+        with connections[self.using].cursor() as cursor:
+            for statement in statements:
+                cursor.execute(str(statement))
+
+    def reset_sequences(self):
+        connection = connections[self.using]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), LOAD_ORDER):
+                cursor.execute(sql)
+
+    def report(self, elapsed):
+        total = sum(self.counts.values())
+        for model in LOAD_ORDER:
+            count, spent = self.counts[model], self.insert_time[model]
+            rate = count / spent if spent else 0
+            yield f"{model._meta.label}: {count} wierszy ({rate:,.0f} wierszy/s przy zapisie)"
+        if self.other_objects:
+            yield f"Inne modele: {self.other_objects} obiektów"
+        rate = total / elapsed if elapsed else 0
+        yield f"Razem: {total} wierszy w {elapsed:.2f} s ({rate:,.0f} wierszy/s)"
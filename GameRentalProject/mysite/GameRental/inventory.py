@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Game, Rental, Reservation
+from .versioning import GAME_CATALOG, bump_version, bump_versions, game_version
+
+
+# Egzemplarze gier: wiersz Game to tytuł z licznikami total_copies, rented_count,
+# reserved_count i available_count = total - rented - reserved (pilnuje tego CHECK
+# w bazie). Wypożyczenie, zwrot i rezerwacja przenoszą egzemplarze między licznikami
+# jednym warunkowym UPDATE z F() - bez odczytu liczników, więc równoległe operacje
+# się nie gubią, a egzemplarzy nie da się wydać więcej, niż jest dostępnych.
+COUNTERS = {
+    'available': 'available_count',
+    'rented': 'rented_count',
+    'reserved': 'reserved_count',
+}
+
+
+def move_copies(counts, source, target):
+    # counts: {game_id: liczba egzemplarzy}; wynik - liczba gier, dla których się udało
+    source_field, target_field = COUNTERS[source], COUNTERS[target]
+    by_count = defaultdict(list)
+    for game_id, count in counts.items():
+        if count:
+            by_count[count].append(game_id)
+    if not by_count:
+        return 0
+    condition = Q()
+    for count, game_ids in by_count.items():
+        condition |= Q(pk__in=game_ids, **{f'{source_field}__gte': count})
+    delta = Case(*[When(pk__in=game_ids, then=Value(count)) for count, game_ids in by_count.items()],
+                 output_field=IntegerField())
+    with transaction.atomic():
+        moved = Game.objects.filter(condition).update(
+            **{source_field: F(source_field) - delta, target_field: F(target_field) + delta}
+        )
+        if moved:
+            bump_versions(game_version(game_id) for game_ids in by_count.values() for game_id in game_ids)
+    return moved
+
+
+def rebuild_inventory(game_ids=None, using='default'):
+    # Wypożyczone egzemplarze z aktywnych wypożyczeń, zarezerwowane z odłożonych rezerwacji;
+    # liczba egzemplarzy rośnie, jeśli jest ich za mało
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(game=OuterRef('pk')).order_by().values('game').annotate(count=Count('id')).values('count')
+        ), Value(0))
+
+    rented = count(Rental.active_rentals().using(using))
+    reserved = count(Reservation.objects.using(using).filter(status='odłożona'))
+    total = Greatest(F('total_copies'), rented + reserved)
+    games = Game.objects.using(using)
+    if game_ids is not None:
+        games = games.filter(pk__in=game_ids)
+    with transaction.atomic(using=using):
+        updated = games.update(
+            total_copies=total, rented_count=rented, reserved_count=reserved,
+            available_count=total - rented - reserved,
+        )
+        if game_ids is None:
+            bump_version(GAME_CATALOG, using)
+        else:
+            bump_versions((game_version(game_id) for game_id in game_ids), using)
+    return updated
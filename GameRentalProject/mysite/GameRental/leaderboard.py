@@ -0,0 +1,187 @@
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils import timezone
+
+from .cache import LRUCache
+from .conf import app_setting
+from .models import Game, LeaderboardEpoch, LeaderboardScore, Rental
+from .outbox import task
+
+
+# Ranking wypożyczeń z zanikaniem wykładniczym (forward decay): wypożyczenie z chwili t
+# dodaje do wyniku exp(λ·(t - epoka)), gdzie λ = ln 2 / okres półtrwania okna. Bieżący
+# wynik to zapisany wynik razy exp(-λ·(teraz - epoka)) - ten sam czynnik dla wszystkich
+# wierszy okna, więc top-K to zwykłe ORDER BY po indeksie, bez przeliczania przy zapisie.
+# Kompaktowanie przesuwa epokę do chwili bieżącej (wyniki mnożone przez czynnik zaniku)
+# i usuwa wiersze, których wynik spadł poniżej LEADERBOARD_MIN_SCORE.
+DIMENSIONS = ('game', 'genre', 'platform')
+# Zapas do przepełnienia liczby zmiennoprzecinkowej - po przekroczeniu okno jest kompaktowane,
+# a wykładnik jest obcinany, żeby math.exp nie rzucił OverflowError w zadaniu z kolejki
+MAX_EXPONENT = 50
+
+_snapshots = LRUCache(maxsize=256, ttl=app_setting('LEADERBOARD_CACHE_TTL'))
+
+
+def windows():
+    return app_setting('LEADERBOARD_WINDOWS')
+
+
+def decay_rate(window):
+    return math.log(2) / (windows()[window] * 3600)
+
+
+def weight(exponent):
+    return math.exp(min(exponent, MAX_EXPONENT))
+
+
+def get_epochs(now=None):
+    epochs = dict(LeaderboardEpoch.objects.values_list('window', 'epoch'))
+    missing = [window for window in windows() if window not in epochs]
+    if missing:
+        # Okno dodane w ustawieniach; przy równoległym utworzeniu epoki różnią się o ułamek sekundy
+        now = now or timezone.now()
+        LeaderboardEpoch.objects.bulk_create(
+            [LeaderboardEpoch(window=window, epoch=now) for window in missing], ignore_conflicts=True,
+        )
+        epochs.update((window, now) for window in missing)
+    return epochs
+
+
+def rental_deltas(rentals, epochs, now):
+    # rentals: krotki (game_id, gatunek, platforma, data wypożyczenia);
+    # wypożyczenie z datą w przyszłości liczy się jak bieżące
+    deltas = Counter()
+    rates = {window: decay_rate(window) for window in windows()}
+    for game_id, genre, platform, rent_date in rentals:
+        rent_date = min(rent_date, now)
+        for window, rate in rates.items():
+            score = weight(rate * (rent_date - epochs[window]).total_seconds())
+            deltas[(window, 'game', str(game_id))] += score
+            deltas[(window, 'genre', genre)] += score
+            deltas[(window, 'platform', platform)] += score
+    return deltas
+
+
+def record_rentals(rentals):
+    rentals = list(rentals)
+    if not rentals:
+        return
+    games = dict(
+        (pk, (genre, platform)) for pk, genre, platform in
+        Game.objects.filter(pk__in={rental.game_id for rental in rentals}).values_list('pk', 'genre', 'platform')
+    )
+    now = timezone.now()
+    rows = [(rental.game_id, *games[rental.game_id], min(rental.rent_date, now)) for rental in rentals
+            if rental.game_id in games]
+    with transaction.atomic():
+        epochs = get_epochs()
+        latest = max(rent_date for *_, rent_date in rows) if rows else None
+        stale = [window for window in windows()
+                 if latest and decay_rate(window) * (latest - epochs[window]).total_seconds() > MAX_EXPONENT]
+        if stale:
+            compact(stale)
+            epochs = get_epochs()
+        apply_score_deltas(rental_deltas(rows, epochs, now))
+
+
+# Wypożyczenia doliczane poza obsługą żądania - przez kolejkę zadań (outbox.py)
+@task('leaderboard.record_rentals')
+def record_rentals_task(rentals):
+    record_rentals(Rental.objects.filter(pk__in=rentals).only('game', 'rent_date'))
+
+
+def apply_score_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        # Brakujące wiersze z wynikiem 0, potem jedno UPDATE z F() dla wszystkich kluczy
+        LeaderboardScore.objects.bulk_create(
+            [LeaderboardScore(window=window, dimension=dimension, key=key) for window, dimension, key in deltas],
+            ignore_conflicts=True, batch_size=500,
+        )
+        groups = defaultdict(list)
+        for window, dimension, key in deltas:
+            groups[(window, dimension)].append(key)
+        # Warunek grupowany po (okno, wymiar) - płytkie drzewo wyrażenia także przy tysiącach kluczy
+        condition = Q()
+        for (window, dimension), keys in groups.items():
+            condition |= Q(window=window, dimension=dimension, key__in=keys)
+        whens = [When(window=window, dimension=dimension, key=key, then=Value(delta))
+                 for (window, dimension, key), delta in deltas.items()]
+        LeaderboardScore.objects.filter(condition).update(
+            score=F('score') + Case(*whens, default=Value(0.0), output_field=FloatField()),
+        )
+    _snapshots.clear()
+
+
+def compact(names=None, now=None):
+    now = now or timezone.now()
+    min_score = app_setting('LEADERBOARD_MIN_SCORE')
+    removed = 0
+    with transaction.atomic():
+        epochs = get_epochs(now)
+        for window in names or windows():
+            factor = weight(-decay_rate(window) * (now - epochs[window]).total_seconds())
+            scores = LeaderboardScore.objects.filter(window=window)
+            scores.update(score=F('score') * factor)
+            removed += scores.filter(score__lt=min_score).delete()[0]
+            LeaderboardEpoch.objects.filter(window=window).update(epoch=now)
+        # Wiersze okien usuniętych z ustawień
+        removed += LeaderboardScore.objects.exclude(window__in=list(windows())).delete()[0]
+    _snapshots.clear()
+    return removed
+
+
+def rebuild_leaderboard(now=None, using='default'):
+    # Wyniki od zera z historii wypożyczeń; starsze wypożyczenia i tak spadłyby poniżej progu
+    now = now or timezone.now()
+    min_score = app_setting('LEADERBOARD_MIN_SCORE')
+    horizon = max(windows().values()) * math.log2(1 / min_score)
+    rentals = (
+        Rental.objects.using(using).filter(rent_date__gte=now - timedelta(hours=horizon))
+        .values_list('game_id', 'game__genre', 'game__platform', 'rent_date')
+        .iterator(chunk_size=2000)
+    )
+    epochs = {window: now for window in windows()}
+    deltas = rental_deltas(rentals, epochs, now)
+    with transaction.atomic(using=using):
+        LeaderboardScore.objects.using(using).delete()
+        LeaderboardEpoch.objects.using(using).delete()
+        LeaderboardEpoch.objects.using(using).bulk_create(
+            [LeaderboardEpoch(window=window, epoch=now) for window in epochs],
+        )
+        LeaderboardScore.objects.using(using).bulk_create(
+            (LeaderboardScore(window=window, dimension=dimension, key=key, score=score)
+             for (window, dimension, key), score in deltas.items() if score >= min_score),
+            batch_size=1000,
+        )
+    _snapshots.clear()
+    return len(deltas)
+
+
+def forget_game(game_id):
+    LeaderboardScore.objects.filter(dimension='game', key=str(game_id)).delete()
+    _snapshots.clear()
+
+
+def top(window, dimension, limit, now=None):
+    # Odczyt z posortowanej migawki w pamięci procesu - zapisy w tym procesie ją unieważniają,
+    # zmiany z innych procesów są widoczne po LEADERBOARD_CACHE_TTL sekundach
+    snapshot = _snapshots.get((window, dimension))
+    if snapshot is None:
+        epoch = get_epochs()[window]
+        entries = list(
+            LeaderboardScore.objects.filter(window=window, dimension=dimension)
+            .order_by('-score', 'key').values_list('key', 'score')[:app_setting('LEADERBOARD_CACHE_SIZE')]
+        )
+        snapshot = (epoch, entries)
+        _snapshots.set((window, dimension), snapshot)
+    epoch, entries = snapshot
+    now = now or timezone.now()
+    factor = weight(-decay_rate(window) * (now - epoch).total_seconds())
+    return [(key, score * factor) for key, score in entries[:limit]]
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.benchmark import Benchmark, compare, route_names
+
+
+class Command(BaseCommand):
+    help = ("Mierzy trasy API (p50/p95/p99, zapytania SQL, pamięć na żądanie), zapisuje wynik jako JSON "
+            "i porównuje z pomiarem bazowym.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--transport', choices=('client', 'wsgi'), default='client',
+                            help="Klient testowy Django albo lokalny serwer WSGI (bez tras zapisujących).")
+        parser.add_argument('--route', action='append', dest='routes', help="Mierz tylko podaną trasę (nazwa URL).")
+        parser.add_argument('--no-allocations', action='store_true', help="Pomiń pomiar pamięci (tracemalloc).")
+        parser.add_argument('--output', '-o', help="Zapisz wynik do pliku JSON.")
+        parser.add_argument('--baseline', help="Plik JSON z pomiarem bazowym do porównania.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Dopuszczalny wzrost p95 względem bazowego pomiaru (0.2 = 20%%).")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations musi być dodatnie.")
+        unknown = set(options['routes'] or ()) - route_names()
+        if unknown:
+            raise CommandError(f"Nieznane trasy: {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Nie udało się wczytać pomiaru bazowego: {exc}")
+
+        report = Benchmark(
+            iterations=options['iterations'], warmup=options['warmup'], transport=options['transport'],
+            routes=options['routes'], track_allocations=not options['no_allocations'],
+        ).run()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+
+        self.stdout.write(f"{'trasa':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'zapytania':>9} {'KiB':>9}")
+        for name, result in report['results'].items():
+            peak = '-' if result['peak_kib'] is None else f"{result['peak_kib']:.1f}"
+            self.stdout.write(
+                f"{name:<24} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                f"{result['queries']:>9} {peak:>9}"
+            )
+        if report['meta']['skipped']:
+            self.stdout.write(f"Pominięte (zapisy): {', '.join(report['meta']['skipped'])}")
+
+        if baseline is not None:
+            rows, regressions = compare(report, baseline, options['tolerance'])
+            for name, result, base, problems in rows:
+                if base is None:
+                    self.stdout.write(f"{name}: brak w pomiarze bazowym")
+                elif problems:
+                    self.stdout.write(self.style.ERROR(f"{name}: {'; '.join(problems)}"))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"Regresje wydajności: {', '.join(regressions)}")
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("Brak regresji względem pomiaru bazowego."))
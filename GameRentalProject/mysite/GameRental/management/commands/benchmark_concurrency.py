@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.concurrency import SlowClientBenchmark
+
+
+class Command(BaseCommand):
+    help = "Porównuje obsługę wolnych klientów przez ASGI (widoki asynchroniczne) i pulę wątków WSGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', default='game-list', help="Nazwa trasy odczytu (jak w benchmark_api).")
+        parser.add_argument('--mode', action='append', dest='modes', choices=('asgi', 'wsgi'))
+        parser.add_argument('--clients', type=int, default=50, help="Liczba równoczesnych klientów.")
+        parser.add_argument('--requests', type=int, default=5, help="Liczba żądań każdego klienta.")
+        parser.add_argument('--delay', type=float, default=50, help="Czas wysyłania i odbierania po stronie klienta (ms).")
+        parser.add_argument('--workers', type=int, default=8, help="Liczba wątków roboczych WSGI.")
+        parser.add_argument('--output', '-o', help="Zapisz wynik do pliku JSON.")
+
+    def handle(self, *args, **options):
+        if min(options['clients'], options['requests'], options['workers']) < 1 or options['delay'] < 0:
+            raise CommandError("--clients, --requests i --workers muszą być dodatnie, a --delay nieujemne.")
+        try:
+            benchmark = SlowClientBenchmark(options['route'], options['clients'], options['requests'],
+                                            options['delay'] / 1000, options['workers'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        results = benchmark.run(options['modes'] or ('asgi', 'wsgi'))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+
+        meta = results['meta']
+        self.stdout.write(f"{meta['path']}: {meta['clients']} klientów x {meta['requests']} żądań, "
+                          f"opóźnienie klienta {meta['delay_ms']:.0f} ms, wątki WSGI: {meta['wsgi_workers']}")
+        self.stdout.write(f"{'tryb':<6} {'żądania/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'status':>8}")
+        for mode, summary in results['results'].items():
+            self.stdout.write(
+                f"{mode:<6} {summary['rps']:>10.1f} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+                f"{','.join(map(str, summary['status'])):>8}"
+            )
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.benchmark import SERIALIZER_BENCHMARKS, serialization_benchmark
+
+
+class Command(BaseCommand):
+    help = "Porównuje serializację list przez ModelSerializer i szybką ścieżkę z values_list (rows.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds', choices=sorted(SERIALIZER_BENCHMARKS))
+        parser.add_argument('--rows', type=int, default=10000, help="Liczba serializowanych wierszy.")
+        parser.add_argument('--repeat', type=int, default=5, help="Liczba powtórzeń - raportowany najlepszy czas.")
+        parser.add_argument('--output', '-o', help="Zapisz wynik do pliku JSON.")
+
+    def handle(self, *args, **options):
+        if min(options['rows'], options['repeat']) < 1:
+            raise CommandError("--rows i --repeat muszą być dodatnie.")
+        report = serialization_benchmark(options['kinds'], options['rows'], options['repeat'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+
+        self.stdout.write(f"{'lista':<10} {'tryb':<12} {'ms':>9} {'przyspieszenie':>15}")
+        for kind, result in report['results'].items():
+            for mode, elapsed in result['serialize_ms'].items():
+                self.stdout.write(f"{kind:<10} {mode:<12} {elapsed:>9.2f} {result['speedup'][mode]:>14.2f}x")
+            fetch = result['fetch_ms']
+            self.stdout.write(f"{kind:<10} pobranie: obiekty {fetch['objects']:.2f} ms, krotki {fetch['rows']:.2f} ms "
+                              f"({result['db_rows']} wierszy w bazie)")
+            if not result['identical']:
+                self.stdout.write(self.style.ERROR(f"{kind}: wynik szybkiej ścieżki różni się od serializera!"))
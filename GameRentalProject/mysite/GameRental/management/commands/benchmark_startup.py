@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.startup import compare_profiles
+
+
+class Command(BaseCommand):
+    help = "Porównuje profile ustawień (dev/prod): czas startu procesu, pierwszego i kolejnych żądań."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles', choices=('dev', 'prod'))
+        parser.add_argument('--repeats', type=int, default=3, help="Liczba świeżych procesów na profil.")
+        parser.add_argument('--requests', type=int, default=20, help="Liczba żądań w każdym procesie.")
+        parser.add_argument('--output', '-o', help="Zapisz wynik do pliku JSON.")
+
+    def handle(self, *args, **options):
+        if options['repeats'] < 1 or options['requests'] < 1:
+            raise CommandError("--repeats i --requests muszą być dodatnie.")
+        try:
+            results = compare_profiles(options['profiles'] or ('dev', 'prod'), options['repeats'], options['requests'])
+        except RuntimeError as exc:
+            raise CommandError(f"Pomiar nie powiódł się: {exc}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+
+        self.stdout.write(f"{'profil':<8} {'proces ms':>10} {'setup ms':>10} {'1. żądanie':>11} "
+                          f"{'p50 ms':>8} {'połączenia':>11} {'status':>8}")
+        for profile, summary in results.items():
+            self.stdout.write(
+                f"{profile:<8} {summary['process_ms']:>10.1f} {summary['setup_ms']:>10.1f} "
+                f"{summary['first_request_ms']:>11.1f} {summary['warm_p50_ms'] or 0:>8.2f} "
+                f"{summary['connections_opened']:>11} {','.join(map(str, summary['status'])):>8}"
+            )
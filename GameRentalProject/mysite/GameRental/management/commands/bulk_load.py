@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from GameRental.fixtures import BulkLoader
+
+
+class Command(BaseCommand):
+    help = ("Szybko ładuje zrzut w formacie dumpdata (np. data.json, także UTF-16) - "
+            "strumieniowo i paczkami bulk_create zamiast zapisu obiekt po obiekcie.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help="Pomijaj wiersze, których klucz już istnieje w bazie.")
+        parser.add_argument('--exclude', '-e', action='append', default=[],
+                            help="Pomiń aplikację lub model (app_label lub app_label.Model).")
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help="Nie usuwaj indeksów pomocniczych na czas ładowania.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size musi być dodatnie.")
+        loader = BulkLoader(
+            batch_size=options['batch_size'],
+            ignore_conflicts=options['ignore_conflicts'],
+            exclude=options['exclude'],
+            defer_indexes=not options['keep_indexes'],
+        )
+        try:
+            elapsed = loader.load(options['path'])
+        except (OSError, ValueError, LookupError) as exc:
+            raise CommandError(f"Nie udało się wczytać pliku: {exc}")
+        except IntegrityError as exc:
+            raise CommandError(f"Dane naruszają ograniczenia bazy, nic nie zapisano: {exc}")
+        for line in loader.report(elapsed):
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS("Dane załadowane."))
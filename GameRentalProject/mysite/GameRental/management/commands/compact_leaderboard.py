@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from GameRental.leaderboard import compact, rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Kompaktuje ranking wypożyczeń (przesunięcie epoki, usunięcie wygasłych wyników) lub odbudowuje go."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Policz ranking od zera z historii wypożyczeń.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            keys = rebuild_leaderboard()
+            self.stdout.write(self.style.SUCCESS(f"Ranking odbudowany: {keys} kluczy."))
+        else:
+            removed = compact()
+            self.stdout.write(self.style.SUCCESS(f"Ranking skompaktowany, usunięto {removed} wyników."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from GameRental.reservations import expire_holds, hand_over_waiting
+
+
+class Command(BaseCommand):
+    help = ("Wygasza przeterminowane odłożenia egzemplarzy i przekazuje zwolnione egzemplarze "
+            "następnym w kolejce rezerwacji.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Liczba rezerwacji na transakcję (domyślnie RESERVATION_SWEEP_BATCH).")
+
+    def handle(self, *args, **options):
+        expired = expire_holds(batch_size=options['batch_size'])
+        held = hand_over_waiting()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wygaszono {expired} odłożeń, odłożono {held} egzemplarzy dla oczekujących."
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from GameRental.exports import EXPORTS, FORMATS, export_chunks, export_queryset
+
+
+class Command(BaseCommand):
+    help = "Eksportuje strumieniowo historię wypożyczeń lub płatności do CSV/NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='output_format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--from', dest='from', help="Początek zakresu (data lub data i czas, włącznie).")
+        parser.add_argument('--to', help="Koniec zakresu (wyłącznie).")
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--month', type=int)
+        parser.add_argument('--user', type=int, help="Tylko wiersze podanego użytkownika.")
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--output', '-o', help="Plik wynikowy (domyślnie standardowe wyjście).")
+
+    def handle(self, *args, **options):
+        if options['month'] is not None and options['year'] is None:
+            raise CommandError("--month wymaga --year.")
+        params = {name: str(options[name]) for name in ('from', 'to', 'year', 'month', 'user')
+                  if options[name] is not None}
+        try:
+            queryset = export_queryset(options['kind'], params)
+        except ValidationError as exc:
+            raise CommandError(exc.detail['error'])
+
+        chunks = export_chunks(options['kind'], queryset, options['output_format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
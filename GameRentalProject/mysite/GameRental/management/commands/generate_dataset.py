@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.datasets import DatasetGenerator, clear_dataset
+
+
+class Command(BaseCommand):
+    help = "Generuje syntetyczny zbiór danych (użytkownicy, gry, wypożyczenia, recenzje, płatności) do testów wydajności."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--games', type=int, default=200)
+        parser.add_argument('--rentals-per-user', type=float, default=10,
+                            help="Średnia liczba wypożyczeń na użytkownika (rozkład wykładniczy).")
+        parser.add_argument('--reviews', type=int, default=2000)
+        parser.add_argument('--payment-ratio', type=float, default=0.8, help="Odsetek opłaconych wypożyczeń.")
+        parser.add_argument('--active-ratio', type=float, default=0.1, help="Odsetek gier aktualnie wypożyczonych.")
+        parser.add_argument('--waitlist', type=int, default=2,
+                            help="Liczba oczekujących rezerwacji na każdą wypożyczoną grę.")
+        parser.add_argument('--skew', type=float, default=1.1, help="Wykładnik rozkładu Zipfa popularności gier.")
+        parser.add_argument('--days', type=int, default=365, help="Zakres dat wstecz od dziś.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='synthetic', help="Prefiks nazw generowanych użytkowników.")
+        parser.add_argument('--clear', action='store_true', help="Usuń najpierw wszystkie dane wypożyczalni.")
+
+    def handle(self, *args, **options):
+        for name in ('users', 'games', 'reviews', 'waitlist', 'days', 'batch_size'):
+            if options[name] < (1 if name in ('days', 'batch_size') else 0):
+                raise CommandError(f"Nieprawidłowa wartość --{name.replace('_', '-')}.")
+        for name in ('payment_ratio', 'active_ratio'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} musi być z przedziału [0, 1].")
+        if options['clear']:
+            clear_dataset()
+
+        generator = DatasetGenerator(
+            users=options['users'], games=options['games'], rentals_per_user=options['rentals_per_user'],
+            reviews=options['reviews'], payment_ratio=options['payment_ratio'],
+            active_ratio=options['active_ratio'], waitlist=options['waitlist'], skew=options['skew'],
+            days=options['days'],
+            seed=options['seed'], batch_size=options['batch_size'], prefix=options['prefix'],
+        )
+        for label, count in generator.generate().items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS("Zbiór danych wygenerowany."))
@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from GameRental.conf import app_setting
+from GameRental.outbox import claim, retry_failed, run
+
+
+class Command(BaseCommand):
+    help = ("Wykonuje zadania z kolejki w bazie (skutki uboczne zapisów) w puli wątków. "
+            "Bez --once działa do przerwania (Ctrl+C), sprawdzając kolejkę co --poll-interval sekund.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Liczba wątków (domyślnie OUTBOX_WORKER_THREADS).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Liczba zadań dzierżawionych naraz (domyślnie OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help="Wykonaj gotowe zadania i zakończ.")
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Przywróć do kolejki zadania, które wyczerpały liczbę prób.")
+
+    def handle(self, *args, **options):
+        threads = options['threads'] or app_setting('OUTBOX_WORKER_THREADS')
+        if threads < 1:
+            raise CommandError("Nieprawidłowa wartość --threads.")
+        if options['retry_failed']:
+            self.stdout.write(f"Przywrócono {retry_failed()} zadań.")
+
+        self.stop = threading.Event()
+        self.counts = {'done': 0, 'failed': 0}
+        self.lock = threading.Lock()
+        with ThreadPoolExecutor(threads, thread_name_prefix='outbox-worker') as pool:
+            workers = [pool.submit(self.work, options['batch_size'], options['poll_interval'], options['once'])
+                       for _ in range(threads)]
+            try:
+                for worker in workers:
+                    worker.result()
+            except KeyboardInterrupt:
+                self.stop.set()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wykonano {self.counts['done']} zadań, nieudanych prób: {self.counts['failed']}."
+        ))
+
+    def work(self, batch_size, poll_interval, once):
+        try:
+            while not self.stop.is_set():
+                batch = claim(batch_size)
+                if not batch:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+                for outbox_task in batch:
+                    result = 'done' if run(outbox_task) else 'failed'
+                    with self.lock:
+                        self.counts[result] += 1
+        finally:
+            connections.close_all()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from GameRental.ratings import rebuild_game_ratings
+
+
+class Command(BaseCommand):
+    help = "Przelicza oceny gier (liczba recenzji, suma, rozkład 1-5, średnia) z tabeli Review."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--game', type=int, action='append', dest='games', help="Przelicz tylko podane gry.")
+
+    def handle(self, *args, **options):
+        games = rebuild_game_ratings(options['games'])
+        self.stdout.write(self.style.SUCCESS(f"Oceny przeliczone: {games} gier."))
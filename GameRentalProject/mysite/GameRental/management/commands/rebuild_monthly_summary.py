@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from GameRental.rollups import rebuild_monthly_summary
+
+
+class Command(BaseCommand):
+    help = "Odbudowuje zestawienie miesięczne wypożyczeń (MonthlyRentalSummary) z pełnej historii."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help="Odbuduj tylko podany miesiąc (wymaga --month).")
+        parser.add_argument('--month', type=int)
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if (year is None) != (month is None):
+            raise CommandError("--year i --month należy podać razem.")
+        if month is not None and not (1 <= month <= 12):
+            raise CommandError("Miesiąc musi być liczbą od 1 do 12.")
+        rows = rebuild_monthly_summary(year, month)
+        self.stdout.write(self.style.SUCCESS(f"Zestawienie odbudowane: {rows} wierszy."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from GameRental.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Odbudowuje indeks pełnotekstowy gier (GameSearch) z tabeli Game."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        rebuild_search_index(options['database'])
+        self.stdout.write(self.style.SUCCESS("Indeks wyszukiwania odbudowany."))
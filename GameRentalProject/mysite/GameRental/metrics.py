@@ -0,0 +1,233 @@
+import asyncio
+import bisect
+import logging
+import random
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from .conf import app_setting
+
+
+# Metryki żądań w pamięci procesu: histogramy czasu (całkowitego, bazy, serializacji, renderowania),
+# liczby zapytań i rozmiaru odpowiedzi w podziale na nazwę trasy (url_name) i metodę HTTP.
+# Eksport w formacie tekstowym Prometheusa - każdy proces (worker) ma własne liczniki.
+slow_query_logger = logging.getLogger('GameRental.slow_queries')
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+HISTOGRAMS = {
+    'gamerental_request_duration_seconds': ("Czas obsługi żądania.", TIME_BUCKETS),
+    'gamerental_db_duration_seconds': ("Łączny czas zapytań SQL w żądaniu.", TIME_BUCKETS),
+    'gamerental_db_queries': ("Liczba zapytań SQL w żądaniu.", QUERY_BUCKETS),
+    'gamerental_serialize_duration_seconds': ("Czas serializacji obiektów (serializer.data).", TIME_BUCKETS),
+    'gamerental_render_duration_seconds': ("Czas kodowania odpowiedzi do JSON (renderer DRF).", TIME_BUCKETS),
+    'gamerental_response_size_bytes': ("Rozmiar treści odpowiedzi.", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+
+    def observe(self, view, method, status, values):
+        key = (view, method)
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                histogram = self.histograms.get((name, key))
+                if histogram is None:
+                    histogram = self.histograms[(name, key)] = Histogram(HISTOGRAMS[name][1])
+                histogram.observe(value)
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+    def render(self):
+        lines = [
+            "# HELP gamerental_requests_total Liczba obsłużonych żądań.",
+            "# TYPE gamerental_requests_total counter",
+        ]
+        with self._lock:
+            for (view, method, status), count in sorted(self.requests.items()):
+                labels = _labels([('view', view), ('method', method), ('status', status)])
+                lines.append(f"gamerental_requests_total{labels} {count}")
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (metric, (view, method)), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    base = [('view', view), ('method', method)]
+                    for bound, total in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_labels(base + [('le', bound)])} {total}")
+                    lines.append(f"{name}_sum{_labels(base)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(base)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    # Pomiary jednego żądania
+    def __init__(self, request):
+        self.request = request
+        self.db_time = 0
+        self.queries = 0
+        self.serialize_time = None
+        self.render_time = None
+        self.serializing = False
+        self.task = None
+        self.slow_threshold = app_setting('SLOW_QUERY_THRESHOLD_MS') / 1000
+        self.sample_rate = app_setting('SLOW_QUERY_SAMPLE_RATE')
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.queries += 1
+            if duration >= self.slow_threshold and random.random() < self.sample_rate:
+                self.log_slow_query(sql, params, duration, context)
+
+    def log_slow_query(self, sql, params, duration, context):
+        base_dir = str(settings.BASE_DIR)
+        stack = traceback.extract_stack()[:-2]
+        if self.task is not None and self.task is not _running_task():
+            # Zapytanie z async ORM w innym wątku: najgłębsze są ramki zawieszonej korutyny widoku
+            stack = list(stack) + list(traceback.StackSummary.extract(_suspended_frames(self.task)))
+        # Tylko ramki z kodu projektu - bez warstw Django i bibliotek
+        frames = [
+            frame for frame in stack
+            if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        ]
+        slow_query_logger.warning(
+            "Wolne zapytanie (%.1f ms, %s) w %s: %s; parametry: %r\n%s",
+            duration * 1000, context['connection'].alias, self.request.path, sql, params,
+            ''.join(traceback.format_list(frames[-app_setting('SLOW_QUERY_STACK_DEPTH'):])),
+        )
+
+    def add_serialize_time(self, duration):
+        self.serialize_time = (self.serialize_time or 0) + duration
+
+    def add_render_time(self, duration):
+        self.render_time = (self.render_time or 0) + duration
+
+
+def _running_task():
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def _suspended_frames(task):
+    # Task.get_stack() dla zawieszonej korutyny zwraca tylko jej zewnętrzną ramkę - łańcuch
+    # awaitów trzeba przejść samemu
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is not None:
+            yield frame, frame.f_lineno
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+
+
+# Pomiary bieżącego żądania w zmiennej kontekstowej - asgiref przenosi kontekst do wątków
+# async ORM, więc jeden wrapper na połączeniu liczy zapytania z widoków sync i async
+_current = ContextVar('gamerental_request_metrics', default=None)
+
+
+@contextmanager
+def measuring(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def track_view_task():
+    # Stos wywołań widoku async dla logu wolnych zapytań - zapytania async ORM idą w innym wątku
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.task = _running_task()
+
+
+@contextmanager
+def measuring_serialization():
+    # Zagnieżdżone serializer.data (np. w polu metody) liczone raz, w najbardziej zewnętrznym
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.add_serialize_time(time.perf_counter() - started)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_wrapper(connection):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def current_metrics(request):
+    # Renderer dostaje obiekt Request DRF - pomiary są na oryginalnym HttpRequest
+    request = getattr(request, '_request', request)
+    return getattr(request, '_metrics', None)
+
+
+def response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
@@ -0,0 +1,140 @@
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from .conf import app_setting
+from .metrics import RequestMetrics, measuring, registry, response_size
+from .routers import PIN_COOKIE, SAFE_METHODS, flush_heartbeat, replica_reads
+
+
+# Pomiar każdego żądania: czas całkowity, czas i liczba zapytań SQL, czas serializacji
+# (zgłaszany przez renderer) i rozmiar odpowiedzi. Powinien stać na początku MIDDLEWARE.
+# Działa w obu trybach, więc pod ASGI nie wymusza przejścia żądania do wątku.
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not app_setting('METRICS_ENABLED'):
+            return self.get_response(request)
+
+        metrics = request._metrics = RequestMetrics(request)
+        started = time.perf_counter()
+        with measuring(metrics):
+            response = self.get_response(request)
+        self.record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not app_setting('METRICS_ENABLED'):
+            return await self.get_response(request)
+
+        metrics = request._metrics = RequestMetrics(request)
+        started = time.perf_counter()
+        with measuring(metrics):
+            response = await self.get_response(request)
+        self.record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, metrics, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        registry.observe(view, request.method, response.status_code, {
+            'gamerental_request_duration_seconds': duration,
+            'gamerental_db_duration_seconds': metrics.db_time,
+            'gamerental_db_queries': metrics.queries,
+            'gamerental_serialize_duration_seconds': metrics.serialize_time,
+            'gamerental_render_duration_seconds': metrics.render_time,
+            'gamerental_response_size_bytes': response_size(response),
+        })
+
+
+# Pod ASGI trasy odczytu obsługują widoki asynchroniczne (ASGI_URLCONF, np. mysite.asgi_urls);
+# pod WSGI zostają widoki DRF - widok asynchroniczny wymagałby tam przejścia przez async_to_sync.
+class ASGIURLConfMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        self.set_urlconf(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.set_urlconf(request)
+        return await self.get_response(request)
+
+    @staticmethod
+    def set_urlconf(request):
+        urlconf = app_setting('ASGI_URLCONF')
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+
+
+# Stan odczytów z repliki (routers.ReplicaRouter) na czas żądania i ciasteczko przypinające
+# klienta do bazy głównej po zapisie. Bez skonfigurowanej repliki nic nie robi.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with replica_reads(self.pinned(request)) as state:
+            request._routing_state = state
+            response = self.get_response(request)
+        if state is not None and state.wrote:
+            flush_heartbeat()
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        with replica_reads(self.pinned(request)) as state:
+            request._routing_state = state
+            response = await self.get_response(request)
+        if state is not None and state.wrote:
+            await sync_to_async(flush_heartbeat)()
+        return self.pin(response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Raporty tolerują opóźnienie repliki - ciasteczko ich nie przypina
+        state = getattr(request, '_routing_state', None)
+        if state is not None and request.method in SAFE_METHODS and not state.wrote:
+            view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+            if getattr(view_class, 'read_replica', False):
+                state.pinned = False
+
+    @staticmethod
+    def pinned(request):
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    @staticmethod
+    def pin(response, state):
+        if state is not None and state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=math.ceil(app_setting('REPLICA_LAG_TOLERANCE')),
+                                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_auth_users(apps, schema_editor):
+    db = schema_editor.connection.alias
+    User = apps.get_model('GameRental', 'User')
+    AuthUser = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    auth_ids = dict(AuthUser.objects.using(db).values_list('username', 'id'))
+    linked = []
+    for user in User.objects.using(db).filter(auth_user__isnull=True).only('id', 'username'):
+        if user.username in auth_ids:
+            user.auth_user_id = auth_ids[user.username]
+            linked.append(user)
+    User.objects.using(db).bulk_update(linked, ['auth_user'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('GameRental', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='auth_user',
+            field=models.OneToOneField(blank=True, db_column='Auth_user_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='game_rental_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_auth_users, migrations.RunPython.noop),
+    ]
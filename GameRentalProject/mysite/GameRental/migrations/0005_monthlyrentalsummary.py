@@ -0,0 +1,51 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_monthly_summary(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Rental = apps.get_model('GameRental', 'Rental')
+    MonthlyRentalSummary = apps.get_model('GameRental', 'MonthlyRentalSummary')
+    totals = (
+        Rental.objects.using(db).annotate(year=ExtractYear('rent_date'), month=ExtractMonth('rent_date'))
+        .values('year', 'month', 'game_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    MonthlyRentalSummary.objects.using(db).bulk_create(
+        [MonthlyRentalSummary(year=row['year'], month=row['month'], game_id=row['game_id'], total=row['total'])
+         for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0004_user_auth_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRentalSummary',
+            fields=[
+                ('id', models.AutoField(db_column='ID', primary_key=True, serialize=False)),
+                ('year', models.IntegerField(db_column='Year')),
+                ('month', models.IntegerField(db_column='Month')),
+                ('total', models.IntegerField(db_column='Total', default=0)),
+                ('game', models.ForeignKey(db_column='Game_id', on_delete=django.db.models.deletion.CASCADE, to='GameRental.game')),
+            ],
+            options={
+                'db_table': 'MonthlyRentalSummary',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrentalsummary',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'game'), name='monthly_summary_year_month_game_uniq'),
+        ),
+        migrations.RunPython(populate_monthly_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0005_monthlyrentalsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['user', 'rent_date'], name='rental_user_rent_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status'], name='rental_status_idx'),
+        ),
+    ]
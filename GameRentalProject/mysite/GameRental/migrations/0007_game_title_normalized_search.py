@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+
+def normalize_titles(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Game = apps.get_model('GameRental', 'Game')
+    games = list(Game.objects.using(db).only('id', 'title'))
+    for game in games:
+        game.title_normalized = game.title.lower()
+    Game.objects.using(db).bulk_update(games, ['title_normalized'], batch_size=1000)
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE "GameSearch" USING fts5('
+        '"Title", "Genre", "Platform", tokenize = \'unicode61 remove_diacritics 2\')'
+    )
+    schema_editor.execute(
+        'INSERT INTO "GameSearch" (rowid, "Title", "Genre", "Platform") '
+        'SELECT "ID", "Title", "Genre", "Platform" FROM "Game"'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS "GameSearch"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0006_rental_user_rent_date_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='title_normalized',
+            field=models.CharField(db_column='Title_normalized', db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(normalize_titles, migrations.RunPython.noop),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
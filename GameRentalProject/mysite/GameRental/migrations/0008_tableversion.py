@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0007_game_title_normalized_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('name', models.CharField(db_column='Name', max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(db_column='Version', default=0)),
+                ('updated_at', models.DateTimeField(db_column='Updated_at', default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'TableVersion',
+            },
+        ),
+    ]
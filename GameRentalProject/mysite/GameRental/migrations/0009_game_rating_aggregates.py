@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_game_ratings(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Game = apps.get_model('GameRental', 'Game')
+    Review = apps.get_model('GameRental', 'Review')
+    histogram = {f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)}
+    totals = Review.objects.using(db).values('game_id').annotate(review_count=Count('id'),
+                                                                 rating_sum=Sum('rating'), **histogram).order_by()
+    games = []
+    for row in totals:
+        game = Game(id=row.pop('game_id'), **row)
+        game.average_rating = game.rating_sum / game.review_count
+        games.append(game)
+    Game.objects.using(db).bulk_update(games, ['review_count', 'rating_sum', 'average_rating', *histogram],
+                                       batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0008_tableversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='average_rating',
+            field=models.FloatField(db_column='Average_rating', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_1',
+            field=models.IntegerField(db_column='Rating_1', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_2',
+            field=models.IntegerField(db_column='Rating_2', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_3',
+            field=models.IntegerField(db_column='Rating_3', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_4',
+            field=models.IntegerField(db_column='Rating_4', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_5',
+            field=models.IntegerField(db_column='Rating_5', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_sum',
+            field=models.IntegerField(db_column='Rating_sum', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='review_count',
+            field=models.IntegerField(db_column='Review_count', default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['average_rating', 'id'], name='game_average_rating_id_idx'),
+        ),
+        migrations.RunPython(populate_game_ratings, migrations.RunPython.noop),
+    ]
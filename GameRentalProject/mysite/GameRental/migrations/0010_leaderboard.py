@@ -0,0 +1,52 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_epochs(apps, schema_editor):
+    db = schema_editor.connection.alias
+    LeaderboardEpoch = apps.get_model('GameRental', 'LeaderboardEpoch')
+    now = django.utils.timezone.now()
+    LeaderboardEpoch.objects.using(db).bulk_create(
+        [LeaderboardEpoch(window=window, epoch=now) for window in ('trending', 'week', 'month')]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0009_game_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEpoch',
+            fields=[
+                ('window', models.CharField(db_column='Window', max_length=20, primary_key=True, serialize=False)),
+                ('epoch', models.DateTimeField(db_column='Epoch', default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'LeaderboardEpoch',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('id', models.AutoField(db_column='ID', primary_key=True, serialize=False)),
+                ('window', models.CharField(db_column='Window', max_length=20)),
+                ('dimension', models.CharField(db_column='Dimension', max_length=20)),
+                ('key', models.CharField(db_column='Key', max_length=255)),
+                ('score', models.FloatField(db_column='Score', default=0)),
+            ],
+            options={
+                'db_table': 'LeaderboardScore',
+                'indexes': [models.Index(fields=['window', 'dimension', '-score'], name='leaderboard_top_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardscore',
+            constraint=models.UniqueConstraint(fields=('window', 'dimension', 'key'), name='leaderboard_window_dimension_key_uniq'),
+        ),
+        migrations.RunPython(create_epochs, migrations.RunPython.noop),
+    ]
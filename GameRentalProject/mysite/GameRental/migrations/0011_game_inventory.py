@@ -0,0 +1,148 @@
+# Generated by Django 4.2.16 on 2026-10-18 17:40
+
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+import django.db.models.expressions
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+# Egzemplarze jednego tytułu były osobnymi wierszami Game - wiersze o tym samym tytule, gatunku,
+# platformie i dacie wydania łączymy w jeden (najmniejsze ID) z Total_copies = liczba wierszy.
+# Wypożyczenia, recenzje, podsumowania miesięczne, ranking i oceny przechodzą na zachowany wiersz.
+def collapse_duplicate_games(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Game = apps.get_model('GameRental', 'Game')
+    Rental = apps.get_model('GameRental', 'Rental')
+    Review = apps.get_model('GameRental', 'Review')
+    MonthlyRentalSummary = apps.get_model('GameRental', 'MonthlyRentalSummary')
+    LeaderboardScore = apps.get_model('GameRental', 'LeaderboardScore')
+
+    groups = defaultdict(list)
+    rows = Game.objects.using(db).order_by('id').values_list('id', 'title', 'genre', 'platform', 'release_date')
+    for pk, *key in rows.iterator(chunk_size=2000):
+        groups[tuple(key)].append(pk)
+    duplicates = {}
+    copies = defaultdict(list)
+    for pk, *rest in groups.values():
+        duplicates.update((duplicate, pk) for duplicate in rest)
+        if rest:
+            copies[len(rest) + 1].append(pk)
+    if not duplicates:
+        return
+    merged = defaultdict(list)
+    for duplicate, pk in duplicates.items():
+        merged[pk].append(duplicate)
+
+    for pk, removed in merged.items():
+        Rental.objects.using(db).filter(game_id__in=removed).update(game_id=pk)
+        Review.objects.using(db).filter(game_id__in=removed).update(game_id=pk)
+
+    summaries = MonthlyRentalSummary.objects.using(db).filter(game_id__in=list(duplicates))
+    totals = Counter()
+    for year, month, game_id, total in summaries.values_list('year', 'month', 'game_id', 'total'):
+        totals[(year, month, duplicates[game_id])] += total
+    summaries.delete()
+    for (year, month, game_id), total in totals.items():
+        if not MonthlyRentalSummary.objects.using(db).filter(year=year, month=month, game_id=game_id).update(
+                total=F('total') + total):
+            MonthlyRentalSummary.objects.using(db).create(year=year, month=month, game_id=game_id, total=total)
+
+    scores = LeaderboardScore.objects.using(db).filter(dimension='game', key__in=[str(pk) for pk in duplicates])
+    deltas = Counter()
+    for window, key, score in scores.values_list('window', 'key', 'score'):
+        deltas[(window, str(duplicates[int(key)]))] += score
+    scores.delete()
+    for (window, key), score in deltas.items():
+        if not LeaderboardScore.objects.using(db).filter(window=window, dimension='game', key=key).update(
+                score=F('score') + score):
+            LeaderboardScore.objects.using(db).create(window=window, dimension='game', key=key, score=score)
+
+    rating_fields = ('review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+    ratings = {row[0]: row[1:] for row in
+               Game.objects.using(db).filter(pk__in=list(duplicates)).values_list('id', *rating_fields)}
+    for pk, removed in merged.items():
+        updates = {field: F(field) + sum(ratings[duplicate][index] for duplicate in removed)
+                   for index, field in enumerate(rating_fields)}
+        Game.objects.using(db).filter(pk=pk).update(**updates)
+        game = Game.objects.using(db).get(pk=pk)
+        game.average_rating = game.rating_sum / game.review_count if game.review_count else 0
+        game.save(update_fields=['average_rating'], using=db)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        removed = list(duplicates)
+        for start in range(0, len(removed), 500):
+            batch = removed[start:start + 500]
+            schema_editor.execute(
+                'DELETE FROM "GameSearch" WHERE rowid IN (%s)' % ', '.join(['%s'] * len(batch)), batch,
+            )
+    Game.objects.using(db).filter(pk__in=list(duplicates)).delete()
+    for count, pks in copies.items():
+        Game.objects.using(db).filter(pk__in=pks).update(total_copies=count)
+
+
+# Wypożyczone egzemplarze z aktywnych wypożyczeń (jak inventory.rebuild_inventory)
+def count_copies(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Game = apps.get_model('GameRental', 'Game')
+    Rental = apps.get_model('GameRental', 'Rental')
+    active = (
+        Rental.objects.using(db).filter(status='wypożyczona', game=OuterRef('pk')).order_by().values('game')
+        .annotate(count=Count('id')).values('count')
+    )
+    rented = Coalesce(Subquery(active), Value(0))
+    total = Greatest(F('total_copies'), rented)
+    Game.objects.using(db).update(total_copies=total, rented_count=rented, available_count=total - rented)
+
+
+def restore_is_available(apps, schema_editor):
+    # Połączonych wierszy nie odtwarzamy - tytuł zostaje jednym wierszem
+    db = schema_editor.connection.alias
+    Game = apps.get_model('GameRental', 'Game')
+    Game.objects.using(db).update(is_available=True)
+    Game.objects.using(db).filter(available_count=0).update(is_available=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0010_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='total_copies',
+            field=models.PositiveIntegerField(db_column='Total_copies', default=1),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rented_count',
+            field=models.IntegerField(db_column='Rented_count', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='reserved_count',
+            field=models.IntegerField(db_column='Reserved_count', default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='available_count',
+            field=models.IntegerField(db_column='Available_count', default=1, editable=False),
+        ),
+        migrations.RunPython(collapse_duplicate_games, migrations.RunPython.noop),
+        migrations.RunPython(count_copies, restore_is_available),
+        migrations.RemoveField(
+            model_name='game',
+            name='is_available',
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(condition=models.Q(('available_count__gt', 0)), fields=['id'], name='game_available_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='game',
+            constraint=models.CheckConstraint(check=models.Q(('available_count', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('total_copies'), '-', models.F('rented_count')), '-', models.F('reserved_count'))), ('available_count__gte', 0), ('rented_count__gte', 0), ('reserved_count__gte', 0)), name='game_inventory_counts_check'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0011_game_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.AutoField(db_column='ID', primary_key=True, serialize=False)),
+                ('status', models.CharField(db_column='Status', default='oczekuje', max_length=20)),
+                ('created_at', models.DateTimeField(db_column='Created_at', default=django.utils.timezone.now)),
+                ('held_until', models.DateTimeField(blank=True, db_column='Held_until', null=True)),
+                ('game', models.ForeignKey(db_column='Game_id', on_delete=django.db.models.deletion.CASCADE, to='GameRental.game')),
+                ('user', models.ForeignKey(db_column='User_id', on_delete=django.db.models.deletion.CASCADE, to='GameRental.user')),
+            ],
+            options={
+                'db_table': 'Reservation',
+                'indexes': [models.Index(condition=models.Q(('status', 'oczekuje')), fields=['game', 'id'], name='reservation_queue_idx'), models.Index(condition=models.Q(('status', 'odłożona')), fields=['held_until'], name='reservation_hold_idx'), models.Index(fields=['user', 'id'], name='reservation_user_id_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['oczekuje', 'odłożona'])), fields=('user', 'game'), name='reservation_user_game_open_uniq'),
+        ),
+    ]
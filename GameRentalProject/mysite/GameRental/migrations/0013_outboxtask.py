@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameRental', '0012_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxTask',
+            fields=[
+                ('id', models.AutoField(db_column='ID', primary_key=True, serialize=False)),
+                ('name', models.CharField(db_column='Name', max_length=100)),
+                ('payload', models.JSONField(db_column='Payload', default=dict)),
+                ('status', models.CharField(db_column='Status', default='oczekuje', max_length=20)),
+                ('attempts', models.IntegerField(db_column='Attempts', default=0)),
+                ('available_at', models.DateTimeField(db_column='Available_at', default=django.utils.timezone.now)),
+                ('lease', models.CharField(blank=True, db_column='Lease', max_length=32, null=True)),
+                ('leased_until', models.DateTimeField(blank=True, db_column='Leased_until', null=True)),
+                ('last_error', models.TextField(blank=True, db_column='Last_error', null=True)),
+                ('created_at', models.DateTimeField(db_column='Created_at', default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'OutboxTask',
+                'indexes': [models.Index(condition=models.Q(('status', 'oczekuje')), fields=['available_at', 'id'], name='outbox_pending_idx'), models.Index(fields=['lease'], name='outbox_lease_idx')],
+            },
+        ),
+    ]
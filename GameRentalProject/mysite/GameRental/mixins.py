@@ -0,0 +1,283 @@
+import hashlib
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .cache import acache_get, acache_set
+from .conf import app_setting
+from .exports import FORMATS, export_chunks, export_queryset
+from .rows import RowSerializer
+from .models import Game
+from .versioning import GAME_CATALOG, aget_version, aget_versions, game_version, get_version, get_versions
+
+
+# Warunkowy GET dla katalogu gier. ETag wynika z licznika wersji tabeli (TableVersion)
+# i adresu żądania, więc odpowiedź 304 nie wymaga ani zapytania o gry, ani serializacji.
+# Zserializowane strony trzymane są w cache Django pod kluczem z ETagiem - każda zmiana
+# katalogu podbija wersję, a stare wpisy po prostu wygasają. Liczniki egzemplarzy i oceny
+# zmieniają się przy każdym wypożyczeniu i recenzji, więc mają osobne wersje gier
+# (versioning.game_version): wpis w cache pamięta gry ze strony i ich wersje, a ETag obejmuje
+# też te wersje. Listy sortowane po ocenach nie są cache'owane - ocena zmienia skład strony.
+# Strona zbudowana, gdy wersja którejś z jej gier się zmieniała, trafia do klienta bez
+# zapisu w cache - dane mogą być starsze niż odczytane po nich wersje.
+VOLATILE_FIELDS = frozenset(Game.INVENTORY_FIELDS + Game.RATING_FIELDS + (
+    'is_available', 'availability_status', 'rating_histogram',
+))
+VOLATILE_ORDERING = frozenset(Game.RATING_FIELDS)
+
+
+def catalog_games(data):
+    # Gry w odpowiedzi katalogu: strona ({"results": [...]}), lista albo jedna gra
+    if isinstance(data, dict):
+        data = data.get('results', [data])
+    return [item for item in data if isinstance(item, dict)]
+
+
+def catalog_game_ids(data):
+    # Gry, od których liczników zależy odpowiedź; None - odpowiedź z licznikami bez pola id
+    games = [game for game in catalog_games(data) if VOLATILE_FIELDS.intersection(game)]
+    if any('id' not in game for game in games):
+        return None
+    return sorted({game['id'] for game in games})
+
+
+def changed_since(versions, started):
+    return any(updated_at is not None and updated_at >= started for _, updated_at in versions.values())
+
+
+class CatalogCacheMixin:
+    catalog_table = GAME_CATALOG
+
+    def catalog_response(self, request, build_response):
+        if not self.catalog_cacheable(request):
+            return build_response()
+        version, updated_at = get_version(self.catalog_table)
+        base_etag = self.catalog_etag(request, version, updated_at)
+        cache = caches[app_setting('CATALOG_CACHE_BACKEND')]
+        cache_key = f'GameRental:catalog-page:{base_etag}'
+        entry = cache.get(cache_key)
+        game_ids = None
+        if entry is not None:
+            game_ids, versions, data = entry
+            current = get_versions([game_version(pk) for pk in game_ids]) if game_ids else {}
+            if current == versions:
+                return self.cached_catalog_response(request, base_etag, updated_at, versions, Response, data)
+            versions = current
+
+        started = timezone.now()
+        response = build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        if game_ids is None:
+            game_ids = catalog_game_ids(response.data)
+            if game_ids is None:
+                return response
+            versions = get_versions([game_version(pk) for pk in game_ids]) if game_ids else {}
+            if changed_since(versions, started):
+                return response
+        cache.set(cache_key, (game_ids, versions, response.data), app_setting('CATALOG_CACHE_TTL'))
+        return self.cached_catalog_response(request, base_etag, updated_at, versions, lambda data: response)
+
+    # Wersja dla widoków asynchronicznych; build_data zwraca (dane, status), a render_data
+    # zamienia dane na odpowiedź. Wpisy cache są wspólne z wersją synchroniczną.
+    async def acatalog_response(self, request, build_data, render_data):
+        if not self.catalog_cacheable(request):
+            return render_data(*await build_data())
+        version, updated_at = await aget_version(self.catalog_table)
+        base_etag = self.catalog_etag(request, version, updated_at)
+        cache = caches[app_setting('CATALOG_CACHE_BACKEND')]
+        cache_key = f'GameRental:catalog-page:{base_etag}'
+        entry = await acache_get(cache, cache_key)
+        game_ids = None
+        if entry is not None:
+            game_ids, versions, data = entry
+            current = await aget_versions([game_version(pk) for pk in game_ids]) if game_ids else {}
+            if current == versions:
+                return self.cached_catalog_response(request, base_etag, updated_at, versions, render_data, data)
+            versions = current
+
+        started = timezone.now()
+        data, status_code = await build_data()
+        if status_code != status.HTTP_200_OK:
+            return render_data(data, status_code)
+        if game_ids is None:
+            game_ids = catalog_game_ids(data)
+            if game_ids is None:
+                return render_data(data, status_code)
+            versions = await aget_versions([game_version(pk) for pk in game_ids]) if game_ids else {}
+            if changed_since(versions, started):
+                return render_data(data, status_code)
+        await acache_set(cache, cache_key, (game_ids, versions, data), app_setting('CATALOG_CACHE_TTL'))
+        return self.cached_catalog_response(request, base_etag, updated_at, versions, render_data, data)
+
+    @staticmethod
+    def catalog_cacheable(request):
+        ordering = request.GET.get('ordering', '')
+        return not VOLATILE_ORDERING.intersection(field.strip().lstrip('-') for field in ordering.split(','))
+
+    def cached_catalog_response(self, request, base_etag, updated_at, versions, render_data, data=None):
+        stamps = [stamp for stamp in [updated_at] + [stamp for _, stamp in versions.values()] if stamp]
+        last_modified = int(max(stamps).timestamp()) if stamps else None
+        etag = base_etag
+        if versions:
+            material = base_etag + ''.join(f':{name}={version}' for name, (version, _) in sorted(versions.items()))
+            etag = '"%s"' % hashlib.sha1(material.encode()).hexdigest()
+
+        if self.catalog_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = render_data(data)
+        return self.add_catalog_headers(response, etag, last_modified)
+
+    @staticmethod
+    def add_catalog_headers(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def catalog_etag(self, request, version, updated_at):
+        stamp = updated_at.isoformat() if updated_at else ''
+        media_type = getattr(request, 'accepted_media_type', 'application/json')
+        material = f'{self.catalog_table}:{version}:{stamp}:{request.get_full_path()}:{media_type}'
+        return '"%s"' % hashlib.sha1(material.encode()).hexdigest()
+
+    @staticmethod
+    def catalog_not_modified(request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags or f'W/{etag}' in etags
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since and last_modified is not None:
+            since = parse_http_date_safe(if_modified_since)
+            return since is not None and last_modified <= since
+        return False
+
+
+class CatalogCachedViewSetMixin(CatalogCacheMixin):
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        return self.catalog_response(request, lambda: build(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        build = super().retrieve
+        return self.catalog_response(request, lambda: build(request, *args, **kwargs))
+
+
+# Wybór pól odpowiedzi przy odczycie: ?fields=id,title zostawia podane pola i pobiera tylko
+# ich kolumny (.only() albo values_list), ?expand=game,user osadza obiekty powiązane
+# pobrane tym samym zapytaniem (select_related / JOIN). Zapisy zawsze używają pełnego serializera.
+class SparseFieldsMixin:
+    def sparse_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            return None, ()
+        return sparse_fieldset(self.get_serializer_class(), self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.sparse_fields()
+        if fields is not None or expand:
+            kwargs.update(fields=fields, expand=expand)
+        return super().get_serializer(*args, **kwargs)
+
+    # W filter_queryset, bo widoki nadpisują get_queryset (zakres danych użytkownika)
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.sparse_fields()
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return project_queryset(queryset, self.get_serializer_class(), fields, expand, self.ordering_columns(queryset))
+
+    def ordering_columns(self, queryset):
+        # Pola sortowania strony - kursor następnej strony jest budowany z ich wartości
+        if getattr(self, 'action', None) != 'list' or self.paginator is None:
+            return ()
+        return tuple(field.lstrip('-') for field in self.paginator.get_ordering(self.request, queryset, self))
+
+
+def sparse_fieldset(serializer_class, params):
+    expand = tuple(sorted({name.strip() for name in params.get('expand', '').split(',') if name.strip()}))
+    unknown = set(expand) - set(getattr(serializer_class, 'expandable_fields', ()))
+    if unknown:
+        raise ValidationError({"error": f"Nie można rozwinąć pól: {', '.join(sorted(unknown))}."})
+    fields = tuple(sorted({name.strip() for name in params.get('fields', '').split(',') if name.strip()})) or None
+    if fields is not None:
+        unknown = set(fields) - set(field_names(serializer_class))
+        if unknown:
+            raise ValidationError({"error": f"Nieznane pola: {', '.join(sorted(unknown))}."})
+    return fields, expand
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+    return tuple(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+@lru_cache(maxsize=256)
+def projected_columns(serializer_class, fields, expand):
+    # Pola modelu potrzebne wybranym polom serializera; None - pola metod czytają cały obiekt
+    columns = []
+    for field in serializer_class(fields=fields, expand=expand)._readable_fields:
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*' or '.' in field.source:
+            return None
+        columns.append(field.source)
+    return tuple(columns)
+
+
+def project_queryset(queryset, serializer_class, fields, expand=(), extra=()):
+    if fields is None:
+        return queryset
+    columns = projected_columns(serializer_class, fields, expand)
+    return queryset if columns is None else queryset.only(*columns, *extra)
+
+
+# Lista z szybkiej ścieżki serializacji (rows.py) - filtrowanie, sortowanie i stronicowanie
+# jak w ListModelMixin, ale strona to krotki z values_list zamiast obiektów modeli
+class FastListMixin(SparseFieldsMixin):
+    def list(self, request, *args, **kwargs):
+        rows = row_serializer(self.get_serializer_class(), *self.sparse_fields())
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = rows.queryset(queryset, self.ordering_columns(queryset))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.data(page))
+        return Response(rows.data(queryset))
+
+
+def row_serializer(serializer_class, fields=None, expand=()):
+    if not app_setting('FAST_LIST_SERIALIZATION'):
+        return None
+    return RowSerializer.for_serializer(serializer_class, fields, expand)
+
+
+# Strumieniowy eksport historii: GET .../export/?output=csv|ndjson&from=&to=&user=
+# (parametr "format" jest zajęty przez negocjację treści DRF). Zakres danych wynika
+# z get_queryset(), więc zwykły użytkownik eksportuje tylko własne wiersze.
+class StreamingExportMixin:
+    export_kind = None
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        output_format = request.query_params.get('output', 'csv')
+        if output_format not in FORMATS:
+            raise ValidationError({"error": "Nieobsługiwany format eksportu."})
+        queryset = export_queryset(self.export_kind, request.query_params, self.get_queryset())
+        response = StreamingHttpResponse(
+            export_chunks(self.export_kind, queryset, output_format),
+            content_type=FORMATS[output_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_kind}.{output_format}"'
+        return response
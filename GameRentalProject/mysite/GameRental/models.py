@@ -1,4 +1,5 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
@@ -11,9 +12,14 @@ class User(models.Model):
     is_staff = models.BooleanField(db_column='Is_staff', default=False, null=False)
     date_joined = models.DateTimeField(db_column='Date_joined', default=timezone.now, null=False)
     last_login = models.DateTimeField(db_column='Last_login', blank=True, null=True)
+    auth_user = models.OneToOneField(settings.AUTH_USER_MODEL, models.SET_NULL, db_column='Auth_user_id',
+                                     blank=True, null=True, related_name='game_rental_user')
 
     class Meta:
         db_table = 'User'
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.email})"
@@ -21,7 +27,7 @@ class User(models.Model):
 
 class AvailableGamesManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().filter(is_available=True)
+        return super().get_queryset().filter(available_count__gt=0)
 
 
 class Game(models.Model):
@@ -30,12 +36,92 @@ class Game(models.Model):
     genre = models.CharField(db_column='Genre', max_length=100, null=False)
     platform = models.CharField(db_column='Platform', max_length=50, null=False)
     release_date = models.DateField(db_column='Release_date', null=False)
-    is_available = models.BooleanField(db_column='Is_available', default=True, null=False)
+    # Egzemplarze tytułu (GameRental.inventory) - liczniki zmieniają tylko zapytania UPDATE z F()
+    total_copies = models.PositiveIntegerField(db_column='Total_copies', default=1, null=False)
+    rented_count = models.IntegerField(db_column='Rented_count', default=0, editable=False, null=False)
+    reserved_count = models.IntegerField(db_column='Reserved_count', default=0, editable=False, null=False)
+    available_count = models.IntegerField(db_column='Available_count', default=1, editable=False, null=False)
+    # Tytuł małymi literami z indeksem - wyszukiwanie po prefiksie bez LIKE na kolumnie Title
+    title_normalized = models.CharField(db_column='Title_normalized', max_length=255, default='',
+                                        editable=False, db_index=True, null=False)
+    # Oceny z recenzji utrzymywane przyrostowo (GameRental.ratings) - średnia i rozkład 1-5
+    # bez agregowania tabeli Review przy odczycie
+    review_count = models.IntegerField(db_column='Review_count', default=0, editable=False, null=False)
+    rating_sum = models.IntegerField(db_column='Rating_sum', default=0, editable=False, null=False)
+    rating_1 = models.IntegerField(db_column='Rating_1', default=0, editable=False, null=False)
+    rating_2 = models.IntegerField(db_column='Rating_2', default=0, editable=False, null=False)
+    rating_3 = models.IntegerField(db_column='Rating_3', default=0, editable=False, null=False)
+    rating_4 = models.IntegerField(db_column='Rating_4', default=0, editable=False, null=False)
+    rating_5 = models.IntegerField(db_column='Rating_5', default=0, editable=False, null=False)
+    average_rating = models.FloatField(db_column='Average_rating', default=0, editable=False, null=False)
     objects = models.Manager()
     available = AvailableGamesManager()
 
+    RATING_FIELDS = ('review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+                     'average_rating')
+    INVENTORY_FIELDS = ('total_copies', 'rented_count', 'reserved_count', 'available_count')
+
     class Meta:
         db_table = 'Game'
+        indexes = [
+            models.Index(fields=['average_rating', 'id'], name='game_average_rating_id_idx'),
+            # Indeks częściowy - zapytania o dostępne gry (available_count > 0) czytają tylko dostępne wiersze
+            models.Index(fields=['id'], condition=models.Q(available_count__gt=0), name='game_available_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(available_count=models.F('total_copies') - models.F('rented_count')
+                               - models.F('reserved_count'))
+                & models.Q(available_count__gte=0, rented_count__gte=0, reserved_count__gte=0),
+                name='game_inventory_counts_check',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_total_copies = instance.__dict__.get('total_copies')
+        return instance
+
+    @property
+    def is_available(self):
+        return self.available_count > 0
+
+    @staticmethod
+    def normalize_title(title):
+        return title.lower()
+
+    def save(self, *args, **kwargs):
+        self.title_normalized = self.normalize_title(self.title)
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or kwargs.get('force_insert'):
+            self.available_count = self.total_copies - self.rented_count - self.reserved_count
+            super().save(*args, **kwargs)
+            self._loaded_total_copies = self.total_copies
+            return
+        if update_fields is None:
+            # Oceny i liczniki egzemplarzy zmieniają tylko zapytania UPDATE z F() - zapis całego
+            # obiektu nie może nadpisać ich wartościami wczytanymi wcześniej
+            update_fields = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS + self.INVENTORY_FIELDS
+            }
+            if self.total_copies != getattr(self, '_loaded_total_copies', None):
+                update_fields.add('total_copies')
+        update_fields = set(update_fields) - {'rented_count', 'reserved_count', 'available_count'}
+        if 'title' in update_fields:
+            update_fields.add('title_normalized')
+        resize = 'total_copies' in update_fields
+        if resize:
+            # Dostępne egzemplarze przesuwane o różnicę liczone w bazie (Total_copies sprzed
+            # UPDATE) - CHECK odrzuci zejście poniżej liczby wypożyczonych i zarezerwowanych
+            self.available_count = models.F('available_count') + self.total_copies - models.F('total_copies')
+            update_fields.add('available_count')
+        kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if resize:
+            self.refresh_from_db(fields=('rented_count', 'reserved_count', 'available_count'))
+            self._loaded_total_copies = self.total_copies
 
     def __str__(self):
         return self.title
@@ -51,20 +137,68 @@ class Rental(models.Model):
 
     class Meta:
         db_table = 'Rental'
+        indexes = [
+            models.Index(fields=['rent_date', 'id'], name='rental_rent_date_id_idx'),
+            models.Index(fields=['user', 'rent_date'], name='rental_user_rent_date_idx'),
+            models.Index(fields=['status'], name='rental_status_idx'),
+        ]
 
     @classmethod
     def active_rentals(cls):
         return cls.objects.filter(status='wypożyczona')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stan z bazy - na jego podstawie sygnały korygują zestawienie miesięczne i dostępność gry
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         if self.status == "zwrócona" and not self.return_date:
             self.return_date = timezone.now()
-        super().save(*args, **kwargs)
+        # Aktywne wypożyczenie trzyma egzemplarz gry: zwrot albo zmiana gry oddaje egzemplarz
+        # dotychczasowej gry, przywrócenie wypożyczenia albo zmiana gry bierze egzemplarz nowej
+        loaded = getattr(self, '_loaded_values', None) or {}
+        self._released_game = self._taken_game = None
+        if not self._state.adding:
+            was_active = loaded.get('status', self.status) == "wypożyczona"
+            loaded_game = loaded.get('game_id', self.game_id)
+            is_active = self.status == "wypożyczona"
+            if was_active and (not is_active or loaded_game != self.game_id):
+                self._released_game = loaded_game
+            if is_active and (not was_active or loaded_game != self.game_id):
+                self._taken_game = self.game_id
+            if is_active and not was_active:
+                self.return_date = None
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
 
     def __str__(self):
         return f"{self.user} wypożyczył {self.game}"
 
 
+class MonthlyRentalSummary(models.Model):
+    id = models.AutoField(db_column='ID', primary_key=True, blank=True, null=False)
+    year = models.IntegerField(db_column='Year', null=False)
+    month = models.IntegerField(db_column='Month', null=False)
+    game = models.ForeignKey(Game, models.CASCADE, db_column='Game_id', null=False)
+    total = models.IntegerField(db_column='Total', default=0, null=False)
+
+    class Meta:
+        db_table = 'MonthlyRentalSummary'
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'game'], name='monthly_summary_year_month_game_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.game} {self.month:02d}/{self.year}: {self.total}"
+
+
 class Review(models.Model):
     id = models.AutoField(db_column='ID', primary_key=True, blank=True, null=False)
     user = models.ForeignKey('User', models.CASCADE, db_column='User_id', null=False)
@@ -75,6 +209,24 @@ class Review(models.Model):
 
     class Meta:
         db_table = 'Review'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_at_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stan z bazy - na jego podstawie sygnały korygują oceny gry
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
 
     def clean(self):
         if self.rating < 1 or self.rating > 5:
@@ -94,6 +246,107 @@ class Payment(models.Model):
 
     class Meta:
         db_table = 'Payment'
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='payment_payment_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"Płatność {self.amount} PLN dla {self.user}"
+
+
+# Kolejka oczekujących na grę. Pozycja w kolejce wynika z ID (kolejność zgłoszeń), więc
+# pierwszy w kolejce to najmniejsze ID oczekującej rezerwacji gry - odczyt z indeksu częściowego.
+class Reservation(models.Model):
+    id = models.AutoField(db_column='ID', primary_key=True, blank=True, null=False)
+    user = models.ForeignKey('User', models.CASCADE, db_column='User_id', null=False)
+    game = models.ForeignKey(Game, models.CASCADE, db_column='Game_id', null=False)
+    status = models.CharField(db_column='Status', default='oczekuje', max_length=20, null=False)
+    created_at = models.DateTimeField(db_column='Created_at', default=timezone.now, null=False)
+    held_until = models.DateTimeField(db_column='Held_until', blank=True, null=True)
+
+    class Meta:
+        db_table = 'Reservation'
+        indexes = [
+            models.Index(fields=['game', 'id'], condition=models.Q(status='oczekuje'), name='reservation_queue_idx'),
+            models.Index(fields=['held_until'], condition=models.Q(status='odłożona'), name='reservation_hold_idx'),
+            models.Index(fields=['user', 'id'], name='reservation_user_id_idx'),
+        ]
+        constraints = [
+            # Jedna otwarta rezerwacja użytkownika na grę
+            models.UniqueConstraint(fields=['user', 'game'], condition=models.Q(status__in=['oczekuje', 'odłożona']),
+                                    name='reservation_user_game_open_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Rezerwacja: {self.game} dla {self.user} ({self.status})"
+
+
+# Zadanie kolejki skutków ubocznych zapisów (zob. outbox.py); wykonane zadania są usuwane
+class OutboxTask(models.Model):
+    id = models.AutoField(db_column='ID', primary_key=True, blank=True, null=False)
+    name = models.CharField(db_column='Name', max_length=100, null=False)
+    payload = models.JSONField(db_column='Payload', default=dict, null=False)
+    status = models.CharField(db_column='Status', default='oczekuje', max_length=20, null=False)
+    attempts = models.IntegerField(db_column='Attempts', default=0, null=False)
+    available_at = models.DateTimeField(db_column='Available_at', default=timezone.now, null=False)
+    lease = models.CharField(db_column='Lease', max_length=32, blank=True, null=True)
+    leased_until = models.DateTimeField(db_column='Leased_until', blank=True, null=True)
+    last_error = models.TextField(db_column='Last_error', blank=True, null=True)
+    created_at = models.DateTimeField(db_column='Created_at', default=timezone.now, null=False)
+
+    class Meta:
+        db_table = 'OutboxTask'
+        indexes = [
+            models.Index(fields=['available_at', 'id'], condition=models.Q(status='oczekuje'),
+                         name='outbox_pending_idx'),
+            models.Index(fields=['lease'], name='outbox_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# Licznik wersji tabeli - zmieniany przy każdym zapisie, z niego powstają ETagi katalogu
+class TableVersion(models.Model):
+    name = models.CharField(db_column='Name', primary_key=True, max_length=50, null=False)
+    version = models.BigIntegerField(db_column='Version', default=0, null=False)
+    updated_at = models.DateTimeField(db_column='Updated_at', default=timezone.now, null=False)
+
+    class Meta:
+        db_table = 'TableVersion'
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+# Ranking popularności z zanikaniem wykładniczym (GameRental.leaderboard). Wynik jest
+# zapisany względem epoki okna, więc kolejność nie zależy od chwili odczytu.
+class LeaderboardScore(models.Model):
+    id = models.AutoField(db_column='ID', primary_key=True, blank=True, null=False)
+    window = models.CharField(db_column='Window', max_length=20, null=False)
+    dimension = models.CharField(db_column='Dimension', max_length=20, null=False)
+    key = models.CharField(db_column='Key', max_length=255, null=False)
+    score = models.FloatField(db_column='Score', default=0, null=False)
+
+    class Meta:
+        db_table = 'LeaderboardScore'
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'dimension', 'key'], name='leaderboard_window_dimension_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['window', 'dimension', '-score'], name='leaderboard_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.window}/{self.dimension}/{self.key}: {self.score}"
+
+
+class LeaderboardEpoch(models.Model):
+    window = models.CharField(db_column='Window', primary_key=True, max_length=20, null=False)
+    epoch = models.DateTimeField(db_column='Epoch', default=timezone.now, null=False)
+
+    class Meta:
+        db_table = 'LeaderboardEpoch'
+
+    def __str__(self):
+        return f"{self.window}: {self.epoch}"
@@ -0,0 +1,148 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .conf import app_setting
+from .models import OutboxTask
+
+
+# Kolejka zadań w bazie (transactional outbox): enqueue zapisuje zadanie w transakcji
+# zapisu, który je wywołał - wycofanie zapisu wycofuje też zadanie. Zadania wykonuje
+# polecenie outbox_worker (pula wątków), a przy OUTBOX_LOCAL_WORKERS > 0 (domyślnie w profilu
+# dev) także pula wątków procesu serwera zaraz po zatwierdzeniu transakcji
+# (transaction.on_commit), poza obsługą żądania. Wykonawca najpierw dzierżawi zadanie (lease) jednym UPDATE, potem
+# wykonuje je i usuwa w jednej transakcji. Zadanie przerwane awarią wraca do kolejki po
+# wygaśnięciu dzierżawy, więc dostarczenie jest co najmniej jednokrotne: skutki w bazie
+# są zatwierdzane razem z usunięciem zadania, skutki zewnętrzne (np. e-mail) mogą się powtórzyć.
+PENDING = 'oczekuje'
+FAILED = 'nieudane'
+
+logger = logging.getLogger('GameRental.outbox')
+
+HANDLERS = {}
+
+_local_pool = None
+_local_pool_workers = None
+_local_pool_lock = threading.Lock()
+
+
+def task(name):
+    def register(handler):
+        HANDLERS[name] = handler
+        return handler
+    return register
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def enqueue(name, **payload):
+    if name not in HANDLERS:
+        raise LookupError(f"Nieznane zadanie: {name}")
+    outbox_task = OutboxTask.objects.create(name=name, payload=payload)
+    if app_setting('OUTBOX_LOCAL_WORKERS'):
+        transaction.on_commit(lambda: local_pool().submit(run_local, outbox_task.pk))
+    return outbox_task
+
+
+def local_pool():
+    # Pula odtwarzana po zmianie jej rozmiaru w ustawieniach
+    global _local_pool, _local_pool_workers
+    workers = app_setting('OUTBOX_LOCAL_WORKERS')
+    with _local_pool_lock:
+        if _local_pool is None or _local_pool_workers != workers:
+            if _local_pool is not None:
+                _local_pool.shutdown(wait=False)
+            _local_pool = ThreadPoolExecutor(workers, thread_name_prefix='outbox')
+            _local_pool_workers = workers
+        return _local_pool
+
+
+def run_local(pk):
+    try:
+        for outbox_task in claim(ids=[pk]):
+            run(outbox_task)
+    except Exception:
+        # Zadanie zostaje w kolejce - wykona je outbox_worker po wygaśnięciu dzierżawy
+        logger.exception("Zadanie %s nie zostało wykonane lokalnie", pk)
+    finally:
+        connections.close_all()
+
+
+def claim(batch_size=None, ids=None, now=None):
+    now = now or timezone.now()
+    lease = uuid.uuid4().hex
+    claimable = Q(status=PENDING, available_at__lte=now) & (Q(leased_until__isnull=True) | Q(leased_until__lte=now))
+    if ids is not None:
+        claimable &= Q(pk__in=ids)
+    batch = (
+        OutboxTask.objects.filter(claimable).order_by('available_at', 'id')
+        .values('pk')[:batch_size or app_setting('OUTBOX_BATCH_SIZE')]
+    )
+    # Warunek powtórzony poza podzapytaniem - równoległy wykonawca nie przejmie tych samych zadań
+    claimed = OutboxTask.objects.filter(claimable, pk__in=batch).update(
+        lease=lease, leased_until=now + timedelta(seconds=app_setting('OUTBOX_LEASE_SECONDS')),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+    return list(OutboxTask.objects.filter(lease=lease).order_by('available_at', 'id'))
+
+
+def run(outbox_task):
+    try:
+        with transaction.atomic():
+            # Usunięcie zadania na początku transakcji: na SQLite od razu bierze blokadę zapisu,
+            # a przy dzierżawie przejętej przez innego wykonawcę skutki nie są zatwierdzane
+            if not OutboxTask.objects.filter(pk=outbox_task.pk, lease=outbox_task.lease).delete()[0]:
+                raise LeaseLost()
+            handler = HANDLERS.get(outbox_task.name)
+            if handler is None:
+                raise LookupError(f"Nieznane zadanie: {outbox_task.name}")
+            handler(**outbox_task.payload)
+    except LeaseLost:
+        return False
+    except Exception as exc:
+        logger.exception("Zadanie %s (%s) nie powiodło się", outbox_task.pk, outbox_task.name)
+        fail(outbox_task, exc)
+        return False
+    return True
+
+
+def fail(outbox_task, exc, now=None):
+    now = now or timezone.now()
+    # Kolejna próba z wykładniczo rosnącym opóźnieniem, po OUTBOX_MAX_ATTEMPTS zadanie zostaje jako nieudane
+    delay = min(app_setting('OUTBOX_RETRY_DELAY') * 2 ** (outbox_task.attempts - 1), 3600)
+    status = FAILED if outbox_task.attempts >= app_setting('OUTBOX_MAX_ATTEMPTS') else PENDING
+    OutboxTask.objects.filter(pk=outbox_task.pk, lease=outbox_task.lease).update(
+        status=status, available_at=now + timedelta(seconds=delay), lease=None, leased_until=None,
+        last_error=f"{type(exc).__name__}: {exc}",
+    )
+
+
+def run_pending(batch_size=None):
+    # Wszystkie zadania gotowe do wykonania; wynik - (wykonane, nieudane)
+    done = failed = 0
+    while True:
+        batch = claim(batch_size)
+        if not batch:
+            return done, failed
+        for outbox_task in batch:
+            if run(outbox_task):
+                done += 1
+            else:
+                failed += 1
+
+
+def retry_failed(names=None):
+    tasks = OutboxTask.objects.filter(status=FAILED)
+    if names:
+        tasks = tasks.filter(name__in=names)
+    return tasks.update(status=PENDING, attempts=0, available_at=timezone.now(), last_error=None)
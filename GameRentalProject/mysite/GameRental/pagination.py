@@ -0,0 +1,144 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+# Stronicowanie kursorowe (keyset) - kolejna strona to zapytanie
+# "WHERE (kolumna, id) < (ostatnia_wartość, ostatnie_id) ORDER BY kolumna, id LIMIT n" po indeksie,
+# więc strona N kosztuje tyle samo co strona 1. Kursor zawiera wartości wszystkich pól sortowania,
+# a id na końcu rozstrzyga remisy (np. wypożyczenia z bulk_checkout z tą samą datą) bez OFFSET.
+class KeysetPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+
+    # Logika CursorPagination.paginate_queryset rozdzielona na zbudowanie zapytania strony
+    # i przetworzenie wyników, żeby widoki asynchroniczne mogły pobrać stronę przez aiterator
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.paginate_results(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.paginate_results([obj async for obj in page_queryset])
+
+    def page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self.offset, self.reverse, self.current_position) = (0, False, None)
+        else:
+            (self.offset, self.reverse, self.current_position) = self.cursor
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            queryset = queryset.filter(self.after_position(self.current_position))
+
+        # Jeden wiersz ponad stronę mówi, czy istnieje następna
+        return queryset[self.offset:self.offset + self.page_size + 1]
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def after_position(self, position):
+        # (a, b, id) > (x, y, z) jako a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition, equal = Q(pk__in=[]), Q()
+        for order, value in zip(self.ordering, values):
+            attr = order.lstrip('-')
+            lookup = '__lt' if self.cursor.reverse != order.startswith('-') else '__gt'
+            if value is None:
+                equal &= Q(**{attr + '__isnull': True})
+                continue
+            condition |= equal & Q(**{attr + lookup: value})
+            equal &= Q(**{attr: value})
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            attr = order.lstrip('-')
+            value = instance[attr] if isinstance(instance, dict) else getattr(instance, attr)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def paginate_results(self, results):
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if self.reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (self.current_position is not None) or (self.offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = self.current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (self.current_position is not None) or (self.offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = self.current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class GamePagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class RentalPagination(KeysetPagination):
+    ordering = ('-rent_date', '-id')
+
+
+class ReviewPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class PaymentPagination(KeysetPagination):
+    ordering = ('-payment_date', '-id')
+
+
+class ReservationPagination(KeysetPagination):
+    ordering = ('-id',)
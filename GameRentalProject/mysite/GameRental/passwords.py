@@ -0,0 +1,82 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .conf import app_setting
+
+
+# Haszowanie haseł (PBKDF2 - setki tysięcy iteracji) w puli procesów: nie zajmuje GIL
+# potrzebnego pozostałym wątkom serwera. Wątek żądania nadal czeka na wynik, więc zysk to
+# ograniczenie równoległych haszowań: pula ma PASSWORD_HASH_WORKERS procesów i najwyżej
+# PASSWORD_HASH_QUEUE zadań oczekujących - gdy wszystkie miejsca są zajęte, żądanie od razu
+# dostaje 503 zamiast czekać w rosnącej kolejce. PASSWORD_HASH_WORKERS = 0 - haszowanie
+# w wątku żądania, bez puli.
+class HasherBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Serwer jest przeciążony, spróbuj ponownie za chwilę."
+    default_code = 'hasher_busy'
+    # Nagłówek Retry-After w odpowiedzi
+    wait = 1
+
+
+class HasherPool:
+    def __init__(self, workers, queue):
+        self.config = (workers, queue)
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        # spawn - procesy potomne bez kopii wątków i połączeń z bazą procesu serwera
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hasher_pool():
+    # Pula odtwarzana po zmianie jej rozmiaru w ustawieniach
+    global _pool
+    config = (app_setting('PASSWORD_HASH_WORKERS'), app_setting('PASSWORD_HASH_QUEUE'))
+    with _pool_lock:
+        if _pool is None or _pool.config != config:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = HasherPool(*config)
+        return _pool
+
+
+def _call(fn, *args):
+    if not app_setting('PASSWORD_HASH_WORKERS'):
+        return fn(*args)
+    return hasher_pool().run(fn, *args)
+
+
+def _verify(password, encoded):
+    # Wynik - (czy hasło pasuje, nowy skrót, gdy zmieniły się parametry hashera)
+    updated = []
+    valid = check_password(password, encoded, setter=lambda raw: updated.append(make_password(raw)))
+    return valid, updated[0] if updated else None
+
+
+def hash_password(password):
+    return _call(make_password, password)
+
+
+def verify_password(password, encoded):
+    return _call(_verify, password, encoded)
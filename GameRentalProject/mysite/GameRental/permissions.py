@@ -1,11 +1,13 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from .users import get_domain_user
 
 
 class IsAdminOrOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        return hasattr(obj, 'user') and obj.user.username == request.user.username
+        domain_user = get_domain_user(request)
+        return hasattr(obj, 'user_id') and domain_user is not None and obj.user_id == domain_user.pk
 
 class IsOwnerOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -13,4 +15,5 @@ class IsOwnerOrReadOnly(BasePermission):
             return True
         elif request.method in SAFE_METHODS:
             return True
-        return obj.user == request.user
+        domain_user = get_domain_user(request)
+        return domain_user is not None and obj.user_id == domain_user.pk
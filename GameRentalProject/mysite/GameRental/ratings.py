@@ -0,0 +1,105 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Game, Review
+from .versioning import GAME_CATALOG, bump_version, bump_versions, game_version
+
+
+# Oceny gier utrzymywane przyrostowo: liczba recenzji, suma ocen, rozkład 1-5 i średnia
+# na wierszu Game. Każda zmiana recenzji to jedno UPDATE z F() na wiersz gry - bez
+# odczytu aktualnych wartości, więc równoległe zapisy się nie gubią.
+RATINGS = range(1, 6)
+
+
+def histogram_field(rating):
+    return f'rating_{rating}' if rating in RATINGS else None
+
+
+def review_key(review):
+    return review.game_id, review.rating
+
+
+def loaded_review_key(review):
+    # Klucz według stanu wczytanego z bazy (Review.from_db); None dla nowych obiektów
+    loaded = getattr(review, '_loaded_values', None)
+    if loaded is None:
+        return None
+    return loaded.get('game_id', review.game_id), loaded.get('rating', review.rating)
+
+
+def _average(count, total):
+    # Wyrażenie liczone na wartościach sprzed UPDATE; bez recenzji średnia to 0
+    return Case(
+        When(review_count__gt=-count, then=Cast(F('rating_sum') + total, FloatField()) / (F('review_count') + count)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_deltas(deltas):
+    # deltas: {(game_id, ocena): zmiana liczby recenzji}
+    by_game = defaultdict(Counter)
+    for (game_id, rating), delta in deltas.items():
+        if delta:
+            by_game[game_id][rating] += delta
+    if not by_game:
+        return
+    with transaction.atomic():
+        for game_id, ratings in by_game.items():
+            count = sum(ratings.values())
+            total = sum(rating * delta for rating, delta in ratings.items())
+            updates = {
+                'review_count': F('review_count') + count,
+                'rating_sum': F('rating_sum') + total,
+                'average_rating': _average(count, total),
+            }
+            for rating, delta in ratings.items():
+                field = histogram_field(rating)
+                if field is not None and delta:
+                    updates[field] = F(field) + delta
+            Game.objects.filter(pk=game_id).update(**updates)
+        # UPDATE omija sygnały Game - oceny są częścią odpowiedzi katalogu
+        bump_versions(game_version(game_id) for game_id in by_game)
+
+
+def record_review_saved(review, created):
+    new_key = review_key(review)
+    old_key = None if created else loaded_review_key(review)
+    deltas = Counter()
+    if old_key != new_key:
+        deltas[new_key] += 1
+        if old_key is not None:
+            deltas[old_key] -= 1
+    apply_review_deltas(deltas)
+
+
+def record_review_deleted(review):
+    apply_review_deltas({loaded_review_key(review) or review_key(review): -1})
+
+
+def rebuild_game_ratings(game_ids=None, using='default'):
+    reviews = Review.objects.filter(game=OuterRef('pk')).order_by().values('game')
+
+    def aggregate(expression, default=0):
+        return Coalesce(Subquery(reviews.annotate(value=expression).values('value')), Value(default))
+
+    games = Game.objects.using(using)
+    if game_ids is not None:
+        games = games.filter(pk__in=game_ids)
+    updates = {
+        'review_count': aggregate(Count('id')),
+        'rating_sum': aggregate(Sum('rating')),
+        'average_rating': aggregate(Cast(Avg('rating'), FloatField()), 0.0),
+    }
+    for rating in RATINGS:
+        updates[histogram_field(rating)] = aggregate(Count('id', filter=Q(rating=rating)))
+    with transaction.atomic(using=using):
+        updated = games.update(**updates)
+        if game_ids is None:
+            bump_version(GAME_CATALOG, using)
+        else:
+            bump_versions((game_version(game_id) for game_id in game_ids), using)
+    return updated
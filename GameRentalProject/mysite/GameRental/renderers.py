@@ -0,0 +1,46 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from .conf import app_setting
+from .metrics import current_metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSONRenderer zgłaszający czas kodowania JSON do metryk żądania (czas serializer.data
+# mierzą serializery - serializers.MeasuredDataMixin). Przy FAST_JSON_RENDERER
+# i zainstalowanym orjson kodowanie robi orjson z wynikiem takim jak json.dumps DRF
+# (zwięzły zapis, bez escapowania znaków spoza ASCII). Różnić się mogą tylko liczby
+# zmiennoprzecinkowe w notacji wykładniczej (1e+16 i 1e16) oraz NaN/Infinity (orjson
+# zapisuje null) - odpowiedzi API takich wartości nie zawierają.
+class MeasuredJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            if self.use_orjson(data, accepted_media_type, renderer_context):
+                try:
+                    return self.render_orjson(data)
+                except (TypeError, orjson.JSONEncodeError):
+                    pass
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics = current_metrics((renderer_context or {}).get('request'))
+            if metrics is not None:
+                metrics.add_render_time(time.perf_counter() - started)
+
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or not app_setting('FAST_JSON_RENDERER'):
+            return False
+        if not self.compact or self.ensure_ascii:
+            return False
+        # Wcięcia (?indent / Accept: ...; indent=) tylko przez zwykły JSONRenderer
+        return self.get_indent(accepted_media_type or '', renderer_context or {}) is None
+
+    def render_orjson(self, data):
+        content = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        # Jak JSONRenderer: U+2028 i U+2029 escapowane dla zgodności z JavaScriptem
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,159 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.mail import send_mass_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .conf import app_setting
+from .inventory import move_copies
+from .models import Game, Reservation
+from .outbox import enqueue, task
+
+
+# Kolejka oczekujących na gry. Zwolniony egzemplarz (services.release_games, wywoływane
+# w transakcji Rental.save) trafia od razu do pierwszych w kolejce: przechodzi z dostępnych
+# do zarezerwowanych, a rezerwacja dostaje termin odbioru. Odłożony egzemplarz wypożyczy
+# tylko właściciel rezerwacji (services.checkout); po terminie polecenie expire_reservations
+# zwraca egzemplarz do puli i przekazuje go następnemu w kolejce.
+WAITING = 'oczekuje'
+HELD = 'odłożona'
+FULFILLED = 'zrealizowana'
+EXPIRED = 'wygasła'
+CANCELLED = 'anulowana'
+
+
+class AlreadyQueued(Exception):
+    pass
+
+
+def reserve(user, game):
+    game_id = getattr(game, 'pk', game)
+    try:
+        with transaction.atomic():
+            reservation = Reservation.objects.create(user=user, game_id=game_id)
+            hand_over([game_id])
+    except IntegrityError:
+        raise AlreadyQueued()
+    reservation.refresh_from_db(fields=('status', 'held_until'))
+    return reservation
+
+
+def hand_over(game_ids, now=None):
+    # Wolne egzemplarze dla pierwszych w kolejce. Gry z wolnymi egzemplarzami i kolejką - jedno
+    # zapytanie z EXISTS; potem dla każdej z nich tylko `available` pierwszych wierszy kolejki
+    # po indeksie reservation_queue_idx, bez przechodzenia całej kolejki
+    waiting = Reservation.objects.filter(game=OuterRef('pk'), status=WAITING)
+    games = (
+        Game.objects.filter(pk__in=list(game_ids), available_count__gt=0)
+        .filter(Exists(waiting)).values_list('pk', 'available_count')
+    )
+    heads = [
+        (pk, game_id)
+        for game_id, available in games
+        for pk in Reservation.objects.filter(game_id=game_id, status=WAITING)
+        .order_by('id').values_list('pk', flat=True)[:available]
+    ]
+    if not heads:
+        return 0
+    counts = Counter(game_id for _, game_id in heads)
+    try:
+        with transaction.atomic():
+            # Liczniki zmienione równolegle - egzemplarze zostają w puli, przekaże je expire_reservations
+            if move_copies(counts, 'available', 'reserved') != len(counts):
+                raise IntegrityError()
+            now = now or timezone.now()
+            Reservation.objects.filter(pk__in=[pk for pk, _ in heads], status=WAITING).update(
+                status=HELD, held_until=now + timedelta(seconds=app_setting('RESERVATION_HOLD_TTL')),
+            )
+            enqueue('reservations.notify_holds', reservations=[pk for pk, _ in heads])
+    except IntegrityError:
+        return 0
+    return len(heads)
+
+
+# Powiadomienie o odłożonym egzemplarzu - wysyłane przez kolejkę zadań, poza transakcją zwrotu
+@task('reservations.notify_holds')
+def notify_holds(reservations):
+    messages = []
+    for reservation in Reservation.objects.filter(pk__in=reservations, status=HELD).select_related('user', 'game'):
+        held_until = timezone.localtime(reservation.held_until).strftime('%Y-%m-%d %H:%M')
+        messages.append((
+            f"Gra {reservation.game.title} czeka na odbiór",
+            f"Egzemplarz gry {reservation.game.title} jest odłożony dla Ciebie do {held_until}.",
+            None, [reservation.user.email],
+        ))
+    send_mass_mail(messages, fail_silently=False)
+
+
+def claim_hold(user_id, game_id, now=None):
+    # Wypożyczenie odłożonego egzemplarza przez właściciela rezerwacji
+    return Reservation.objects.filter(
+        user_id=user_id, game_id=game_id, status=HELD, held_until__gt=now or timezone.now(),
+    ).update(status=FULFILLED)
+
+
+def cancel(reservation):
+    # O zwolnieniu egzemplarza decyduje stan w bazie, a nie wczytany obiekt. Najpierw oczekująca,
+    # potem odłożona - rezerwacja przechodzi tylko z oczekującej do odłożonej, więc równoległe
+    # odłożenie między oboma UPDATE trafi do drugiego z nich
+    with transaction.atomic():
+        if not Reservation.objects.filter(pk=reservation.pk, status=WAITING).update(status=CANCELLED):
+            if not Reservation.objects.filter(pk=reservation.pk, status=HELD).update(status=CANCELLED):
+                return False
+            move_copies({reservation.game_id: 1}, 'reserved', 'available')
+            hand_over([reservation.game_id])
+    reservation.status = CANCELLED
+    return True
+
+
+def expire_holds(now=None, batch_size=None):
+    # Wygasłe odłożenia paczkami: egzemplarze wracają do puli i od razu do następnych w kolejce
+    now = now or timezone.now()
+    batch_size = batch_size or app_setting('RESERVATION_SWEEP_BATCH')
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Reservation.objects.filter(status=HELD, held_until__lte=now)
+                .order_by('held_until').values_list('pk', 'game_id')[:batch_size]
+            )
+            if not batch:
+                break
+            Reservation.objects.filter(pk__in=[pk for pk, _ in batch]).update(status=EXPIRED)
+            counts = Counter(game_id for _, game_id in batch)
+            move_copies(counts, 'reserved', 'available')
+            hand_over(counts, now)
+        expired += len(batch)
+    return expired
+
+
+def hand_over_waiting(now=None):
+    # Oczekujący przy wolnych egzemplarzach - np. po zwiększeniu liczby egzemplarzy gry
+    game_ids = (
+        Reservation.objects.filter(status=WAITING, game__available_count__gt=0)
+        .order_by().values_list('game_id', flat=True).distinct()
+    )
+    with transaction.atomic():
+        return hand_over(list(game_ids), now)
+
+
+def with_queue_position(queryset):
+    ahead = (
+        Reservation.objects.filter(game=OuterRef('game'), status=WAITING, id__lte=OuterRef('pk'))
+        .order_by().values('game').annotate(count=Count('id')).values('count')
+    )
+    return queryset.annotate(queue_position=Subquery(ahead))
+
+
+def queue_position(reservation):
+    # Miejsce w kolejce oczekujących (1 = następny); None dla rezerwacji, która już nie czeka
+    if reservation.status != WAITING:
+        return None
+    position = getattr(reservation, 'queue_position', None)
+    if position is None:
+        position = Reservation.objects.filter(
+            game_id=reservation.game_id, status=WAITING, id__lte=reservation.pk,
+        ).count()
+    return position
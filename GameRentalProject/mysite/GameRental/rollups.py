@@ -0,0 +1,122 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .filters import month_range
+from .models import MonthlyRentalSummary, Rental
+
+
+# Zestawienie miesięczne wypożyczeń utrzymywane przyrostowo: (rok, miesiąc, gra) -> liczba.
+def rental_period(rent_date):
+    if timezone.is_aware(rent_date):
+        rent_date = timezone.localtime(rent_date)
+    return rent_date.year, rent_date.month
+
+
+def rental_key(rental):
+    return rental_period(rental.rent_date) + (rental.game_id,)
+
+
+def apply_rental_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    with transaction.atomic():
+        if len(deltas) <= 2:
+            # Pojedynczy zapis (lub przeniesienie wypożyczenia) - bezpośrednie UPDATE z F()
+            for (year, month, game_id), delta in deltas.items():
+                _apply_delta(year, month, game_id, delta)
+        elif deltas:
+            _apply_deltas_in_bulk(deltas)
+
+
+def _apply_delta(year, month, game_id, delta):
+    rows = MonthlyRentalSummary.objects.filter(year=year, month=month, game_id=game_id)
+    if rows.update(total=F('total') + delta) or delta < 0:
+        # Brak wiersza przy zmniejszaniu oznacza, że gra jest właśnie usuwana kaskadowo
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRentalSummary.objects.create(year=year, month=month, game_id=game_id, total=delta)
+    except IntegrityError:
+        rows.update(total=F('total') + delta)
+
+
+def _apply_deltas_in_bulk(deltas):
+    # Operacje masowe - stała liczba zapytań niezależnie od liczby kluczy
+    condition = Q()
+    for year, month, game_id in deltas:
+        condition |= Q(year=year, month=month, game_id=game_id)
+    rows = MonthlyRentalSummary.objects.select_for_update().filter(condition)
+    existing = {(row.year, row.month, row.game_id): row for row in rows}
+    for key, row in existing.items():
+        row.total = F('total') + deltas[key]
+    MonthlyRentalSummary.objects.bulk_update(existing.values(), ['total'], batch_size=500)
+
+    missing = [
+        MonthlyRentalSummary(year=year, month=month, game_id=game_id, total=delta)
+        for (year, month, game_id), delta in deltas.items()
+        if delta > 0 and (year, month, game_id) not in existing
+    ]
+    try:
+        with transaction.atomic():
+            MonthlyRentalSummary.objects.bulk_create(missing, batch_size=500)
+    except IntegrityError:
+        # Wiersz dodany równolegle - te klucze dopisujemy pojedynczo
+        for row in missing:
+            _apply_delta(row.year, row.month, row.game_id, row.total)
+
+
+def loaded_rental_key(rental):
+    # Klucz według stanu wczytanego z bazy (Rental.from_db); None dla nowych obiektów
+    loaded = getattr(rental, '_loaded_values', None)
+    if loaded is None:
+        return None
+    rent_date = loaded['rent_date'] if 'rent_date' in loaded else rental.rent_date
+    game_id = loaded['game_id'] if 'game_id' in loaded else rental.game_id
+    return rental_period(rent_date) + (game_id,)
+
+
+def record_rental_saved(rental, created):
+    new_key = rental_key(rental)
+    old_key = None if created else loaded_rental_key(rental)
+    deltas = Counter()
+    if old_key is None:
+        deltas[new_key] += 1
+    elif old_key != new_key:
+        deltas[old_key] -= 1
+        deltas[new_key] += 1
+    apply_rental_deltas(deltas)
+
+
+def record_rental_deleted(rental):
+    apply_rental_deltas({loaded_rental_key(rental) or rental_key(rental): -1})
+
+
+def record_rentals_created(rentals):
+    apply_rental_deltas(Counter(rental_key(rental) for rental in rentals))
+
+
+def rebuild_monthly_summary(year=None, month=None, using='default'):
+    rentals = Rental.objects.using(using)
+    summary = MonthlyRentalSummary.objects.using(using)
+    if year is not None and month is not None:
+        start, end = month_range(year, month)
+        rentals = rentals.filter(rent_date__gte=start, rent_date__lt=end)
+        summary = summary.filter(year=year, month=month)
+
+    totals = (
+        rentals.annotate(year=ExtractYear('rent_date'), month=ExtractMonth('rent_date'))
+        .values('year', 'month', 'game_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic(using=using):
+        summary.delete()
+        MonthlyRentalSummary.objects.using(using).bulk_create(
+            (MonthlyRentalSummary(year=row['year'], month=row['month'], game_id=row['game_id'], total=row['total'])
+             for row in totals.iterator(chunk_size=2000)),
+            batch_size=1000,
+        )
+    return summary.count()
@@ -0,0 +1,168 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .cache import LRUCache
+from .conf import app_setting
+from .models import TableVersion
+from .versioning import bump_version
+
+
+# Odczyty z repliki (REPLICA_DATABASE): żądania GET/HEAD/OPTIONS czytają z repliki, zapisy
+# zawsze idą do bazy głównej. Pierwszy zapis w żądaniu przypina jego dalsze odczyty do bazy
+# głównej, a ciasteczko PIN_COOKIE przypina kolejne żądania klienta na REPLICA_LAG_TOLERANCE
+# sekund - klient widzi własne zapisy. Widoki raportów (read_replica = True) czytają z repliki
+# także w przypiętych żądaniach. Replika opóźniona bardziej niż REPLICA_LAG_TOLERANCE nie
+# jest używana. Poza żądaniem (polecenia, kolejka zadań, powłoka) wszystko idzie do bazy głównej.
+# Opóźnienie repliki: na PostgreSQL z pozycji WAL, na SQLite z wiersza HEARTBEAT w TableVersion,
+# podbijanego po zatwierdzonych zapisach do bazy głównej (najwyżej raz na
+# REPLICA_HEARTBEAT_INTERVAL sekund - o tyle opóźnienie może być niedoszacowane).
+PRIMARY = DEFAULT_DB_ALIAS
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Tokeny, konta i sesje zawsze z bazy głównej - świeżo wydany token działa od razu
+PRIMARY_APPS = {'auth', 'authtoken', 'sessions'}
+HEARTBEAT = 'heartbeat'
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_state = contextvars.ContextVar('GameRental.db_routing', default=None)
+_lag_checks = LRUCache(maxsize=16)
+_last_heartbeat = None
+
+
+class RoutingState:
+    def __init__(self, replica, pinned=False):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    alias = app_setting('REPLICA_DATABASE')
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    # Odczyty w bloku z repliki, dopóki nie nastąpi zapis; bez skonfigurowanej repliki - bez zmian
+    alias = replica_alias()
+    if alias is None:
+        yield None
+        return
+    token = _state.set(RoutingState(alias, pinned))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def heartbeat():
+    global _last_heartbeat
+    _last_heartbeat = time.monotonic()
+    connection = connections[PRIMARY]
+    connection._heartbeat_pending = False
+    connection._writing_heartbeat = True
+    try:
+        bump_version(HEARTBEAT, PRIMARY)
+    except DatabaseError:
+        # Np. migracje przed utworzeniem tabeli TableVersion
+        pass
+    finally:
+        connection._writing_heartbeat = False
+
+
+def flush_heartbeat():
+    # Znacznik po zatwierdzonych zapisach połączenia - najwyżej raz na REPLICA_HEARTBEAT_INTERVAL
+    # sekund w procesie; do tego czasu zapisy czekają na kolejne zapytanie lub koniec żądania
+    connection = connections[PRIMARY]
+    if not getattr(connection, '_heartbeat_pending', False) or connection.in_atomic_block:
+        return
+    if _last_heartbeat is None or time.monotonic() - _last_heartbeat >= app_setting('REPLICA_HEARTBEAT_INTERVAL'):
+        heartbeat()
+
+
+def heartbeat_wrapper(execute, sql, params, many, context):
+    connection = context['connection']
+    if connection.alias != PRIMARY or getattr(connection, '_writing_heartbeat', False):
+        return execute(sql, params, many, context)
+    # Zapis w trybie autocommit jest już zatwierdzony, ale jego wyniki (INSERT ... RETURNING)
+    # mogą być jeszcze nieodczytane - znacznik trafia do bazy dopiero przed następnym zapytaniem
+    flush_heartbeat()
+    result = execute(sql, params, many, context)
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS) and replica_alias() is not None:
+        connection._heartbeat_pending = True
+    return result
+
+
+def install_heartbeat(connection):
+    if connection.vendor != 'postgresql' and heartbeat_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(heartbeat_wrapper)
+
+
+def replica_lag(alias):
+    if connections[alias].vendor == 'postgresql':
+        return _wal_lag(alias)
+    # Replika bez najnowszego znacznika nie ma któregoś zapisu - opóźnienie liczone od
+    # ostatniego zapisu, który już ma
+    primary = TableVersion.objects.using(PRIMARY).filter(name=HEARTBEAT).values_list('version', 'updated_at').first()
+    if primary is None:
+        return 0
+    replicated = TableVersion.objects.using(alias).filter(name=HEARTBEAT).values_list('version', 'updated_at').first()
+    if replicated is not None and replicated[0] >= primary[0]:
+        return 0
+    return (timezone.now() - (replicated or primary)[1]).total_seconds()
+
+
+def _wal_lag(alias):
+    with connections[PRIMARY].cursor() as cursor:
+        cursor.execute('SELECT pg_current_wal_lsn()')
+        position = cursor.fetchone()[0]
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn, '
+            'EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())',
+            [position],
+        )
+        caught_up, lag = cursor.fetchone()
+    # NULL - baza nie jest serwerem zapasowym (np. TEST MIRROR w testach)
+    if caught_up is None or caught_up:
+        return 0
+    return float('inf') if lag is None else float(lag)
+
+
+def replica_usable(alias):
+    # Wynik sprawdzenia opóźnienia trzymany przez REPLICA_LAG_CHECK_INTERVAL sekund
+    checked = _lag_checks.get(alias)
+    now = time.monotonic()
+    if checked is None or checked[1] + app_setting('REPLICA_LAG_CHECK_INTERVAL') <= now:
+        try:
+            usable = replica_lag(alias) <= app_setting('REPLICA_LAG_TOLERANCE')
+        except DatabaseError:
+            usable = False
+        checked = (usable, now)
+        _lag_checks.set(alias, checked)
+    return checked[0]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned or model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        # Odczyt w transakcji zapisu musi widzieć jej zmiany
+        if connections[PRIMARY].in_atomic_block or not replica_usable(state.replica):
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
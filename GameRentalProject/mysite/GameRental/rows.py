@@ -0,0 +1,153 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .metrics import measuring_serialization
+
+
+# Szybka ścieżka serializacji list: wiersze czytane krotkami (values_list) zamiast obiektów
+# modeli, a pola serializera zamienione raz na listę (nazwa, rodzaj, indeks kolumny, funkcja).
+# Funkcje to to_representation tych samych pól DRF, więc wynik jest identyczny jak z
+# ModelSerializer(many=True). Pola metod (SerializerMethodField) dostają krotkę nazwaną
+# z wszystkimi kolumnami modelu - mogą czytać atrybuty, ale nie relacje ani metody modelu.
+# Rozwinięte obiekty powiązane (?expand=) to kolumny z prefiksem "relacja__" w tym samym
+# zapytaniu (JOIN), serializowane przez zagnieżdżony RowSerializer.
+
+# Typy, dla których kolumna z bazy jest już wartością wyjściową
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                      serializers.FloatField)
+COLUMN, METHOD, NESTED = range(3)
+
+
+class RowSerializer:
+    def __init__(self, serializer, prefix=''):
+        model = serializer.Meta.model
+        fields = list(serializer._readable_fields)
+        self.prefix = prefix
+        # Pola metod mogą czytać dowolny atrybut - wtedy pobierane są wszystkie kolumny modelu
+        if any(isinstance(field, serializers.SerializerMethodField) for field in fields):
+            self.attnames = [field.attname for field in model._meta.concrete_fields]
+        else:
+            self.attnames = []
+        self.row_class = namedtuple('Row', self.attnames) if prefix and self.attnames else None
+        self.columns = [prefix + attname for attname in self.attnames]
+        self.mappers = []
+        for field in fields:
+            if isinstance(field, serializers.SerializerMethodField):
+                self.mappers.append((field.field_name, METHOD, None, getattr(field.parent, field.method_name)))
+            elif isinstance(field, serializers.ModelSerializer):
+                nested = RowSerializer(field, f'{prefix}{self.relation(model, field)}__')
+                self.mappers.append((field.field_name, NESTED, len(self.columns), nested))
+                self.columns.extend(nested.columns)
+            else:
+                index = self.add_column(prefix + self.column(model, field))
+                self.mappers.append((field.field_name, COLUMN, index, self.mapper(field)))
+
+    def add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return self.columns.index(column)
+
+    @staticmethod
+    def column(model, field):
+        # Tylko pola wprost z kolumny modelu; źródła z kropką i inne pola relacji nie
+        if isinstance(field, serializers.BaseSerializer) or '.' in field.source:
+            raise TypeError(field)
+        if isinstance(field, serializers.RelatedField) and not (
+                isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None):
+            raise TypeError(field)
+        model_field = model._meta.get_field(field.source)
+        if not model_field.concrete:
+            raise TypeError(field)
+        return model_field.attname
+
+    @staticmethod
+    def relation(model, field):
+        # Zagnieżdżony obiekt tylko przez wymagany klucz obcy - JOIN zawsze zwraca wiersz
+        model_field = model._meta.get_field(field.source)
+        if not model_field.many_to_one or model_field.null:
+            raise TypeError(field)
+        return model_field.name
+
+    @staticmethod
+    def mapper(field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField) or type(field) in PASSTHROUGH_FIELDS:
+            return None
+        if type(field) is serializers.DateTimeField and iso_datetime_field(field):
+            return DateTimeMapper(field)
+        return field.to_representation
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def for_serializer(cls, serializer_class, fields=None, expand=()):
+        # None, gdy serializer ma pola spoza obsługiwanego zakresu - widok używa wtedy zwykłej ścieżki
+        kwargs = {'fields': fields, 'expand': expand} if fields is not None or expand else {}
+        try:
+            return cls(serializer_class(**kwargs))
+        except (TypeError, FieldDoesNotExist):
+            return None
+
+    def queryset(self, queryset, extra=()):
+        # extra - dodatkowe kolumny wiersza, np. pola sortowania potrzebne do kursora strony
+        columns = self.columns + [column for column in extra if column not in self.columns]
+        return queryset.values_list(*columns, named=True)
+
+    def bind(self):
+        # Strefa czasowa jest ustalana raz na listę, a nie dla każdej wartości
+        bound = []
+        for name, kind, index, mapper in self.mappers:
+            if isinstance(mapper, DateTimeMapper):
+                mapper = mapper.bind()
+            elif kind is NESTED:
+                mapper = (mapper, mapper.bind())
+            bound.append((name, kind, index, mapper))
+        return bound
+
+    def to_representation(self, row, mappers):
+        data = {}
+        method_row = None
+        for name, kind, index, mapper in mappers:
+            if kind is COLUMN:
+                value = row[index]
+                data[name] = value if value is None or mapper is None else mapper(value)
+            elif kind is METHOD:
+                if method_row is None:
+                    method_row = self.row_class._make(row[:len(self.attnames)]) if self.row_class else row
+                data[name] = mapper(method_row)
+            else:
+                nested, nested_mappers = mapper
+                data[name] = nested.to_representation(row[index:index + len(nested.columns)], nested_mappers)
+        return data
+
+    def data(self, rows):
+        with measuring_serialization():
+            mappers = self.bind()
+            to_representation = self.to_representation
+            return [to_representation(row, mappers) for row in rows]
+
+
+def iso_datetime_field(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    return (settings.USE_TZ and not hasattr(field, 'timezone')
+            and isinstance(output_format, str) and output_format.lower() == ISO_8601)
+
+
+# DateTimeField.to_representation bez odczytu bieżącej strefy czasowej przy każdej wartości
+class DateTimeMapper:
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field, current_timezone = self.field, timezone.get_current_timezone()
+
+        def to_representation(value):
+            if timezone.is_naive(value):
+                return field.to_representation(value)
+            value = value.astimezone(current_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return to_representation
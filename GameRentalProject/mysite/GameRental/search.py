@@ -0,0 +1,102 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Game
+
+
+# Wyszukiwanie gier: prefiks tytułu po zindeksowanej kolumnie Title_normalized oraz
+# wyszukiwanie pełnotekstowe po tytule, gatunku i platformie (FTS5 na SQLite).
+SEARCH_TABLE = 'GameSearch'
+TITLE_WEIGHT, GENRE_WEIGHT, PLATFORM_WEIGHT = 10.0, 2.0, 1.0
+
+_WORD = re.compile(r'\w+')
+
+
+def prefix_range(prefix):
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def games_with_prefix(prefix, queryset=None):
+    queryset = Game.objects.all() if queryset is None else queryset
+    prefix = Game.normalize_title(prefix)
+    if not prefix:
+        return queryset
+    if connections[queryset.db].vendor == 'sqlite':
+        # SQLite nie użyje indeksu dla LIKE 'x%' (LIKE jest tam bez rozróżniania wielkości
+        # liter), więc prefiks zamieniamy na przedział [prefiks, następny prefiks)
+        lower, upper = prefix_range(prefix)
+        return queryset.filter(title_normalized__gte=lower, title_normalized__lt=upper)
+    # PostgreSQL zakłada dla db_index CharField indeks *_pattern_ops obsługujący LIKE 'x%'
+    return queryset.filter(title_normalized__startswith=prefix)
+
+
+def has_search_table(connection):
+    return connection.vendor == 'sqlite'
+
+
+def index_game(game, using='default'):
+    connection = connections[using]
+    if not has_search_table(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = %s', [game.pk])
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}" (rowid, "Title", "Genre", "Platform") VALUES (%s, %s, %s, %s)',
+            [game.pk, game.title, game.genre, game.platform],
+        )
+
+
+def unindex_game(game, using='default'):
+    connection = connections[using]
+    if not has_search_table(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = %s', [game.pk])
+
+
+def rebuild_search_index(using='default'):
+    connection = connections[using]
+    if not has_search_table(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}"')
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}" (rowid, "Title", "Genre", "Platform") '
+            f'SELECT "ID", "Title", "Genre", "Platform" FROM "{Game._meta.db_table}"'
+        )
+
+
+def match_expression(query):
+    # Każde słowo jako prefiks w cudzysłowie - znaki specjalne składni FTS5 nie przejdą
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(query.lower()))
+
+
+def search_games(query, limit, offset=0, using=None):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    using = using or router.db_for_read(Game)
+    connection = connections[using]
+    if not has_search_table(connection):
+        return _search_games_fallback(query, limit, offset, using)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM "{SEARCH_TABLE}" WHERE "{SEARCH_TABLE}" MATCH %s '
+            f'ORDER BY bm25("{SEARCH_TABLE}", %s, %s, %s) LIMIT %s OFFSET %s',
+            [expression, TITLE_WEIGHT, GENRE_WEIGHT, PLATFORM_WEIGHT, limit, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    games = Game.objects.using(using).in_bulk(ids)
+    return [games[pk] for pk in ids if pk in games]
+
+
+def _search_games_fallback(query, limit, offset, using):
+    queryset = Game.objects.using(using)
+    for word in _WORD.findall(query.lower()):
+        queryset = queryset.filter(
+            Q(title_normalized__contains=word) | Q(genre__icontains=word) | Q(platform__icontains=word)
+        )
+    return list(queryset.order_by('title_normalized', 'id')[offset:offset + limit])
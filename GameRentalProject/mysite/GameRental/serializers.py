@@ -1,57 +1,125 @@
 from rest_framework import serializers
-from .models import User, Game, Rental, Review, Payment
-from django.contrib.auth.hashers import make_password
-
-class UserSerializer(serializers.ModelSerializer):
+from .models import User, Game, Rental, Review, Payment, Reservation
+from .conf import app_setting
+from .metrics import measuring_serialization
+from .passwords import hash_password
+from .reservations import AlreadyQueued, queue_position, reserve
+from .services import checkout
+
+
+# Pola odpowiedzi wybierane parametrami ?fields= i ?expand= (zob. mixins.SparseFieldsMixin).
+# expandable_fields: klucz obcy -> serializer obiektu osadzanego zamiast samego id.
+class DynamicFieldsMixin:
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+# Czas serializer.data (obiekty -> słowniki) w metrykach żądania; kodowanie JSON mierzy renderer.
+# Lista mierzona jako całość przez list_serializer_class w Meta.
+class MeasuredListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with measuring_serialization():
+            return super().data
+
+class MeasuredDataMixin:
+    @property
+    def data(self):
+        with measuring_serialization():
+            return super().data
+
+class UserSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
+        list_serializer_class = MeasuredListSerializer
         fields = '__all__'
         extra_kwargs = {'password' : {'write_only' : True}}
+        read_only_fields = ('auth_user',)
 
     def create(self, validated_data):
-        if 'password' in validated_data:
-            validated_data['password'] = make_password(validated_data['password'])
+        self.hash_password(validated_data)
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
-        if 'password' in validated_data:
-            validated_data['password'] = make_password(validated_data['password'])
+        self.hash_password(validated_data)
         return super().update(instance, validated_data)
 
-class GameSerializer(serializers.ModelSerializer):
+    def hash_password(self, validated_data):
+        # password_hashed - widok przekazuje w save() gotowy skrót
+        if 'password' in validated_data and not self.context.get('password_hashed'):
+            validated_data['password'] = hash_password(validated_data['password'])
+
+# Użytkownik osadzany w innych obiektach - bez danych kontaktowych
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username')
+
+class GameSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    is_available = serializers.SerializerMethodField()
     availability_status = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Game
-        fields = '__all__'
+        list_serializer_class = MeasuredListSerializer
+        exclude = ('title_normalized', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+    def validate_total_copies(self, value):
+        if self.instance is not None and value < self.instance.rented_count + self.instance.reserved_count:
+            raise serializers.ValidationError(
+                "Liczba egzemplarzy nie może być mniejsza niż liczba wypożyczonych i zarezerwowanych."
+            )
+        return value
+
+    # Z licznika, a nie z właściwości modelu - metody dostają też wiersze z values_list (rows.py)
+    def get_is_available(self, obj):
+        return obj.available_count > 0
 
     def get_availability_status(self, obj):
-        return "Dostępna" if obj.is_available else "Niedostępna"
+        return "Dostępna" if obj.available_count > 0 else "Niedostępna"
 
-class RentalSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    game = serializers.PrimaryKeyRelatedField(queryset=Game.objects.all())
+    def get_rating_histogram(self, obj):
+        return {str(rating): getattr(obj, f'rating_{rating}') for rating in range(1, 6)}
+
+class RentalSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.only('id'))
+    game = serializers.PrimaryKeyRelatedField(queryset=Game.objects.only('id'))
+    expandable_fields = {'user': UserSummarySerializer, 'game': GameSerializer}
 
     class Meta:
         model = Rental
+        list_serializer_class = MeasuredListSerializer
         fields = '__all__'
 
-    # Game availablility validation
+    # Dostępność gry sprawdza atomowo services.checkout (409 przy konflikcie)
     def validate(self, data):
-        if not data['game'].is_available:
-            raise serializers.ValidationError("Gra jest aktualnie niedostępna.")
-
-        if data.get('return_date') and data['return_date'] < data['rent_date']:
+        rent_date = data.get('rent_date', getattr(self.instance, 'rent_date', None))
+        if data.get('return_date') and rent_date and data['return_date'] < rent_date:
             raise serializers.ValidationError("Data zwrotu nie może być wcześniejsza niż data wypożyczenia.")
 
         return data
 
-class ReviewSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    game = serializers.PrimaryKeyRelatedField(queryset=Game.objects.all())
+    # Nowe wypożyczenie jest zawsze aktywne - status i datę zwrotu zmienia dopiero edycja
+    def create(self, validated_data):
+        validated_data.pop('status', None)
+        validated_data.pop('return_date', None)
+        return checkout(**validated_data)
+
+class ReviewSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.only('id'))
+    game = serializers.PrimaryKeyRelatedField(queryset=Game.objects.only('id'))
+    expandable_fields = {'user': UserSummarySerializer, 'game': GameSerializer}
 
     class Meta:
         model = Review
+        list_serializer_class = MeasuredListSerializer
         fields = '__all__'
 
     def validate_rating(self, value):
@@ -59,10 +127,60 @@ class ReviewSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Ocena musi być wartością od 1 do 5.")
         return value
 
-class PaymentSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    rental = serializers.PrimaryKeyRelatedField(queryset=Rental.objects.all())
+class PaymentSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.only('id'))
+    rental = serializers.PrimaryKeyRelatedField(queryset=Rental.objects.only('id'))
+    expandable_fields = {'user': UserSummarySerializer, 'rental': RentalSerializer}
 
     class Meta:
         model = Payment
-        fields = '__all__'
\ No newline at end of file
+        list_serializer_class = MeasuredListSerializer
+        fields = '__all__'
+
+class ReservationSerializer(MeasuredDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.only('id'))
+    game = serializers.PrimaryKeyRelatedField(queryset=Game.objects.only('id'))
+    position = serializers.SerializerMethodField()
+    expandable_fields = {'user': UserSummarySerializer, 'game': GameSerializer}
+
+    class Meta:
+        model = Reservation
+        list_serializer_class = MeasuredListSerializer
+        fields = '__all__'
+        read_only_fields = ('status', 'created_at', 'held_until')
+
+    def get_position(self, obj):
+        return queue_position(obj)
+
+    def create(self, validated_data):
+        try:
+            return reserve(**validated_data)
+        except AlreadyQueued:
+            raise serializers.ValidationError({"error": "Użytkownik jest już w kolejce po tę grę."})
+
+
+class RentalPairSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    game = serializers.IntegerField()
+
+
+class BulkReturnSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    items = RentalPairSerializer(many=True, required=False, default=list)
+
+    def validate(self, data):
+        count = len(data['ids']) + len(data['items'])
+        if not count:
+            raise serializers.ValidationError("Podaj identyfikatory wypożyczeń lub pary użytkownik/gra.")
+        if count > app_setting('BULK_MAX_ITEMS'):
+            raise serializers.ValidationError(f"Maksymalnie {app_setting('BULK_MAX_ITEMS')} pozycji w jednym żądaniu.")
+        return data
+
+
+class BulkCheckoutSerializer(serializers.Serializer):
+    items = RentalPairSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        if len(value) > app_setting('BULK_MAX_ITEMS'):
+            raise serializers.ValidationError(f"Maksymalnie {app_setting('BULK_MAX_ITEMS')} pozycji w jednym żądaniu.")
+        return value
@@ -0,0 +1,170 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .inventory import move_copies
+from .models import Game, Rental, Reservation, User
+from .outbox import enqueue
+from .reservations import FULFILLED, HELD, claim_hold, hand_over
+from .rollups import record_rentals_created
+
+
+ACTIVE = 'wypożyczona'
+RETURNED = 'zwrócona'
+
+
+class GameUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Gra jest aktualnie niedostępna."
+    default_code = 'game_unavailable'
+
+
+# Wypożyczenie egzemplarza gry. Dostępność sprawdza i zmienia jedno warunkowe UPDATE
+# (compare-and-set na Available_count > 0), więc z dwóch równoległych wypożyczeń ostatniego
+# egzemplarza powiedzie się dokładnie jedno - drugie dostaje 409. Właściciel rezerwacji
+# z odłożonym egzemplarzem wypożycza właśnie ten egzemplarz.
+def checkout(user, game, rent_date=None, **fields):
+    game_id = getattr(game, 'pk', game)
+    with transaction.atomic():
+        take_game(user.pk, game_id)
+        rental = Rental.objects.create(
+            user=user, game_id=game_id, rent_date=rent_date or timezone.now(), status=ACTIVE, **fields
+        )
+    return rental
+
+
+def take_game(user_id, game_id):
+    if claim_hold(user_id, game_id):
+        moved = move_copies({game_id: 1}, 'reserved', 'rented')
+    else:
+        moved = move_copies({game_id: 1}, 'available', 'rented')
+    if not moved:
+        raise GameUnavailable()
+
+
+def release_game(game_id):
+    with transaction.atomic():
+        release_games([game_id])
+
+
+class BulkCheckoutConflict(Exception):
+    pass
+
+
+# Masowy zwrot: jedna transakcja, bulk_update wypożyczeń i jedno UPDATE zwalniające gry.
+# Wynik dla każdej pozycji w kolejności żądania.
+def bulk_return(rental_ids=(), pairs=(), owner=None):
+    rental_ids = list(dict.fromkeys(rental_ids))
+    pairs = list(dict.fromkeys(pairs))
+    now = timezone.now()
+    with transaction.atomic():
+        condition = Q(pk__in=rental_ids)
+        for user_id, game_id in pairs:
+            condition |= Q(user_id=user_id, game_id=game_id, status=ACTIVE)
+        rentals = Rental.objects.select_for_update().filter(condition)
+        if owner is not None:
+            rentals = rentals.filter(user=owner)
+        rentals = list(rentals.only('id', 'user_id', 'game_id', 'status', 'return_date'))
+        by_id = {rental.pk: rental for rental in rentals}
+        by_pair = {(rental.user_id, rental.game_id): rental for rental in rentals if rental.status == ACTIVE}
+
+        results, returned = [], {}
+        requested = [({'id': pk}, by_id.get(pk)) for pk in rental_ids]
+        requested += [({'user': user_id, 'game': game_id}, by_pair.get((user_id, game_id))) for user_id, game_id in pairs]
+        for item, rental in requested:
+            if rental is None:
+                results.append({**item, 'status': 'not_found'})
+            elif rental.status == RETURNED:
+                results.append({**item, 'rental': rental.pk, 'status': 'already_returned'})
+            else:
+                rental.status = RETURNED
+                rental.return_date = now
+                returned[rental.pk] = rental
+                results.append({**item, 'rental': rental.pk, 'status': 'returned'})
+
+        Rental.objects.bulk_update(returned.values(), ['status', 'return_date'], batch_size=500)
+        release_games([rental.game_id for rental in returned.values()])
+    return results
+
+
+def release_games(game_ids):
+    # Jeden zwracany egzemplarz na każde wystąpienie gry na liście; zwolnione egzemplarze
+    # od razu trafiają do pierwszych w kolejce rezerwacji
+    counts = Counter(game_ids)
+    if move_copies(counts, 'rented', 'available'):
+        hand_over(counts)
+
+
+# Masowe wypożyczenie: egzemplarze przenoszone jednym UPDATE na źródło, wypożyczenia tworzone
+# jednym bulk_create. Jak w checkout właściciel ważnej rezerwacji z odłożonym egzemplarzem
+# wypożycza ten egzemplarz (rezerwacja przechodzi w zrealizowaną), pozostali - wolne egzemplarze.
+# Na PostgreSQL select_for_update blokuje wybrane wiersze gier i rezerwacji; na SQLite, gdzie
+# go nie ma, liczba zmienionych wierszy weryfikuje wybór i przy wyścigu cała partia jest powtarzana.
+def bulk_checkout(items, allowed_user=None, attempts=3):
+    for attempt in range(attempts):
+        try:
+            return _bulk_checkout(items, allowed_user)
+        except BulkCheckoutConflict:
+            if attempt == attempts - 1:
+                raise GameUnavailable("Nie udało się zarezerwować gier - spróbuj ponownie.")
+
+
+def _bulk_checkout(items, allowed_user):
+    user_ids = {user_id for user_id, _ in items}
+    game_ids = {game_id for _, game_id in items}
+    now = timezone.now()
+    with transaction.atomic():
+        known_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        available = dict(
+            Game.objects.select_for_update().filter(pk__in=game_ids).values_list('pk', 'available_count')
+        )
+        holds = {
+            (user_id, game_id): pk for pk, user_id, game_id in
+            Reservation.objects.select_for_update().filter(
+                user_id__in=user_ids, game_id__in=game_ids, status=HELD, held_until__gt=now,
+            ).values_list('pk', 'user_id', 'game_id')
+        }
+
+        results, claimed, created = [], Counter(), []
+        claimed_holds, held = [], Counter()
+        for index, (user_id, game_id) in enumerate(items):
+            item = {'user': user_id, 'game': game_id}
+            if allowed_user is not None and user_id != allowed_user.pk:
+                results.append({**item, 'status': 'forbidden'})
+            elif user_id not in known_users:
+                results.append({**item, 'status': 'not_found'})
+            elif game_id not in available:
+                results.append({**item, 'status': 'game_not_found'})
+            elif (user_id, game_id) in holds:
+                claimed_holds.append(holds.pop((user_id, game_id)))
+                held[game_id] += 1
+                created.append(index)
+                results.append({**item, 'status': 'created'})
+            elif claimed[game_id] >= available[game_id]:
+                results.append({**item, 'status': 'unavailable'})
+            else:
+                claimed[game_id] += 1
+                created.append(index)
+                results.append({**item, 'status': 'created'})
+
+        if claimed_holds:
+            fulfilled = Reservation.objects.filter(pk__in=claimed_holds, status=HELD).update(status=FULFILLED)
+            if fulfilled != len(claimed_holds) or move_copies(held, 'reserved', 'rented') != len(held):
+                raise BulkCheckoutConflict()
+        if move_copies(claimed, 'available', 'rented') != len(claimed):
+            raise BulkCheckoutConflict()
+
+        rentals = Rental.objects.bulk_create(
+            [Rental(user_id=items[index][0], game_id=items[index][1], rent_date=now) for index in created],
+            batch_size=500,
+        )
+        for rental, index in zip(rentals, created):
+            results[index]['rental'] = rental.pk
+        record_rentals_created(rentals)
+        if rentals:
+            enqueue('leaderboard.record_rentals', rentals=[rental.pk for rental in rentals])
+    return results
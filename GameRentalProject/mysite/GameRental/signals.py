@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+from .db import apply_sqlite_pragmas
+from .leaderboard import forget_game
+from .metrics import install_query_wrapper
+from .models import Game, Rental, Review, User
+from .outbox import enqueue
+from .ratings import record_review_deleted, record_review_saved
+from .rollups import record_rental_deleted, record_rental_saved
+from .routers import install_heartbeat
+from .search import index_game, unindex_game
+from .services import ACTIVE, release_game, take_game
+from .versioning import GAME_CATALOG, bump_version
+from .users import forget_auth_user, forget_domain_user
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_domain_user(sender, instance, **kwargs):
+    forget_domain_user(instance)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_auth_user(sender, instance, **kwargs):
+    forget_auth_user(instance)
+
+
+# Zmiana uprawnień lub dezaktywacja musi od razu unieważnić tokeny użytkownika
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_auth_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Rental)
+def update_monthly_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_rental_saved(instance, created)
+
+
+# Zwrot, przywrócenie albo zmiana gry wypożyczenia (Rental.save) przenosi egzemplarz w tej
+# samej transakcji; brak wolnego egzemplarza wycofuje zapis (GameUnavailable)
+@receiver(post_save, sender=Rental)
+def move_rented_copy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if getattr(instance, '_taken_game', None) is not None:
+        take_game(instance.user_id, instance._taken_game)
+    if getattr(instance, '_released_game', None) is not None:
+        release_game(instance._released_game)
+
+
+@receiver(post_save, sender=Rental)
+def update_leaderboard_on_rental(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue('leaderboard.record_rentals', rentals=[instance.pk])
+
+
+@receiver(post_delete, sender=Rental)
+def update_monthly_summary_on_delete(sender, instance, **kwargs):
+    record_rental_deleted(instance)
+
+
+# Usunięcie aktywnego wypożyczenia zwalnia wypożyczony egzemplarz
+@receiver(post_delete, sender=Rental)
+def release_game_on_delete(sender, instance, **kwargs):
+    if instance.status == ACTIVE:
+        release_game(instance.game_id)
+
+
+@receiver(post_save, sender=Review)
+def update_game_ratings_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_game_ratings_on_delete(sender, instance, **kwargs):
+    record_review_deleted(instance)
+
+
+# loaddata zapisuje obiekty z raw=True z pominięciem Game.save
+@receiver(pre_save, sender=Game)
+def normalize_fixture_title(sender, instance, raw=False, **kwargs):
+    if raw:
+        instance.title_normalized = Game.normalize_title(instance.title)
+        instance.available_count = instance.total_copies - instance.rented_count - instance.reserved_count
+
+
+@receiver(post_save, sender=Game)
+def update_search_index_on_save(sender, instance, using, **kwargs):
+    index_game(instance, using)
+
+
+@receiver(post_delete, sender=Game)
+def update_search_index_on_delete(sender, instance, using, **kwargs):
+    unindex_game(instance, using)
+
+
+@receiver(post_delete, sender=Game)
+def remove_game_from_leaderboard(sender, instance, **kwargs):
+    forget_game(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Game)
+def bump_catalog_version(sender, instance, using, **kwargs):
+    bump_version(GAME_CATALOG, using)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
+    install_query_wrapper(connection)
+    install_heartbeat(connection)
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# Porównanie profili ustawień (dev/prod): każdy pomiar to świeży proces Pythona, który
+# konfiguruje Django, a potem obsługuje serię żądań przez lokalny serwer WSGI. Mierzone są czas
+# django.setup(), pierwsze żądanie, mediana kolejnych i liczba otwartych połączeń z bazą.
+PROBE_PATH = '/GameRental/games/'
+
+
+def probe(requests=20):
+    started = time.perf_counter()
+    import django
+    django.setup()
+    setup_time = time.perf_counter() - started
+
+    from django.conf import settings
+    from django.db.backends.signals import connection_created
+
+    from .benchmark import PREFIX, WSGIServerTransport, benchmark_token
+
+    # Serwer WSGI zamiast klienta testowego - klient testowy nie zamyka połączeń po żądaniu,
+    # więc nie pokazałby różnicy CONN_MAX_AGE
+    opened = []
+    connection_created.connect(lambda sender, connection, **kwargs: opened.append(connection.alias), weak=False)
+    transport = WSGIServerTransport(benchmark_token())
+    opened.clear()
+
+    latencies = []
+    try:
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            status, _size = transport.request('get', PROBE_PATH[len(PREFIX):], None)
+            latencies.append(time.perf_counter() - request_started)
+    finally:
+        transport.close()
+    return {
+        'profile': settings.PROFILE,
+        'debug': settings.DEBUG,
+        'status': status,
+        'setup_ms': round(setup_time * 1000, 2),
+        'first_request_ms': round(latencies[0] * 1000, 2),
+        'warm_p50_ms': round(sorted(latencies[1:])[len(latencies[1:]) // 2] * 1000, 2) if requests > 1 else None,
+        'connections_opened': len(opened),
+    }
+
+
+def run_probe(profile, requests=20, extra_env=None):
+    env = dict(os.environ, DJANGO_ENV=profile)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    if profile == 'prod':
+        env.setdefault('DJANGO_SECRET_KEY', 'startup-benchmark-' + 'x' * 40)
+        env.setdefault('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1')
+    env.update(extra_env or {})
+    code = f'import json; from GameRental.startup import probe; print(json.dumps(probe({int(requests)})))'
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode)
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement['process_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return measurement
+
+
+def compare_profiles(profiles=('dev', 'prod'), repeats=3, requests=20, extra_env=None):
+    results = {}
+    for profile in profiles:
+        runs = [run_probe(profile, requests, extra_env) for _ in range(repeats)]
+        summary = {'runs': runs}
+        summary['status'] = sorted({run['status'] for run in runs})
+        for key in ('process_ms', 'setup_ms', 'first_request_ms', 'warm_p50_ms', 'connections_opened'):
+            values = sorted(run[key] for run in runs if run[key] is not None)
+            summary[key] = values[len(values) // 2] if values else None
+        results[profile] = summary
+    return results
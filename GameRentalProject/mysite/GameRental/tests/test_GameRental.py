@@ -1,14 +1,74 @@
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.db import connection, connections, transaction
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.urls import reverse
-from django.contrib.auth.models import User
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import Group, User
 from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase, APIClient
-from rest_framework import status
-from ..models import User as CustomUser, Game, Rental, Review, Payment
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework import serializers, status
+from ..authentication import token_cache_stats
+from ..benchmark import Benchmark, compare, percentile, route_names, serialization_benchmark
+from ..cache import clear_caches
+from ..concurrency import SlowClientBenchmark
+from ..db import apply_sqlite_pragmas
+from ..fixtures import BulkLoader, iter_json_array, open_fixture
+from .. import async_views, leaderboard, outbox, passwords, users
+from ..metrics import registry
+from ..mixins import CatalogCacheMixin
+from ..renderers import MeasuredJSONRenderer, orjson
+from ..rows import RowSerializer
+from ..serializers import GameSerializer, RentalSerializer, PaymentSerializer
+from ..startup import run_probe
+from ..models import User as CustomUser, Game, Rental, Review, Payment, MonthlyRentalSummary, LeaderboardEpoch, LeaderboardScore, OutboxTask, Reservation, TableVersion
+from ..reservations import reserve
+from ..routers import HEARTBEAT, PIN_COOKIE, replica_lag, replica_reads
+from ..search import rebuild_search_index
+from ..services import checkout
+from ..users import get_domain_user
+from ..versioning import GAME_CATALOG, bump_versions, game_version, get_version
+from ..views import GameViewSet
 from django.utils import timezone
 
-class GameRentalAPITests(APITestCase):
+
+# Testy z drugą bazą - alias replica z mysite.test_settings
+REPLICA_DATABASES = {"default", "replica"} & set(settings.DATABASES)
+requires_replica = skipUnless("replica" in REPLICA_DATABASES, "Brak bazy replica (mysite.test_settings).")
+
+
+# Bazowa klasa testów - czyści cache procesu, bo klucze główne powtarzają się między testami
+class GameRentalTestCase(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+        cache.clear()
+
+class GameRentalAPITests(GameRentalTestCase):
 
     def setUp(self):
+        super().setUp()
         self.custom_user = CustomUser.objects.create(
             username="testuser",
             email="testuser@example.com",
@@ -31,7 +91,6 @@ class GameRentalAPITests(APITestCase):
             genre="Action",
             platform="PC",
             release_date="2020-01-01",
-            is_available=True,
         )
 
         self.rental = Rental.objects.create(user=self.custom_user, game=self.game, rent_date=timezone.now())
@@ -82,7 +141,7 @@ class GameRentalAPITests(APITestCase):
         url = reverse("games-by-title", args=["T"])
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.json()), 1)
 
     # Test endpointu listującego wypożyczenia użytkownika
     def test_user_rentals(self):
@@ -92,7 +151,7 @@ class GameRentalAPITests(APITestCase):
         url = reverse("user-rentals", args=[self.custom_user.id])
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.json()), 1)
 
     # Test CRUD endpointu dla modelu Review (Create)
     def test_create_review(self):
@@ -163,9 +222,10 @@ class GameRentalAPITests(APITestCase):
         self.assertIn("Data zwrotu nie może być wcześniejsza niż data wypożyczenia", str(response.data))
 
 # Testy zestawienia zamówień
-class MonthlyOrdersSummaryTests(APITestCase):
+class MonthlyOrdersSummaryTests(GameRentalTestCase):
 
     def setUp(self):
+        super().setUp()
         self.custom_user = CustomUser.objects.create(
             username="admin",
             email="admin@example.com",
@@ -217,7 +277,7 @@ class MonthlyOrdersSummaryTests(APITestCase):
         url = reverse('monthly-orders-summary')
         response = self.client.get(url, {"month": "12", "year": "2024"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [])
+        self.assertEqual(response.json(), [])
 
     def test_monthly_orders_summary_with_data(self):
         token = Token.objects.get(user=self.user)
@@ -226,5 +286,1692 @@ class MonthlyOrdersSummaryTests(APITestCase):
         url = reverse('monthly-orders-summary')
         response = self.client.get(url, {"month": "11", "year": "2024"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreater(len(response.data), 0)
-        self.assertIn("total_rentals", response.data[0])
+        self.assertGreater(len(response.json()), 0)
+        self.assertIn("total_rentals", response.json()[0])
+
+    def test_monthly_orders_summary_reads_rollup(self):
+        token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('monthly-orders-summary'), {"month": "11", "year": "2024"})
+        self.assertEqual(
+            sorted((r["title"], r["total_rentals"]) for r in response.json()), [("Game 1", 1), ("Game 2", 1)]
+        )
+        self.assertFalse(any('FROM "Rental"' in q["sql"] for q in ctx.captured_queries))
+
+    def summary(self):
+        return {
+            (row.year, row.month, row.game_id): row.total
+            for row in MonthlyRentalSummary.objects.filter(total__gt=0)
+        }
+
+    def test_rollup_follows_rental_changes(self):
+        self.assertEqual(self.summary(), {(2024, 11, self.game1.id): 1, (2024, 11, self.game2.id): 1})
+
+        rental = Rental.objects.get(pk=self.rental1.pk)
+        rental.rent_date = timezone.datetime(2024, 12, 3, tzinfo=timezone.utc)
+        rental.game = self.game2
+        rental.save()
+        self.assertEqual(self.summary(), {(2024, 11, self.game2.id): 1, (2024, 12, self.game2.id): 1})
+
+        rental.delete()
+        self.assertEqual(self.summary(), {(2024, 11, self.game2.id): 1})
+
+        self.game2.delete()
+        self.assertEqual(self.summary(), {})
+
+    def test_rebuild_command_matches_incremental_rollup(self):
+        Rental.objects.create(
+            user=self.custom_user, game=self.game1, rent_date=timezone.datetime(2024, 11, 30, 23, 59, tzinfo=timezone.utc)
+        )
+        expected = self.summary()
+        MonthlyRentalSummary.objects.all().delete()
+        call_command("rebuild_monthly_summary", stdout=StringIO())
+        self.assertEqual(self.summary(), expected)
+
+# Testy stronicowania kursorowego
+class KeysetPaginationTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.custom_user = CustomUser.objects.create(
+            username="admin",
+            email="admin@example.com",
+            password="admin123",
+            is_staff=True
+        )
+
+        self.user = User.objects.create_user(
+            username="admin",
+            email="admin@example.com",
+            password="admin123",
+            is_staff=True
+        )
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        self.game = Game.objects.create(
+            title="Game 1",
+            genre="Action",
+            platform="PC",
+            release_date="2022-01-01",
+        )
+
+        self.rentals = [
+            Rental.objects.create(
+                user=self.custom_user,
+                game=self.game,
+                rent_date=timezone.datetime(2024, 11, day, tzinfo=timezone.utc)
+            )
+            for day in range(1, 6)
+        ]
+
+    def test_rentals_are_paginated_by_cursor(self):
+        url = reverse('rental-list')
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("next", response.data)
+        self.assertIn("previous", response.data)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_rental_pages_follow_rent_date_without_gaps(self):
+        url = reverse('rental-list') + "?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(r["id"] for r in response.data["results"])
+            url = response.data["next"]
+
+        expected = [r.id for r in sorted(self.rentals, key=lambda r: r.rent_date, reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_next_page_uses_keyset_predicate(self):
+        response = self.client.get(reverse('rental-list'), {"page_size": 2})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(response.data["next"])
+
+        rental_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "Rental"' in q["sql"]]
+        self.assertEqual(len(rental_queries), 1)
+        self.assertIn('"Rent_date" <', rental_queries[0])
+        self.assertNotIn("OFFSET", rental_queries[0])
+
+    def test_rentals_with_the_same_rent_date_are_paged_by_id(self):
+        # bulk_checkout zapisuje całą partię z jedną datą wypożyczenia
+        rent_date = timezone.datetime(2024, 12, 1, tzinfo=timezone.utc)
+        batch = [
+            Rental.objects.create(user=self.custom_user, game=self.game, rent_date=rent_date)
+            for _ in range(5)
+        ]
+        url = reverse('rental-list') + "?page_size=2"
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any("OFFSET" in q["sql"] for q in ctx.captured_queries if 'FROM "Rental"' in q["sql"]))
+            seen.extend(r["id"] for r in response.data["results"])
+            url = response.data["next"]
+
+        expected = [r.id for r in sorted(batch + self.rentals, key=lambda r: (r.rent_date, r.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+# Testy budżetu zapytań - liczba zapytań nie może rosnąć z liczbą wierszy
+class QueryBudgetTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.custom_admin = CustomUser.objects.create(
+            username="admin", email="admin@example.com", password="admin123", is_staff=True
+        )
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin123"
+        )
+        self.admin_token = Token.objects.create(user=self.admin)
+
+        self.custom_user = CustomUser.objects.create(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.user_token = Token.objects.create(user=self.user)
+
+        self.counter = 0
+        self.add_rows()
+
+    def add_rows(self, count=1):
+        for _ in range(count):
+            self.counter += 1
+            n = self.counter
+            owner = CustomUser.objects.create(
+                username=f"user{n}", email=f"user{n}@example.com", password="secret"
+            )
+            game = Game.objects.create(
+                title=f"Game {n}", genre="Action", platform="PC", release_date="2022-01-01"
+            )
+            for user in (owner, self.custom_user):
+                rental = Rental.objects.create(user=user, game=game)
+                Review.objects.create(user=user, game=game, rating=4)
+                Payment.objects.create(user=user, rental=rental, amount=10, payment_method="Cash")
+
+    def count_queries(self, url, token):
+        # mierzymy ścieżkę bez cache katalogu
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, token=None):
+        token = token or self.admin_token
+        self.count_queries(url, token)
+        before = self.count_queries(url, token)
+        self.add_rows(5)
+        after = self.count_queries(url, token)
+        self.assertEqual(before, after, f"{url}: {before} -> {after} zapytań")
+
+    def test_admin_list_endpoints(self):
+        for name in ('user-list', 'game-list', 'rental-list', 'review-list', 'payment-list'):
+            with self.subTest(name=name):
+                self.assertConstantQueries(reverse(name))
+
+    def test_owner_list_endpoints(self):
+        for name in ('rental-list', 'payment-list'):
+            with self.subTest(name=name):
+                self.assertConstantQueries(reverse(name), self.user_token)
+
+    def test_report_endpoints(self):
+        self.assertConstantQueries(reverse('user-rentals', args=[self.custom_user.id]), self.user_token)
+        self.assertConstantQueries(reverse('games-by-title', args=["G"]))
+        self.assertConstantQueries(reverse('monthly-orders-summary'))
+
+    def test_owner_detail_permission_check(self):
+        rental = Rental.objects.filter(user=self.custom_user).first()
+        url = reverse('rental-detail', args=[rental.id])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.user_token.key}")
+        self.client.get(url)
+        # token i użytkownik domenowy pochodzą z cache - zostaje samo wypożyczenie
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        for model in ('rental', 'review', 'payment'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:GameRental_{model}_changelist')
+                with CaptureQueriesContext(connection) as ctx:
+                    self.client.get(url)
+                before = len(ctx.captured_queries)
+                self.add_rows(5)
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(before, len(ctx.captured_queries))
+
+
+# Testy powiązania użytkownika auth z użytkownikiem wypożyczalni
+class DomainUserTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.custom_user = CustomUser.objects.create(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def resolve(self):
+        request = type("Request", (), {"user": self.user})()
+        return get_domain_user(request)
+
+    def test_register_links_users(self):
+        data = {"username": "newuser", "email": "newuser@example.com", "password": "newpassword123"}
+        self.client.post(reverse('register'), data)
+        custom_user = CustomUser.objects.get(username="newuser")
+        self.assertEqual(custom_user.auth_user, User.objects.get(username="newuser"))
+
+    def test_legacy_user_is_linked_on_first_lookup(self):
+        self.assertEqual(self.resolve(), self.custom_user)
+        self.custom_user.refresh_from_db()
+        self.assertEqual(self.custom_user.auth_user_id, self.user.pk)
+
+    def test_lookup_is_cached(self):
+        self.resolve()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve(), self.custom_user)
+
+    def test_cached_user_expires(self):
+        # Zmiana w innym procesie nie unieważnia cache - wpis wygasa po DOMAIN_USER_CACHE_TTL
+        now = [0]
+        self.addCleanup(setattr, users._domain_users, "timer", users._domain_users.timer)
+        users._domain_users.timer = lambda: now[0]
+        self.resolve()
+        CustomUser.objects.filter(pk=self.custom_user.pk).update(email="changed@example.com")
+        self.assertEqual(self.resolve().email, "testuser@example.com")
+        now[0] = users._domain_users.ttl
+        self.assertEqual(self.resolve().email, "changed@example.com")
+
+    def test_cache_invalidated_on_update_and_delete(self):
+        self.resolve()
+        self.custom_user.refresh_from_db()
+        self.custom_user.email = "changed@example.com"
+        self.custom_user.save()
+        self.assertEqual(self.resolve().email, "changed@example.com")
+
+        self.custom_user.delete()
+        self.assertIsNone(self.resolve())
+
+    def test_payment_list_skips_user_lookup(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.client.get(reverse('payment-list'))
+        # token i użytkownik domenowy z cache - tylko zapytanie o płatności
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('payment-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MasterPasswordBackend:
+    def authenticate(self, request, username=None, password=None):
+        if password == "master":
+            return User.objects.filter(username=username).first()
+
+    def get_user(self, user_id):
+        return User.objects.filter(pk=user_id).first()
+
+
+# Testy haszowania haseł w puli procesów i limitu prób logowania
+class PasswordTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+
+    def login(self, username="testuser", password="testpassword"):
+        return self.client.post(reverse('login'), {"username": username, "password": password})
+
+    def test_register_hashes_password_once(self):
+        data = {"username": "newuser", "email": "newuser@example.com", "password": "newpassword123"}
+        self.assertEqual(self.client.post(reverse('register'), data).status_code, status.HTTP_201_CREATED)
+        auth_user = User.objects.get(username="newuser")
+        # Skrót z losową solą - ten sam w obu tabelach tylko przy jednym haszowaniu
+        self.assertEqual(CustomUser.objects.get(username="newuser").password, auth_user.password)
+        self.assertTrue(auth_user.check_password("newpassword123"))
+        self.assertEqual(self.login("newuser", "newpassword123").status_code, status.HTTP_200_OK)
+
+    @override_settings(GAME_RENTAL={"PASSWORD_HASH_WORKERS": 0})
+    def test_login_goes_through_authentication_backends(self):
+        user = authenticate(username="testuser", password="testpassword")
+        self.assertEqual(user.backend, "GameRental.authentication.PooledModelBackend")
+        self.assertEqual(self.login(password="master").status_code, status.HTTP_401_UNAUTHORIZED)
+        with override_settings(AUTHENTICATION_BACKENDS=[*settings.AUTHENTICATION_BACKENDS,
+                                                        f"{__name__}.MasterPasswordBackend"]):
+            self.assertEqual(self.login(password="master").status_code, status.HTTP_200_OK)
+
+    def test_register_existing_auth_user(self):
+        data = {"username": "testuser", "email": "testuser@example.com", "password": "newpassword123"}
+        response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CustomUser.objects.filter(username="testuser").exists())
+
+    @override_settings(GAME_RENTAL={"LOGIN_RATE_LIMITS": {"ip": (100, 100), "username": (2, 1)}})
+    def test_login_is_rate_limited_per_username(self):
+        self.assertEqual(self.login(password="wrong").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login(username="TestUser", password="wrong").status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.login(username="otheruser").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(GAME_RENTAL={"LOGIN_RATE_LIMITS": {"ip": (1, 1), "username": (100, 100)}})
+    def test_login_is_rate_limited_per_ip(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login(username="otheruser").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        other_client = APIClient(REMOTE_ADDR="10.0.0.2")
+        response = other_client.post(reverse('login'), {"username": "testuser", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(GAME_RENTAL={"PASSWORD_HASH_WORKERS": 1, "PASSWORD_HASH_QUEUE": 0})
+    def test_saturated_pool_returns_503(self):
+        pool = passwords.hasher_pool()
+        pool.slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            pool.slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+                       GAME_RENTAL={"PASSWORD_HASH_WORKERS": 0})
+    def test_login_upgrades_outdated_hash(self):
+        self.user.set_password("testpassword")
+        self.user.save()
+        with override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                                                  "django.contrib.auth.hashers.MD5PasswordHasher"]):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+
+# Testy cache uwierzytelniania tokenem
+class TokenCacheTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse("game-list")
+
+    def get(self, key=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key or self.token.key}")
+        return self.client.get(self.url)
+
+    def test_repeated_requests_skip_token_query(self):
+        self.get()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("authtoken_token" in q["sql"] for q in ctx.captured_queries))
+        stats = token_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_invalid_token_is_rejected(self):
+        self.assertEqual(self.get("invalid").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(token_cache_stats()["size"], 0)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotated_token_is_rejected(self):
+        self.get()
+        response = self.client.post(
+            reverse("login"), {"username": "testuser", "password": "testpassword", "rotate": True}
+        )
+        self.assertNotEqual(response.data["token"], self.token.key)
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(response.data["token"]).status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        GAME_RENTAL={"TOKEN_CACHE_BACKEND": "default"},
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_shared_cache_backend(self):
+        self.get()
+        clear_caches()
+        shared_hits = token_cache_stats()["shared_hits"]
+        with CaptureQueriesContext(connection) as ctx:
+            self.get()
+        self.assertFalse(any("authtoken_token" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(token_cache_stats()["shared_hits"], shared_hits + 1)
+
+
+# Testy planów zapytań - raportowanie i listy wypożyczeń nie mogą skanować całej tabeli
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN jest specyficzne dla SQLite")
+class QueryPlanTests(GameRentalTestCase):
+    tables = ('Rental', 'MonthlyRentalSummary')
+
+    def setUp(self):
+        super().setUp()
+        self.custom_user = CustomUser.objects.create(
+            username="admin", email="admin@example.com", password="admin123", is_staff=True
+        )
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", password="admin123", is_staff=True
+        )
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.owner = CustomUser.objects.create(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        self.user_token = Token.objects.create(user=self.user)
+
+        game = Game.objects.create(title="Game 1", genre="Action", platform="PC", release_date="2022-01-01")
+        for day in range(1, 11):
+            for user in (self.custom_user, self.owner):
+                Rental.objects.create(
+                    user=user, game=game, rent_date=timezone.datetime(2024, 11, day, tzinfo=timezone.utc)
+                )
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoTableScan(self, url, token, params=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for query in ctx.captured_queries:
+            if not any(f'FROM "{table}"' in query["sql"] for table in self.tables):
+                continue
+            for step in self.plan(query["sql"]):
+                scans_table = any(step.startswith(f"SCAN {table}") for table in self.tables)
+                self.assertFalse(scans_table and "INDEX" not in step, f"{url}: {step}\n{query['sql']}")
+
+    def test_monthly_orders_summary(self):
+        self.assertNoTableScan(reverse('monthly-orders-summary'), self.admin_token, {"year": 2024, "month": 11})
+
+    def test_user_rentals(self):
+        url = reverse('user-rentals', args=[self.owner.id])
+        self.assertNoTableScan(url, self.user_token)
+        self.assertNoTableScan(url, self.user_token, {"year": 2024, "month": 11})
+
+    def test_rental_list(self):
+        url = reverse('rental-list')
+        self.assertNoTableScan(url, self.admin_token)
+        self.assertNoTableScan(url, self.admin_token, {"year": 2024, "month": 11})
+        self.assertNoTableScan(url, self.admin_token, {"from": "2024-11-03", "to": "2024-11-05"})
+        self.assertNoTableScan(url, self.user_token, {"year": 2024, "month": 11})
+
+    def test_month_filter_is_half_open_range(self):
+        Rental.objects.create(
+            user=self.owner, game=Game.objects.get(), rent_date=timezone.datetime(2024, 12, 1, tzinfo=timezone.utc)
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.user_token.key}")
+        url = reverse('user-rentals', args=[self.owner.id])
+        self.assertEqual(len(self.client.get(url, {"year": 2024, "month": 11}).json()), 10)
+        self.assertEqual(len(self.client.get(url, {"year": 2024, "month": 12}).json()), 1)
+        self.assertEqual(len(self.client.get(url, {"from": "2024-11-05", "to": "2024-11-07"}).json()), 2)
+        self.assertEqual(self.client.get(url, {"year": 2024, "month": 13}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Testy wyszukiwania gier
+class GameSearchTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        games = [
+            ("Wiedźmin 3", "RPG", "PC"),
+            ("wiedźmin 2", "RPG", "Xbox"),
+            ("Dark Souls", "Action RPG", "PC"),
+            ("Diablo IV", "Action", "PlayStation"),
+            ("Forza Horizon", "Racing", "Xbox"),
+        ]
+        self.games = {
+            title: Game.objects.create(title=title, genre=genre, platform=platform, release_date="2020-01-01")
+            for title, genre, platform in games
+        }
+
+    def titles(self, response):
+        data = response.json()
+        results = data["results"] if "results" in data else data
+        return [game["title"] for game in results]
+
+    def test_games_by_title_is_case_insensitive_single_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("games-by-title", args=["W"]))
+        self.assertEqual(sorted(self.titles(response)), ["Wiedźmin 3", "wiedźmin 2"])
+        self.assertEqual(len([q for q in ctx.captured_queries if 'FROM "Game"' in q["sql"]]), 1)
+
+        Game.objects.filter(title="Wiedźmin 3").update(total_copies=2, available_count=2)
+        bump_versions([game_version(self.games["Wiedźmin 3"].pk)])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("games-by-title", args=["W"]))
+        self.assertEqual(len([q for q in ctx.captured_queries if 'FROM "Game"' in q["sql"]]), 1)
+        self.assertEqual({game["title"]: game["available_count"] for game in response.json()},
+                         {"Wiedźmin 3": 2, "wiedźmin 2": 1})
+
+    def test_games_by_title_prefix_and_missing(self):
+        response = self.client.get(reverse("games-by-title", args=["wiedź"]))
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.get(reverse("games-by-title", args=["Z"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_full_text_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse("games-search"), {"q": "rpg"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.titles(response)), {"Wiedźmin 3", "wiedźmin 2", "Dark Souls"})
+
+        response = self.client.get(reverse("games-search"), {"q": "action"})
+        self.assertEqual(set(self.titles(response)), {"Dark Souls", "Diablo IV"})
+
+    def test_search_matches_all_words_and_prefixes(self):
+        response = self.client.get(reverse("games-search"), {"q": "wiedz xbo"})
+        self.assertEqual(self.titles(response), ["wiedźmin 2"])
+
+    def test_search_paginates(self):
+        response = self.client.get(reverse("games-search"), {"q": "rpg", "limit": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+        second = self.client.get(response.data["next"])
+        self.assertEqual(len(second.data["results"]), 1)
+        self.assertIsNone(second.data["next"])
+        self.assertEqual(len(set(self.titles(response)) | set(self.titles(second))), 3)
+
+    def test_search_index_follows_save_and_delete(self):
+        game = self.games["Forza Horizon"]
+        game.title = "Gran Turismo"
+        game.save()
+        self.assertEqual(self.titles(self.client.get(reverse("games-search"), {"q": "forza"})), [])
+        self.assertEqual(self.titles(self.client.get(reverse("games-search"), {"q": "turismo"})), ["Gran Turismo"])
+        self.assertEqual(len(self.client.get(reverse("games-by-title", args=["g"])).json()), 1)
+
+        game.delete()
+        self.assertEqual(self.titles(self.client.get(reverse("games-search"), {"q": "turismo"})), [])
+
+    def test_search_ignores_query_syntax(self):
+        response = self.client.get(reverse("games-search"), {"q": 'dark" *:'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(response), ["Dark Souls"])
+
+
+# Testy warunkowego GET i cache katalogu gier
+class CatalogCacheTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="testpassword"
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.game = Game.objects.create(title="Test Game", genre="Action", platform="PC", release_date="2020-01-01")
+
+    def game_queries(self, ctx):
+        return [q["sql"] for q in ctx.captured_queries if 'FROM "Game"' in q["sql"]]
+
+    def test_not_modified_skips_catalog_queries(self):
+        for url in (reverse("game-list"), reverse("game-detail", args=[self.game.id]),
+                    reverse("games-by-title", args=["t"]), reverse("games-search") + "?q=test"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertIn("Last-Modified", response)
+
+                with CaptureQueriesContext(connection) as ctx:
+                    cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(cached.content, b"")
+                self.assertEqual(self.game_queries(ctx), [])
+
+    def test_if_modified_since(self):
+        response = self.client.get(reverse("game-list"))
+        cached = self.client.get(reverse("game-list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_serialized_page_served_from_cache(self):
+        first = self.client.get(reverse("game-list"))
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(reverse("game-list"))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.game_queries(ctx), [])
+
+    def test_game_change_invalidates_etag_and_page(self):
+        url = reverse("game-detail", args=[self.game.id])
+        response = self.client.get(url)
+
+        self.game.title = "Renamed"
+        self.game.save()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(fresh["ETag"], response["ETag"])
+        self.assertEqual(fresh.json()["title"], "Renamed")
+
+        self.game.delete()
+        self.assertEqual(self.client.get(reverse("game-list")).json()["results"], [])
+
+    def test_checkout_invalidates_only_its_game(self):
+        other = Game.objects.create(title="Other Game", genre="Action", platform="PC", release_date="2020-01-01")
+        page = self.client.get(reverse("game-list"))
+        other_detail = self.client.get(reverse("game-detail", args=[other.id]))
+        catalog_version = get_version(GAME_CATALOG)
+
+        owner = CustomUser.objects.create(username="renter", email="renter@example.com", password="x")
+        checkout(owner, self.game)
+        self.assertEqual(get_version(GAME_CATALOG), catalog_version)
+
+        cached = self.client.get(reverse("game-detail", args=[other.id]), HTTP_IF_NONE_MATCH=other_detail["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        fresh = self.client.get(reverse("game-list"), HTTP_IF_NONE_MATCH=page["ETag"])
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual({game["title"]: game["available_count"] for game in fresh.json()["results"]},
+                         {"Test Game": 0, "Other Game": 1})
+
+    def test_page_built_during_a_counter_change_is_not_cached(self):
+        builds = []
+
+        def build(bump):
+            builds.append(bump)
+            if bump:
+                bump_versions([game_version(self.game.pk)])
+            return Response({"id": self.game.pk, "available_count": 1})
+
+        request = APIRequestFactory().get("/catalog/")
+        for bump in (True, False, False):
+            response = CatalogCacheMixin().catalog_response(request, lambda: build(bump))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(builds, [True, False])
+
+    def test_etag_depends_on_query(self):
+        first = self.client.get(reverse("game-list"))
+        second = self.client.get(reverse("game-list"), {"page_size": 1})
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+
+class GameRatingTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="reviewer", password="password")
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.owner = CustomUser.objects.create(username="reviewer", email="reviewer@example.com", password="x")
+        self.other = CustomUser.objects.create(username="other", email="other@example.com", password="x")
+        self.game = Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+        self.second = Game.objects.create(title="Celeste", genre="Platformowa", platform="PC",
+                                          release_date="2018-01-25")
+
+    def ratings(self, game):
+        game.refresh_from_db()
+        histogram = [getattr(game, f"rating_{rating}") for rating in range(1, 6)]
+        return game.review_count, game.rating_sum, histogram, game.average_rating
+
+    def test_aggregates_follow_review_changes(self):
+        response = self.client.post(reverse("review-list"), {"user": self.owner.id, "game": self.game.id, "rating": 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        review = Review.objects.create(user=self.other, game=self.game, rating=2)
+        self.assertEqual(self.ratings(self.game), (2, 7, [0, 1, 0, 0, 1], 3.5))
+
+        review.rating = 4
+        review.save()
+        self.assertEqual(self.ratings(self.game), (2, 9, [0, 0, 0, 1, 1], 4.5))
+
+        # Przeniesienie recenzji do innej gry
+        review = Review.objects.get(pk=review.pk)
+        review.game = self.second
+        review.save()
+        self.assertEqual(self.ratings(self.game), (1, 5, [0, 0, 0, 0, 1], 5.0))
+        self.assertEqual(self.ratings(self.second), (1, 4, [0, 0, 0, 1, 0], 4.0))
+
+        review.delete()
+        self.assertEqual(self.ratings(self.second), (0, 0, [0, 0, 0, 0, 0], 0.0))
+
+        # Kaskadowe usunięcie recenzji razem z użytkownikiem
+        self.owner.delete()
+        self.assertEqual(self.ratings(self.game), (0, 0, [0, 0, 0, 0, 0], 0.0))
+
+    def test_serializer_exposes_ratings_and_stale_game_save_keeps_them(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        Review.objects.create(user=self.owner, game=self.game, rating=3)
+        stale.title = "Hades II"
+        stale.save()
+
+        data = self.client.get(reverse("game-detail", args=[self.game.id])).json()
+        self.assertEqual(data["title"], "Hades II")
+        self.assertEqual((data["review_count"], data["rating_sum"], data["average_rating"]), (1, 3, 3.0))
+        self.assertEqual(data["rating_histogram"], {"1": 0, "2": 0, "3": 1, "4": 0, "5": 0})
+
+        # Oceny są tylko do odczytu
+        response = self.client.patch(reverse("game-detail", args=[self.game.id]), {"review_count": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ratings(self.game)[0], 1)
+
+    def test_games_sortable_by_rating(self):
+        third = Game.objects.create(title="Tetris", genre="Logiczna", platform="PC", release_date="1984-06-06")
+        Review.objects.create(user=self.owner, game=self.game, rating=3)
+        Review.objects.create(user=self.owner, game=self.second, rating=5)
+        Review.objects.create(user=self.owner, game=third, rating=3)
+
+        ids = []
+        url = reverse("game-list") + "?ordering=-average_rating&page_size=1"
+        while url:
+            page = self.client.get(url).json()
+            ids += [game["id"] for game in page["results"]]
+            url = page["next"]
+        self.assertEqual(ids, [self.second.id, third.id, self.game.id])
+
+        response = self.client.get(reverse("game-list"), {"ordering": "review_count", "format": "json"})
+        self.assertEqual([game["id"] for game in response.json()["results"]], [self.game.id, self.second.id, third.id])
+
+    def test_review_invalidates_only_its_game(self):
+        detail = self.client.get(reverse("game-detail", args=[self.second.id]))
+        ranking = reverse("game-list") + "?ordering=-average_rating"
+        self.client.get(ranking)
+        catalog_version = get_version(GAME_CATALOG)
+
+        Review.objects.create(user=self.owner, game=self.game, rating=4)
+        self.assertEqual(get_version(GAME_CATALOG), catalog_version)
+        cached = self.client.get(reverse("game-detail", args=[self.second.id]), HTTP_IF_NONE_MATCH=detail["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(reverse("game-detail", args=[self.game.id])).json()["review_count"], 1)
+        # Kolejność według ocen zawsze ze świeżego zapytania
+        self.assertEqual([game["id"] for game in self.client.get(ranking).json()["results"]],
+                         [self.game.id, self.second.id])
+
+    def test_rebuild_command_repairs_drift(self):
+        Review.objects.create(user=self.owner, game=self.game, rating=4)
+        Review.objects.bulk_create([Review(user=self.other, game=self.game, rating=1)])
+        Game.objects.filter(pk=self.second.pk).update(review_count=7, rating_sum=30)
+
+        output = StringIO()
+        call_command("rebuild_game_ratings", stdout=output)
+        self.assertIn("2 gier", output.getvalue())
+        self.assertEqual(self.ratings(self.game), (2, 5, [1, 0, 0, 1, 0], 2.5))
+        self.assertEqual(self.ratings(self.second), (0, 0, [0, 0, 0, 0, 0], 0.0))
+
+
+class LeaderboardTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="ranker", password="password")
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.owner = CustomUser.objects.create(username="ranker", email="ranker@example.com", password="x")
+        self.hades = Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+        self.celeste = Game.objects.create(title="Celeste", genre="Platformowa", platform="Switch",
+                                           release_date="2018-01-25")
+        self.tetris = Game.objects.create(title="Tetris", genre="Logiczna", platform="PC", release_date="1984-06-06")
+
+    def rent(self, game, days_ago=0, count=1):
+        for _ in range(count):
+            Rental.objects.create(user=self.owner, game=game,
+                                  rent_date=timezone.now() - timezone.timedelta(days=days_ago))
+        # Ranking aktualizuje kolejka zadań
+        self.assertEqual(outbox.run_pending(), (count, 0))
+
+    def scores(self, window="week", dimension="game"):
+        return dict(leaderboard.top(window, dimension, 100))
+
+    def test_recent_rentals_outrank_old_ones(self):
+        self.rent(self.hades, count=2)
+        self.rent(self.celeste, count=3, days_ago=14)
+        self.rent(self.tetris)
+
+        # Dwa okresy półtrwania: 3 wypożyczenia sprzed dwóch tygodni ważą tyle co 0.75 dzisiejszego
+        scores = self.scores()
+        self.assertAlmostEqual(scores[str(self.hades.id)], 2, places=3)
+        self.assertAlmostEqual(scores[str(self.celeste.id)], 0.75, places=3)
+        self.assertEqual(list(scores), [str(self.hades.id), str(self.tetris.id), str(self.celeste.id)])
+        self.assertAlmostEqual(self.scores("week", "platform")["PC"], 3, places=3)
+        # Krótsze okno szybciej zapomina
+        self.assertLess(self.scores("trending")[str(self.celeste.id)], 0.001)
+
+    def test_compaction_keeps_current_scores_and_prunes_tiny_ones(self):
+        self.rent(self.hades, count=2)
+        self.rent(self.tetris, days_ago=60)
+        before = self.scores("month")
+
+        later = timezone.now() + timezone.timedelta(days=3)
+        removed = leaderboard.compact(now=later)
+        self.assertGreater(removed, 0)
+        self.assertFalse(LeaderboardScore.objects.filter(window="week", key=str(self.tetris.id)).exists())
+        # Po przesunięciu epoki wynik w tej samej chwili się nie zmienia
+        self.assertAlmostEqual(leaderboard.top("month", "game", 1, now=later)[0][1],
+                               before[str(self.hades.id)] * 0.5 ** (72 / 720), places=6)
+
+        # Kolejne wypożyczenie dolicza się do wyniku po kompaktowaniu
+        self.rent(self.hades)
+        self.assertAlmostEqual(self.scores("week")[str(self.hades.id)], 3, places=3)
+
+    def test_rebuild_matches_incremental_scores(self):
+        self.rent(self.hades, count=2)
+        self.rent(self.celeste, days_ago=5)
+        Rental.objects.bulk_create([Rental(user=self.owner, game=self.tetris, rent_date=timezone.now())])
+        incremental = self.scores("month", "genre")
+
+        call_command("compact_leaderboard", "--rebuild", stdout=StringIO())
+        rebuilt = self.scores("month", "genre")
+        self.assertEqual(set(rebuilt), set(incremental) | {"Logiczna"})
+        for genre, score in incremental.items():
+            self.assertAlmostEqual(rebuilt[genre], score, places=3)
+
+    def test_future_rent_date_does_not_overflow(self):
+        # Data z przyszłości liczy się jak bieżące wypożyczenie zamiast przepełnić math.exp
+        Rental.objects.create(user=self.owner, game=self.hades,
+                              rent_date=timezone.datetime(2300, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(outbox.run_pending(), (1, 0))
+        self.assertAlmostEqual(self.scores()[str(self.hades.id)], 1, places=3)
+
+        call_command("compact_leaderboard", "--rebuild", stdout=StringIO())
+        self.assertAlmostEqual(self.scores()[str(self.hades.id)], 1, places=3)
+
+        LeaderboardEpoch.objects.update(epoch=timezone.now() + timezone.timedelta(days=3650))
+        leaderboard.compact()
+        self.assertLessEqual(self.scores()[str(self.hades.id)], math.exp(leaderboard.MAX_EXPONENT))
+
+    def test_endpoint(self):
+        self.rent(self.celeste)
+        self.rent(self.hades, count=2)
+        response = self.client.get(reverse("leaderboard"), {"window": "trending", "limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data["window"], data["half_life_hours"], data["dimension"]), ("trending", 24, "game"))
+        self.assertEqual(data["results"], [{"rank": 1, "game": self.hades.id, "score": 2.0, "title": "Hades"}])
+
+        # Usunięta gra znika z rankingu
+        self.hades.delete()
+        results = self.client.get(reverse("leaderboard"), {"window": "trending"}).json()["results"]
+        self.assertEqual([result["title"] for result in results], ["Celeste"])
+
+        genres = self.client.get(reverse("leaderboard"), {"dimension": "genre"}).json()["results"]
+        # Wymiary zbiorcze zachowują historię wypożyczeń usuniętej gry
+        self.assertEqual([result["genre"] for result in genres], ["Akcja", "Platformowa"])
+
+        for params in ({"window": "year"}, {"dimension": "user"}, {"limit": 0}, {"limit": "x"}):
+            response = self.client.get(reverse("leaderboard"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.json())
+
+
+class StreamingExportTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.token = f"Token {Token.objects.create(user=self.admin).key}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        self.alice = CustomUser.objects.create(username="alice", email="alice@example.com", password="secret")
+        self.bob = CustomUser.objects.create(username="bob", email="bob@example.com", password="secret")
+        game = Game.objects.create(title="Zelda, \"Breath\"", genre="Adventure", platform="Switch",
+                                   release_date="2017-03-03")
+        for user, day in ((self.alice, 5), (self.bob, 10), (self.alice, 20)):
+            rental = Rental.objects.create(user=user, game=game,
+                                           rent_date=timezone.make_aware(timezone.datetime(2024, 1, day)))
+            Payment.objects.create(user=user, rental=rental, amount="12.50", payment_method="karta",
+                                   payment_date=rental.rent_date)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_of_rentals(self):
+        rows = list(csv.reader(StringIO(self.export("rental-export"))))
+        self.assertEqual(rows[0], ["id", "user_id", "game_id", "game__title", "rent_date", "return_date", "status"])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][3], "Zelda, \"Breath\"")
+        self.assertEqual([row[1] for row in rows[1:]], [str(self.alice.pk), str(self.bob.pk), str(self.alice.pk)])
+
+    def test_ndjson_export_with_filters(self):
+        body = self.export("payment-export", output="ndjson", user=self.alice.pk, **{"from": "2024-01-06"})
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["amount"], "12.50")
+        self.assertEqual(lines[0]["user_id"], self.alice.pk)
+
+    def test_non_staff_exports_only_own_rows(self):
+        auth_user = User.objects.create_user(username="bob", password="secret")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=auth_user).key}")
+        body = self.export("rental-export", output="ndjson", user=self.alice.pk)
+        self.assertEqual(body, "")
+        self.assertEqual(len(self.export("rental-export", output="ndjson").splitlines()), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse("rental-export"), {"output": "xml"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse("rental-export"), {"from": "wczoraj"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_export_reads_rows_in_chunks(self):
+        with override_settings(GAME_RENTAL={"EXPORT_CHUNK_SIZE": 1}):
+            response = self.client.get(reverse("rental-export"))
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 4)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command("export_history", "payments", "--year", "2024", "--month", "1", "--user", str(self.bob.pk),
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "id,user_id,rental_id,amount,payment_date,payment_method")
+        self.assertEqual(len(lines), 2)
+
+
+class BulkLoadTests(GameRentalTestCase):
+
+    def write_fixture(self, objects, encoding):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding=encoding) as fixture:
+            json.dump(objects, fixture, ensure_ascii=False, indent=2)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def fixture_objects(self):
+        auth_user = User.objects.create_user(username="anna", password="secret")
+        self.auth_user_id = auth_user.pk
+        return [
+            # Wypożyczenie przed użytkownikiem i grą - kolejność zapisu ustala loader
+            {"model": "GameRental.rental", "pk": 1,
+             "fields": {"user": 1, "game": 1, "rent_date": "2024-10-05T10:00:00Z", "return_date": None,
+                        "status": "wypożyczona"}},
+            {"model": "GameRental.user", "pk": 1,
+             "fields": {"username": "anna", "email": "anna@example.com", "password": "x", "is_staff": False,
+                        "date_joined": "2024-10-01T10:00:00Z", "last_login": None}},
+            {"model": "GameRental.user", "pk": 2,
+             "fields": {"username": "piotr", "email": "piotr@example.com", "password": "x", "is_staff": False,
+                        "date_joined": "2024-10-02T10:00:00Z", "last_login": None}},
+            {"model": "GameRental.game", "pk": 1,
+             "fields": {"title": "Wiedźmin", "genre": "RPG", "platform": "PC", "release_date": "2015-05-19",
+                        "is_available": False}},
+            {"model": "GameRental.rental", "pk": 2,
+             "fields": {"user": 2, "game": 1, "rent_date": "2024-11-05T10:00:00Z",
+                        "return_date": "2024-11-06T10:00:00Z", "status": "zwrócona"}},
+            {"model": "GameRental.review", "pk": 1,
+             "fields": {"user": 1, "game": 1, "rating": 5, "comment": "Świetna", "created_at": "2024-10-06T10:00:00Z"}},
+            {"model": "GameRental.payment", "pk": 1,
+             "fields": {"user": 1, "rental": 1, "amount": "15.00", "payment_date": "2024-10-05T10:00:00Z",
+                        "payment_method": "karta"}},
+            {"model": "GameRental.monthlyrentalsummary", "pk": 1,
+             "fields": {"year": 2000, "month": 1, "game": 1, "total": 99}},
+        ]
+
+    def load(self, path, *args):
+        out = StringIO()
+        call_command("bulk_load", path, "--batch-size", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_loads_utf16_dump_in_dependency_order(self):
+        output = self.load(self.write_fixture(self.fixture_objects(), "utf-16"))
+        self.assertIn("GameRental.Rental: 2 wierszy", output)
+        self.assertIn("wierszy/s", output)
+
+        self.assertEqual(Rental.objects.count(), 2)
+        self.assertEqual(Payment.objects.get().amount, Decimal("15.00"))
+        self.assertEqual(Game.objects.get().title_normalized, "wiedźmin")
+        self.assertEqual(CustomUser.objects.get(username="anna").auth_user_id, self.auth_user_id)
+        self.assertEqual(
+            sorted(MonthlyRentalSummary.objects.values_list("year", "month", "total")),
+            [(2024, 10, 1), (2024, 11, 1)],
+        )
+        # Indeksy pomocnicze odtworzone po załadowaniu
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Rental._meta.db_table)
+        self.assertIn("rental_rent_date_id_idx", indexes)
+
+        # Nowe wiersze po imporcie nie kolidują z załadowanymi kluczami
+        self.assertEqual(CustomUser.objects.create(username="nowy", email="n@example.com", password="x").pk, 3)
+
+    def test_loads_repository_dump_into_migrated_database(self):
+        path = settings.BASE_DIR / "data.json"
+        with open_fixture(path) as stream:
+            dump = list(iter_json_array(stream))
+        codenames = {obj["pk"]: obj["fields"]["codename"] for obj in dump if obj["model"] == "auth.permission"}
+        groups = {obj["fields"]["name"]: {codenames[pk] for pk in obj["fields"]["permissions"]}
+                  for obj in dump if obj["model"] == "auth.group"}
+        self.load(path)
+
+        self.assertEqual(Game.objects.count(), 5)
+        self.assertEqual(Rental.objects.count(), 5)
+        self.assertEqual(LogEntry.objects.count(), 32)
+        # Typy zawartości i uprawnienia dopasowane do utworzonych przez migracje
+        self.assertEqual(LogEntry.objects.get(pk=1).content_type.model_class(), CustomUser)
+        for name, expected in groups.items():
+            self.assertEqual(set(Group.objects.get(name=name).permissions.values_list("codename", flat=True)),
+                             expected)
+
+    def test_utf8_and_ignore_conflicts(self):
+        path = self.write_fixture(self.fixture_objects(), "utf-8")
+        self.load(path)
+        self.load(path, "--ignore-conflicts")
+        self.assertEqual(Rental.objects.count(), 2)
+
+    def test_broken_references_roll_back(self):
+        objects = [obj for obj in self.fixture_objects() if obj["model"] != "GameRental.game"]
+        with self.assertRaises(CommandError):
+            self.load(self.write_fixture(objects, "utf-8"))
+        self.assertFalse(Rental.objects.exists())
+
+    def test_incremental_parser_across_chunks(self):
+        objects = [{"model": "x", "pk": n, "fields": {"text": "ąę" * n}} for n in range(50)]
+        stream = StringIO(json.dumps(objects))
+        self.assertEqual(list(iter_json_array(stream, read_size=7)), objects)
+
+
+@requires_replica
+class BulkLoadReplicaTests(GameRentalTestCase):
+    databases = REPLICA_DATABASES
+    write_fixture = BulkLoadTests.write_fixture
+    fixture_objects = BulkLoadTests.fixture_objects
+
+    def test_derived_data_is_rebuilt_in_the_loaded_database(self):
+        loader = BulkLoader(batch_size=1)
+        loader.using = "replica"
+        started = timezone.now()
+        loader.load(self.write_fixture(self.fixture_objects(), "utf-8"))
+        self.assertEqual(MonthlyRentalSummary.objects.using("replica").count(), 2)
+        game = Game.objects.using("replica").get()
+        self.assertEqual((game.rented_count, game.review_count), (1, 1))
+        self.assertGreaterEqual(
+            min(LeaderboardEpoch.objects.using("replica").values_list("epoch", flat=True)), started,
+        )
+        self.assertFalse(MonthlyRentalSummary.objects.exists())
+
+
+class DatasetAndBenchmarkTests(GameRentalTestCase):
+
+    def generate(self, *args):
+        call_command("generate_dataset", "--users", "30", "--games", "8", "--rentals-per-user", "4",
+                     "--reviews", "40", "--active-ratio", "0.25", "--seed", "7", *args, stdout=StringIO())
+
+    def test_generated_dataset_is_consistent(self):
+        self.generate()
+        self.assertEqual(CustomUser.objects.count(), 30)
+        self.assertEqual(Game.objects.count(), 8)
+        self.assertEqual(Review.objects.count(), 40)
+        self.assertTrue(Payment.objects.exists())
+        self.assertEqual(sum(MonthlyRentalSummary.objects.values_list("total", flat=True)), Rental.objects.count())
+
+        # Aktywne wypożyczenia zgadzają się z dostępnością gier
+        self.assertEqual(
+            set(Rental.active_rentals().values_list("game_id", flat=True)),
+            set(Game.objects.filter(available_count=0).values_list("id", flat=True)),
+        )
+        # Kolejki oczekujących tylko na wypożyczone gry
+        self.assertEqual(Reservation.objects.count(), 4)
+        self.assertFalse(Reservation.objects.filter(game__available_count__gt=0).exists())
+        # Rozkład popularności - pierwsza gra w rankingu wypożyczana częściej niż ostatnia
+        games = list(Game.objects.order_by("id").values_list("id", flat=True))
+        self.assertGreater(Rental.objects.filter(game_id=games[0]).count(),
+                           Rental.objects.filter(game_id=games[-1]).count())
+
+        self.generate("--clear")
+        self.assertEqual(CustomUser.objects.count(), 30)
+
+    def test_benchmark_covers_every_route(self):
+        self.generate()
+        report = Benchmark(iterations=2, warmup=0, track_allocations=False).run()
+        self.assertEqual(set(report["results"]), route_names())
+        for name, result in report["results"].items():
+            self.assertTrue(all(code < 400 for code in result["status"]), (name, result["status"]))
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+        # Zapisy z benchmarku są wycofywane
+        self.assertFalse(CustomUser.objects.filter(username__startswith="bench").exists())
+
+    def test_compare_with_baseline(self):
+        current = {"results": {"game-list": {"p95_ms": 13.0, "queries": 2}, "login": {"p95_ms": 5.0, "queries": 1}}}
+        baseline = {"results": {"game-list": {"p95_ms": 10.0, "queries": 1}, "login": {"p95_ms": 5.0, "queries": 1}}}
+        rows, regressions = compare(current, baseline, tolerance=0.2)
+        self.assertEqual(regressions, ["game-list"])
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 0.5), 3)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 0.99), 5)
+
+
+class RowSerializerTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="lister", password="password", is_staff=True)
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        owner = CustomUser.objects.create(username="lister", email="lister@example.com", password="x")
+        games = [
+            Game.objects.create(title="Wiedźmin 3 \u2028 \"Dziki Gon\"", genre="RPG", platform="PC",
+                                release_date="2015-05-19"),
+            Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17",
+                                total_copies=0),
+        ]
+        Review.objects.create(user=owner, game=games[1], rating=4)
+        for index in range(5):
+            rental = Rental.objects.create(user=owner, game=games[index % 2],
+                                           rent_date=timezone.now() - timezone.timedelta(days=index, microseconds=index))
+            if index % 2:
+                rental.return_date = timezone.now()
+                rental.save()
+            Payment.objects.create(user=owner, rental=rental, amount=Decimal("19.9") + index, payment_method="Karta")
+
+    def rendered(self, data):
+        return MeasuredJSONRenderer().render(data)
+
+    def test_rows_match_model_serializers(self):
+        for serializer_class in (GameSerializer, RentalSerializer, PaymentSerializer):
+            queryset = serializer_class.Meta.model.objects.order_by("id")
+            rows = RowSerializer.for_serializer(serializer_class)
+            data = rows.data(rows.queryset(queryset))
+            expected = serializer_class(queryset, many=True).data
+            self.assertEqual(self.rendered(data), self.rendered(expected))
+            if orjson is not None:
+                self.assertEqual(MeasuredJSONRenderer().render_orjson(data), self.rendered(expected))
+
+        # Serializer z polem spoza obsługiwanego zakresu - zwykła ścieżka
+        class TitledRentalSerializer(RentalSerializer):
+            title = serializers.CharField(source="game.title")
+
+        self.assertIsNone(RowSerializer.for_serializer(TitledRentalSerializer))
+
+    def test_list_endpoints_identical_with_fast_path(self):
+        urls = [
+            reverse("game-list") + "?ordering=-average_rating&page_size=1",
+            reverse("rental-list") + "?page_size=2",
+            reverse("payment-list"),
+            reverse("user-rentals", args=[CustomUser.objects.get().id]),
+        ]
+        for url in urls:
+            fast = self.client.get(url)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            next_url = fast.json().get("next") if url != urls[-1] else None
+            cache.clear()
+            with override_settings(GAME_RENTAL={"FAST_LIST_SERIALIZATION": False}):
+                self.assertEqual(self.client.get(url).content, fast.content, url)
+                if next_url:
+                    second = self.client.get(next_url).content
+            if next_url:
+                cache.clear()
+                self.assertEqual(self.client.get(next_url).content, second, next_url)
+
+    @skipUnless(orjson, "orjson nie jest zainstalowany")
+    def test_orjson_renderer_output(self):
+        url = reverse("rental-list")
+        expected = self.client.get(url).content
+        with override_settings(GAME_RENTAL={"FAST_JSON_RENDERER": True}):
+            self.assertEqual(self.client.get(url).content, expected)
+            # Wcięcia tylko przez zwykły JSONRenderer
+            indented = self.client.get(url, HTTP_ACCEPT="application/json; indent=2").content
+        self.assertIn(b'\n  "next"', indented)
+
+    def test_serializer_benchmark_command(self):
+        output = StringIO()
+        call_command("benchmark_serializers", "--rows", "20", "--repeat", "1", stdout=output)
+        report = serialization_benchmark(rows=20, repeat=1)
+        self.assertEqual(set(report["results"]), {"games", "rentals", "payments"})
+        for result in report["results"].values():
+            self.assertEqual(result["rows"], 20)
+            self.assertTrue(result["identical"])
+        self.assertIn("przyspieszenie", output.getvalue())
+        self.assertNotIn("różni się", output.getvalue())
+
+
+class SparseFieldsTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="mobile", password="password", is_staff=True)
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.owner = CustomUser.objects.create(username="mobile", email="mobile@example.com", password="x")
+        self.games = [
+            Game.objects.create(title=f"Gra {index}", genre="RPG", platform="PC", release_date="2020-01-01")
+            for index in range(3)
+        ]
+        for game in self.games:
+            rental = Rental.objects.create(user=self.owner, game=game)
+            Payment.objects.create(user=self.owner, rental=rental, amount=Decimal("9.99"), payment_method="Karta")
+        Review.objects.create(user=self.owner, game=self.games[0], rating=5)
+
+    def get(self, name, params, *args):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=args), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        selects = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+        return response.json(), selects
+
+    def test_fields_project_columns(self):
+        for fast in (True, False):
+            cache.clear()
+            with override_settings(GAME_RENTAL={"FAST_LIST_SERIALIZATION": fast}):
+                data, selects = self.get("game-list", {"fields": "id,title,platform", "page_size": 2})
+            self.assertEqual([set(game) for game in data["results"]], [{"id", "title", "platform"}] * 2)
+            game_query = next(sql for sql in selects if 'FROM "Game"' in sql)
+            self.assertNotIn('"Genre"', game_query)
+            # Kursor następnej strony działa także bez pól sortowania w odpowiedzi
+            cursor = self.client.get(data["next"]).json()
+            self.assertEqual([game["id"] for game in cursor["results"]], [self.games[2].id])
+
+        data, _ = self.get("game-detail", {"fields": "title,availability_status"}, self.games[0].id)
+        self.assertEqual(data, {"title": "Gra 0", "availability_status": "Dostępna"})
+        data, _ = self.get("rental-list", {"fields": "id,status"})
+        self.assertEqual(set(data["results"][0]), {"id", "status"})
+        data, _ = self.get("user-list", {"fields": "username"})
+        self.assertEqual(data["results"], [{"username": "mobile"}])
+
+    def test_expand_embeds_related_objects_in_one_query(self):
+        for fast in (True, False):
+            with override_settings(GAME_RENTAL={"FAST_LIST_SERIALIZATION": fast}):
+                data, selects = self.get("rental-list", {"expand": "game,user"})
+            rental_queries = [sql for sql in selects if 'FROM "Rental"' in sql]
+            self.assertEqual(len(rental_queries), 1)
+            self.assertIn("JOIN", rental_queries[0])
+            # Szybka ścieżka czyta tylko kolumny osadzanych pól, select_related - cały wiersz
+            self.assertEqual('"User"."Email"' in rental_queries[0], not fast)
+            first = data["results"][0]
+            self.assertEqual(first["user"], {"id": self.owner.id, "username": "mobile"})
+            self.assertEqual(first["game"]["title"], "Gra 2")
+            self.assertEqual(first["game"]["rating_histogram"], {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0})
+
+        data, _ = self.get("payment-list", {"expand": "rental", "fields": "amount"})
+        self.assertEqual(set(data["results"][0]), {"amount", "rental"})
+        self.assertEqual(data["results"][0]["rental"]["game"], self.games[2].id)
+        data, _ = self.get("review-detail", {"expand": "game"}, Review.objects.get().id)
+        self.assertEqual(data["game"]["title"], "Gra 0")
+
+        # Zapisy ignorują parametry i przyjmują identyfikatory
+        response = self.client.post(reverse("review-list") + "?expand=game&fields=id",
+                                    {"user": self.owner.id, "game": self.games[1].id, "rating": 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["game"], self.games[1].id)
+
+    def test_unknown_fields_rejected(self):
+        for name, params in (("game-list", {"fields": "id,secret"}), ("rental-list", {"expand": "payment"}),
+                             ("user-list", {"fields": "password"}), ("game-list", {"expand": "user"})):
+            response = self.client.get(reverse(name), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, name)
+            self.assertIn("error", response.json())
+
+
+class MetricsTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.admin = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.token = f"Token {Token.objects.create(user=self.admin).key}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        Game.objects.create(title="Zelda", genre="Adventure", platform="Switch", release_date="2017-03-03")
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_histograms_keyed_by_url_name(self):
+        self.client.get(reverse("game-list"))
+        self.client.get(reverse("game-list"))
+        self.client.get(reverse("monthly-orders-summary"))
+        body = self.scrape()
+
+        self.assertIn('gamerental_requests_total{view="game-list",method="GET",status="200"} 2', body)
+        self.assertIn('gamerental_request_duration_seconds_count{view="game-list",method="GET"} 2', body)
+        self.assertIn('gamerental_request_duration_seconds_bucket{view="game-list",method="GET",le="+Inf"} 2', body)
+        # Druga strona katalogu z cache - bez serializacji obiektów, tylko renderowanie
+        self.assertIn('gamerental_serialize_duration_seconds_count{view="game-list",method="GET"} 1', body)
+        self.assertIn('gamerental_render_duration_seconds_count{view="game-list",method="GET"} 2', body)
+        self.assertIn('gamerental_db_queries_count{view="monthly-orders-summary",method="GET"} 1', body)
+        self.assertIn("# TYPE gamerental_response_size_bytes histogram", body)
+
+    def test_query_count_and_response_size_are_recorded(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("monthly-orders-summary"))
+        histogram = registry.histograms[("gamerental_db_queries", ("monthly-orders-summary", "GET"))]
+        self.assertEqual(histogram.sum, len(ctx.captured_queries))
+        size = registry.histograms[("gamerental_response_size_bytes", ("monthly-orders-summary", "GET"))]
+        self.assertEqual(size.sum, len(response.content))
+
+    def test_metrics_endpoint_requires_staff(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(GAME_RENTAL={"SLOW_QUERY_THRESHOLD_MS": 0, "SLOW_QUERY_SAMPLE_RATE": 1.0})
+    def test_slow_queries_are_logged_with_sql_and_stack(self):
+        with self.assertLogs("GameRental.slow_queries", level="WARNING") as logs:
+            self.client.get(reverse("game-list"))
+        self.assertIn('"Game"', "\n".join(logs.output))
+        self.assertIn("mixins.py", "\n".join(logs.output))
+
+    @override_settings(GAME_RENTAL={"SLOW_QUERY_THRESHOLD_MS": 0, "SLOW_QUERY_SAMPLE_RATE": 1.0,
+                                    "ASGI_URLCONF": "mysite.asgi_urls"})
+    async def test_slow_queries_in_async_views_have_view_stack(self):
+        with self.assertLogs("GameRental.slow_queries", level="WARNING") as logs:
+            response = await AsyncClient().get(reverse("game-list"), headers={"authorization": self.token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        output = "\n".join(logs.output)
+        self.assertIn('"Game"', output)
+        # Ramki korutyny widoku, choć zapytanie wykonał wątek async ORM
+        self.assertIn("async_views.py", output)
+        self.assertIn("mixins.py", output)
+
+    @override_settings(GAME_RENTAL={"SLOW_QUERY_THRESHOLD_MS": 0, "SLOW_QUERY_SAMPLE_RATE": 0.0})
+    def test_slow_query_sampling(self):
+        with self.assertNoLogs("GameRental.slow_queries", level="WARNING"):
+            self.client.get(reverse("game-list"))
+
+
+class AsyncViewTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="password", is_staff=True)
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.user = User.objects.create_user(username="player", password="password")
+        self.user_token = Token.objects.create(user=self.user)
+        self.game = Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+        self.async_client = AsyncClient()
+
+    def auth(self, token=None):
+        return {"authorization": f"Token {token or self.admin_token.key}"}
+
+    async def test_async_views_match_sync_views(self):
+        for url in (reverse("game-list"), reverse("game-detail", args=[self.game.pk]),
+                    reverse("games-by-title", args=["h"]), reverse("game-detail", args=[0])):
+            response = await self.async_client.get(url, headers=self.auth())
+            sync_response = await self.async_client.get(url, {"format": "json"}, headers=self.auth())
+            self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_404_NOT_FOUND))
+            self.assertEqual(response.status_code, sync_response.status_code, url)
+            self.assertEqual(response.content, sync_response.content, url)
+            self.assertEqual(response["Allow"], sync_response["Allow"], url)
+
+    async def test_async_views_only_under_asgi(self):
+        response = await self.async_client.get(reverse("game-list"), headers=self.auth())
+        self.assertEqual(response.resolver_match.func.view_class, async_views.GameList)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth()["authorization"])
+        response = await sync_to_async(self.client.get)(reverse("game-list"))
+        self.assertEqual(response.resolver_match.func.cls, GameViewSet)
+
+    async def test_async_token_authentication(self):
+        response = await self.async_client.get(reverse("game-list"), headers=self.auth("nieistniejacy"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+        headers = self.auth(self.user_token.key)
+        self.assertEqual((await self.async_client.get(reverse("game-list"), headers=headers)).status_code,
+                         status.HTTP_200_OK)
+        response = await self.async_client.get(reverse("monthly-orders-summary"), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_writes_delegate_to_viewset(self):
+        url = reverse("game-detail", args=[self.game.pk])
+        response = await self.async_client.patch(url, {"title": "Hades II"}, content_type="application/json",
+                                                 headers=self.auth())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((await self.async_client.get(url, headers=self.auth())).json()["title"], "Hades II")
+
+    @override_settings(MIDDLEWARE=[name for name in settings.MIDDLEWARE if not name.startswith("debug_toolbar")])
+    def test_middleware_chain_is_not_adapted_under_asgi(self):
+        with self.assertNoLogs("django.request", level="DEBUG"):
+            ASGIHandler()
+
+
+class SlowClientBenchmarkTests(TransactionTestCase):
+
+    def test_asgi_and_wsgi_modes(self):
+        Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+        output = StringIO()
+        call_command("benchmark_concurrency", "--clients", "4", "--requests", "2", "--delay", "5",
+                     "--workers", "2", stdout=output)
+        self.assertIn("asgi", output.getvalue())
+        report = SlowClientBenchmark(clients=3, requests=2, delay=0.001, workers=2).run()
+        for mode in ("asgi", "wsgi"):
+            self.assertEqual(report["results"][mode]["requests"], 6)
+            self.assertEqual(report["results"][mode]["status"], [200])
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark_concurrency", "--route", "register", stdout=StringIO())
+
+
+class SettingsProfileTests(TransactionTestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    @skipUnless(connection.vendor == "sqlite", "pragmy SQLite")
+    def test_sqlite_pragmas_applied_on_connect(self):
+        original = self.pragma("busy_timeout")
+        with override_settings(GAME_RENTAL={"SQLITE_PRAGMAS": {"busy_timeout": 1234, "temp_store": "memory"}}):
+            apply_sqlite_pragmas(connection)
+            self.assertEqual(self.pragma("busy_timeout"), 1234)
+            self.assertEqual(self.pragma("temp_store"), 2)
+        connection.cursor().execute(f"PRAGMA busy_timeout = {original}")
+
+        with override_settings(GAME_RENTAL={"SQLITE_PRAGMAS": {"busy_timeout": "1; DROP TABLE Game"}}):
+            with self.assertRaises(ValueError):
+                apply_sqlite_pragmas(connection)
+
+    @skipUnless(connection.vendor == "sqlite", "proces potomny korzysta z plikowej bazy testowej")
+    def test_profiles_in_fresh_processes(self):
+        db_env = {"DJANGO_DB_NAME": str(connection.settings_dict["NAME"])}
+        prod = run_probe("prod", requests=3, extra_env=db_env)
+        self.assertEqual(prod["status"], 200)
+        self.assertFalse(prod["debug"])
+        # Połączenie utrzymywane między żądaniami (CONN_MAX_AGE)
+        self.assertLessEqual(prod["connections_opened"], 1)
+
+        dev = run_probe("dev", requests=3, extra_env=db_env)
+        self.assertTrue(dev["debug"])
+        self.assertEqual(dev["connections_opened"], 3)
+
+    def test_prod_profile_requires_secret_key(self):
+        env = dict(os.environ, DJANGO_ENV="prod", DJANGO_SECRET_KEY="")
+        result = subprocess.run(
+            [sys.executable, "-c", "import django; django.setup()"], env=env, capture_output=True, text=True,
+            cwd=settings.BASE_DIR,
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("DJANGO_SECRET_KEY", result.stderr)
+
+    def test_debug_toolbar_only_in_dev(self):
+        code = ("import django; django.setup(); from django.conf import settings; from mysite import urls; "
+                "print('debug_toolbar' in settings.INSTALLED_APPS, "
+                "any('__debug__' in str(pattern.pattern) for pattern in urls.urlpatterns))")
+        outputs = {}
+        for profile in ("dev", "prod"):
+            env = dict(os.environ, DJANGO_ENV=profile, DJANGO_SECRET_KEY="x" * 50)
+            outputs[profile] = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True,
+                                              text=True, cwd=settings.BASE_DIR).stdout.strip()
+        self.assertEqual(outputs, {"dev": "True True", "prod": "False False"})
+
+
+# Testy odczytów z repliki - dwie plikowe bazy SQLite: główna i replika kopiowana przez replicate()
+@override_settings(GAME_RENTAL={"REPLICA_DATABASE": "replica", "REPLICA_LAG_TOLERANCE": 5,
+                                "REPLICA_LAG_CHECK_INTERVAL": 0, "REPLICA_HEARTBEAT_INTERVAL": 0,
+                                "PASSWORD_HASH_WORKERS": 0})
+@requires_replica
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = REPLICA_DATABASES
+
+    def setUp(self):
+        clear_caches()
+        cache.clear()
+        self.user = User.objects.create_user(username="admin", password="adminpassword", is_staff=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.game = Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+        self.replicate()
+        self.rename("Hades II")
+
+    def replicate(self):
+        for model in (Game, TableVersion):
+            fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+            model.objects.using("replica").bulk_create(
+                model.objects.using("default").all(), update_conflicts=True,
+                unique_fields=[model._meta.pk.name], update_fields=fields,
+            )
+        rebuild_search_index(using="replica")
+
+    def rename(self, title):
+        self.game.title = title
+        self.game.save()
+
+    def title(self):
+        return self.client.get(reverse("game-detail", args=[self.game.pk])).json()["title"]
+
+    def test_safe_requests_read_replica(self):
+        # Token tylko w bazie głównej - uwierzytelnianie zawsze z niej
+        self.assertEqual(self.title(), "Hades")
+        self.assertEqual(self.client.get(reverse("game-list")).json()["results"][0]["title"], "Hades")
+
+    def test_search_reads_replica(self):
+        with CaptureQueriesContext(connections["replica"]) as ctx:
+            response = self.client.get(reverse("games-search"), {"q": "hades"})
+        self.assertEqual([game["title"] for game in response.json()["results"]], ["Hades"])
+        self.assertTrue(any("GameSearch" in query["sql"] for query in ctx.captured_queries))
+        self.assertEqual(self.client.get(reverse("games-search"), {"q": "ii"}).json()["results"], [])
+
+    def test_write_pins_reads_to_primary(self):
+        with replica_reads() as state:
+            self.assertEqual(Game.objects.get(pk=self.game.pk).title, "Hades")
+            self.rename("Hades II")
+            self.assertTrue(state.pinned)
+            self.assertEqual(Game.objects.get(pk=self.game.pk).title, "Hades II")
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(Game.objects.get(pk=self.game.pk).title, "Hades II")
+        self.assertEqual(Game.objects.get(pk=self.game.pk).title, "Hades II")
+
+    def test_write_pins_client_for_lag_tolerance(self):
+        response = self.client.post(reverse("login"), {"username": "admin", "password": "adminpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+        self.assertEqual(self.title(), "Hades II")
+        # Raport czyta z repliki także w przypiętym żądaniu
+        with CaptureQueriesContext(connections["replica"]) as ctx:
+            response = self.client.get(reverse("monthly-orders-summary"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(ctx.captured_queries)
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.title(), "Hades")
+
+    def age_replica(self, seconds):
+        # Ostatni zapis, który replika ma, nastąpił `seconds` sekund temu
+        TableVersion.objects.using("replica").filter(name=HEARTBEAT).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds),
+        )
+
+    def test_lagging_replica_is_skipped(self):
+        self.assertEqual(self.title(), "Hades")
+        self.age_replica(60)
+        self.assertEqual(self.title(), "Hades II")
+        self.replicate()
+        self.rename("Hades III")
+        self.assertEqual(self.title(), "Hades II")
+
+    def test_any_write_counts_as_replica_lag(self):
+        owner = CustomUser.objects.create(username="gracz", email="gracz@example.com", password="x")
+        rental = Rental.objects.create(user=owner, game=self.game)
+        self.replicate()
+        self.age_replica(60)
+        self.assertEqual(replica_lag("replica"), 0)
+        payment = Payment.objects.create(user=owner, rental=rental, amount=Decimal("10.00"), payment_method="Karta")
+        self.assertGreater(replica_lag("replica"), 5)
+        with replica_reads():
+            self.assertTrue(Payment.objects.filter(pk=payment.pk).exists())
+        self.replicate()
+        self.assertEqual(replica_lag("replica"), 0)
+
+    def test_heartbeat_is_throttled(self):
+        heartbeat = TableVersion.objects.get(name=HEARTBEAT).version
+        with self.settings(GAME_RENTAL=dict(settings.GAME_RENTAL, REPLICA_HEARTBEAT_INTERVAL=60)):
+            for title in ("Hades III", "Hades IV", "Hades V"):
+                self.rename(title)
+            self.assertLessEqual(TableVersion.objects.get(name=HEARTBEAT).version, heartbeat + 1)
+        self.rename("Hades VI")
+        self.assertGreater(TableVersion.objects.get(name=HEARTBEAT).version, heartbeat)
+
+
+class OutboxTests(GameRentalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        outbox.task("test.record")(lambda **payload: self.calls.append(payload))
+        self.addCleanup(outbox.HANDLERS.pop, "test.record")
+        self.owner = CustomUser.objects.create(username="outbox", email="outbox@example.com", password="x")
+        self.game = Game.objects.create(title="Hades", genre="Akcja", platform="PC", release_date="2020-09-17")
+
+    def test_task_is_rolled_back_with_the_write(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Rental.objects.create(user=self.owner, game=self.game)
+            self.assertEqual(OutboxTask.objects.count(), 1)
+            raise RuntimeError()
+        self.assertFalse(OutboxTask.objects.exists())
+        with self.assertRaises(LookupError):
+            outbox.enqueue("test.unknown")
+
+    def test_failed_tasks_are_retried_then_parked(self):
+        def fail(**payload):
+            raise ValueError("brak połączenia")
+        outbox.task("test.fail")(fail)
+        self.addCleanup(outbox.HANDLERS.pop, "test.fail")
+        task = outbox.enqueue("test.fail", value=1)
+
+        with override_settings(GAME_RENTAL={"OUTBOX_MAX_ATTEMPTS": 2}), self.assertLogs("GameRental.outbox"):
+            self.assertEqual(outbox.run_pending(), (0, 1))
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts, task.last_error), ("oczekuje", 1, "ValueError: brak połączenia"))
+            # Kolejna próba dopiero po opóźnieniu
+            self.assertEqual(outbox.claim(), [])
+            self.assertEqual(len(outbox.claim(now=task.available_at)), 1)
+            outbox.run(OutboxTask.objects.get(pk=task.pk))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ("nieudane", 2))
+
+        outbox.HANDLERS["test.fail"] = outbox.HANDLERS["test.record"]
+        self.assertEqual(outbox.retry_failed(), 1)
+        self.assertEqual(outbox.run_pending(), (1, 0))
+        self.assertEqual(self.calls, [{"value": 1}])
+
+    def test_expired_lease_is_delivered_again(self):
+        outbox.enqueue("test.record", value=1)
+        [crashed] = outbox.claim()
+        # Dzierżawa wykonawcy, który przestał działać, wygasa i zadanie wraca do kolejki
+        self.assertEqual(outbox.claim(), [])
+        later = timezone.now() + timezone.timedelta(seconds=301)
+        [retried] = outbox.claim(now=later)
+        self.assertEqual(retried.attempts, 2)
+
+        # Spóźniony wykonawca nie zatwierdza skutków - zadanie należy już do innego
+        self.assertFalse(outbox.run(crashed))
+        self.assertTrue(outbox.run(retried))
+        self.assertFalse(OutboxTask.objects.exists())
+
+    def test_hold_notification_is_sent_by_the_worker(self):
+        rental = checkout(self.owner, self.game)
+        waiting = CustomUser.objects.create(username="czeka", email="czeka@example.com", password="x")
+        reserve(waiting, self.game)
+        rental.status = "zwrócona"
+        rental.save()
+        self.assertEqual(mail.outbox, [])
+
+        # Ranking wypożyczenia i powiadomienie o odłożonym egzemplarzu
+        self.assertEqual(outbox.run_pending(), (2, 0))
+        self.assertEqual([message.to for message in mail.outbox], [["czeka@example.com"]])
+        self.assertIn("Hades", mail.outbox[0].subject)
+        self.assertFalse(OutboxTask.objects.exists())
+
+
+# Wątki wykonawców mają własne połączenia - dane muszą być zatwierdzone. Zadania wykonuje
+# tylko outbox_worker, chyba że test sam włącza wątki serwera.
+@override_settings(GAME_RENTAL={"OUTBOX_LOCAL_WORKERS": 0})
+class OutboxWorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.owner = CustomUser.objects.create(username="outbox", email="outbox@example.com", password="x")
+        self.games = [
+            Game.objects.create(title=f"Gra {n}", genre="Akcja", platform="PC", release_date="2020-01-01")
+            for n in range(6)
+        ]
+
+    def test_worker_threads_deliver_each_task_once(self):
+        for game in self.games:
+            checkout(self.owner, game)
+        out = StringIO()
+        call_command("outbox_worker", "--once", "--threads", "3", "--batch-size", "1", stdout=out)
+        self.assertIn("Wykonano 6 zadań", out.getvalue())
+        self.assertEqual(len(leaderboard.top("week", "game", 100)), 6)
+        self.assertFalse(OutboxTask.objects.exists())
+
+    def test_local_workers_run_after_commit(self):
+        with override_settings(GAME_RENTAL={"OUTBOX_LOCAL_WORKERS": 1}):
+            checkout(self.owner, self.games[0])
+            # Pula jednowątkowa - kolejne zadanie kończy się po poprzednim
+            outbox.local_pool().submit(lambda: None).result()
+        self.assertFalse(OutboxTask.objects.exists())
+        self.assertEqual(LeaderboardScore.objects.filter(dimension="game", key=str(self.games[0].pk)).count(), 3)
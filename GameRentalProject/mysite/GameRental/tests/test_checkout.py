@@ -0,0 +1,441 @@
+import threading
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from ..cache import clear_caches
+from ..inventory import rebuild_inventory
+from ..models import User as CustomUser, Game, Rental, MonthlyRentalSummary, Reservation
+from ..reservations import cancel
+from ..services import GameUnavailable, checkout
+
+
+# Test współbieżnych wypożyczeń tego samego egzemplarza na plikowej bazie SQLite
+class ConcurrentCheckoutTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        clear_caches()
+        self.assertNotIn("memory", str(connection.settings_dict["NAME"]))
+        self.users = [
+            CustomUser.objects.create(username=f"user{n}", email=f"user{n}@example.com", password="secret")
+            for n in range(self.threads)
+        ]
+        self.game = Game.objects.create(title="Test Game", genre="Action", platform="PC", release_date="2020-01-01")
+
+    def run_concurrently(self, target):
+        barrier = threading.Barrier(self.threads)
+        results = [None] * self.threads
+
+        def worker(n):
+            try:
+                barrier.wait()
+                results[n] = target(n)
+            except Exception as exc:
+                results[n] = exc
+            finally:
+                close_old_connections()
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_only_one_checkout_wins(self):
+        results = self.run_concurrently(lambda n: checkout(self.users[n], self.game.pk))
+
+        rentals = [r for r in results if isinstance(r, Rental)]
+        conflicts = [r for r in results if isinstance(r, GameUnavailable)]
+        self.assertEqual(len(rentals), 1, results)
+        self.assertEqual(len(conflicts), self.threads - 1, results)
+        self.assertEqual(Rental.objects.filter(game=self.game).count(), 1)
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.rented_count, self.game.available_count), (1, 0))
+
+    def test_concurrent_api_checkouts(self):
+        tokens = []
+        for custom_user in self.users:
+            auth_user = User.objects.create_user(username=custom_user.username, password="secret")
+            tokens.append(Token.objects.create(user=auth_user).key)
+
+        def post(n):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {tokens[n]}")
+            return client.post(reverse("rental-list"), {"user": self.users[n].pk, "game": self.game.pk}).status_code
+
+        codes = self.run_concurrently(post)
+        self.assertEqual(sorted(codes), [status.HTTP_201_CREATED] + [status.HTTP_409_CONFLICT] * (self.threads - 1))
+
+    def test_return_makes_game_available_again(self):
+        rental = checkout(self.users[0], self.game.pk)
+        with self.assertRaises(GameUnavailable):
+            checkout(self.users[1], self.game.pk)
+
+        rental.status = "zwrócona"
+        rental.save()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.rented_count, self.game.available_count), (0, 1))
+        self.assertIsNotNone(rental.return_date)
+        self.assertEqual(checkout(self.users[1], self.game.pk).game_id, self.game.pk)
+
+
+# Testy masowych zwrotów i wypożyczeń
+class BulkRentalTests(APITestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.admin = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        self.users = [
+            CustomUser.objects.create(username=f"user{n}", email=f"user{n}@example.com", password="secret")
+            for n in range(3)
+        ]
+        self.games = []
+
+    def add_games(self, count):
+        games = [
+            Game.objects.create(title=f"Game {n}", genre="Action", platform="PC", release_date="2020-01-01")
+            for n in range(len(self.games), len(self.games) + count)
+        ]
+        self.games.extend(games)
+        return games
+
+    def checkout_items(self, games):
+        return [{"user": self.users[n % 3].pk, "game": game.pk} for n, game in enumerate(games)]
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), data, format="json")
+
+    def test_bulk_checkout_results_and_rollup(self):
+        games = self.add_games(3)
+        items = self.checkout_items(games) + [{"user": self.users[0].pk, "game": games[0].pk},
+                                              {"user": 999, "game": games[1].pk}]
+        response = self.post("rental-bulk-checkout", {"items": items})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["status"] for r in response.data["results"]],
+                         ["created", "created", "created", "unavailable", "not_found"])
+        self.assertEqual(Rental.objects.count(), 3)
+        self.assertFalse(Game.available.exists())
+        self.assertEqual(sum(MonthlyRentalSummary.objects.values_list("total", flat=True)), 3)
+
+        again = self.post("rental-bulk-checkout", {"items": self.checkout_items(games[:1])})
+        self.assertEqual(again.data["results"][0]["status"], "unavailable")
+
+    def test_bulk_return_results(self):
+        games = self.add_games(3)
+        created = self.post("rental-bulk-checkout", {"items": self.checkout_items(games)}).data["results"]
+        rental_ids = [r["rental"] for r in created]
+
+        response = self.post("rental-bulk-return", {
+            "ids": rental_ids[:2] + [999],
+            "items": [{"user": self.users[2].pk, "game": games[2].pk}, {"user": self.users[0].pk, "game": games[2].pk}],
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["status"] for r in response.data["results"]],
+                         ["returned", "returned", "not_found", "returned", "not_found"])
+        self.assertEqual(Rental.objects.filter(status="zwrócona", return_date__isnull=False).count(), 3)
+        self.assertEqual(Game.available.count(), 3)
+
+        again = self.post("rental-bulk-return", {"ids": rental_ids[:1]})
+        self.assertEqual(again.data["results"][0]["status"], "already_returned")
+
+    def count_queries(self, name, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(name, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_batches_cost_constant_queries(self):
+        self.post("rental-list", {})  # rozgrzanie cache tokenu
+        small, large = self.add_games(5), self.add_games(50)
+        checkout_small = self.count_queries("rental-bulk-checkout", {"items": self.checkout_items(small)})
+        checkout_large = self.count_queries("rental-bulk-checkout", {"items": self.checkout_items(large)})
+        self.assertEqual(checkout_small, checkout_large)
+
+        ids = list(Rental.objects.order_by("id").values_list("id", flat=True))
+        return_small = self.count_queries("rental-bulk-return", {"ids": ids[:5]})
+        return_large = self.count_queries("rental-bulk-return", {"ids": ids[5:]})
+        self.assertEqual(return_small, return_large)
+
+    def test_non_staff_limited_to_own_rentals(self):
+        games = self.add_games(2)
+        created = self.post("rental-bulk-checkout", {"items": self.checkout_items(games)}).data["results"]
+
+        owner = User.objects.create_user(username="user0", password="secret")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=owner).key}")
+        response = self.post("rental-bulk-return", {"ids": [r["rental"] for r in created]})
+        self.assertEqual([r["status"] for r in response.data["results"]], ["returned", "not_found"])
+
+        response = self.post("rental-bulk-checkout", {"items": self.checkout_items(games)})
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "forbidden"])
+
+    def test_batch_size_is_limited(self):
+        with override_settings(GAME_RENTAL={"BULK_MAX_ITEMS": 2}):
+            response = self.post("rental-bulk-return", {"ids": [1, 2, 3]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Testy liczników egzemplarzy gier
+class InventoryTests(APITestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.admin = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        self.users = [
+            CustomUser.objects.create(username=f"user{n}", email=f"user{n}@example.com", password="secret")
+            for n in range(3)
+        ]
+        self.game = Game.objects.create(title="Wiedźmin", genre="RPG", platform="PC", release_date="2015-05-19",
+                                        total_copies=2)
+
+    def counts(self):
+        self.game.refresh_from_db()
+        return self.game.total_copies, self.game.rented_count, self.game.available_count
+
+    def test_copies_are_rented_until_none_left(self):
+        first = checkout(self.users[0], self.game.pk)
+        checkout(self.users[1], self.game.pk)
+        with self.assertRaises(GameUnavailable):
+            checkout(self.users[2], self.game.pk)
+        self.assertEqual(self.counts(), (2, 2, 0))
+        self.assertFalse(Game.available.filter(pk=self.game.pk).exists())
+
+        first.status = "zwrócona"
+        first.save()
+        self.assertEqual(self.counts(), (2, 1, 1))
+        self.assertTrue(Game.available.filter(pk=self.game.pk).exists())
+
+        # Usunięcie aktywnego wypożyczenia też zwalnia egzemplarz
+        checkout(self.users[2], self.game.pk).delete()
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+    def test_bulk_checkout_takes_several_copies(self):
+        items = [{"user": user.pk, "game": self.game.pk} for user in self.users]
+        response = self.client.post(reverse("rental-bulk-checkout"), {"items": items}, format="json")
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "created", "unavailable"])
+        self.assertEqual(self.counts(), (2, 2, 0))
+
+        response = self.client.post(reverse("rental-bulk-return"), {"items": items[:2]}, format="json")
+        self.assertEqual([r["status"] for r in response.data["results"]], ["returned", "returned"])
+        self.assertEqual(self.counts(), (2, 0, 2))
+
+    def test_resizing_keeps_rented_copies(self):
+        checkout(self.users[0], self.game.pk)
+        url = reverse("game-detail", args=[self.game.pk])
+
+        response = self.client.patch(url, {"total_copies": 5}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["available_count"], response.data["is_available"]), (4, True))
+        self.assertEqual(self.counts(), (5, 1, 4))
+
+        response = self.client.patch(url, {"total_copies": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {"total_copies": 1, "rented_count": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(), (1, 1, 0))
+
+        # Zapis całego obiektu nie nadpisuje liczników wczytanych wcześniej
+        stale = Game.objects.get(pk=self.game.pk)
+        Rental.objects.get(game=self.game).delete()
+        stale.title = "Wiedźmin 3"
+        stale.save()
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+    def test_new_rental_through_api_is_always_active(self):
+        response = self.client.post(reverse("rental-list"), {
+            "user": self.users[0].pk, "game": self.game.pk, "status": "zwrócona",
+            "return_date": "2030-01-01T00:00:00Z",
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["status"], response.data["return_date"]), ("wypożyczona", None))
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+    def test_changing_game_moves_the_copy(self):
+        other = Game.objects.create(title="Gothic", genre="RPG", platform="PC", release_date="2001-03-15")
+        rental = checkout(self.users[0], self.game.pk)
+        url = reverse("rental-detail", args=[rental.pk])
+
+        response = self.client.patch(url, {"game": other.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other.refresh_from_db()
+        self.assertEqual(self.counts(), (2, 0, 2))
+        self.assertEqual((other.rented_count, other.available_count), (1, 0))
+
+        # Bez wolnego egzemplarza nowej gry zmiana jest odrzucana
+        checkout(self.users[1], self.game.pk)
+        checkout(self.users[2], self.game.pk)
+        response = self.client.patch(url, {"game": self.game.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Rental.objects.get(pk=rental.pk).game_id, other.pk)
+
+        response = self.client.patch(url, {"status": "zwrócona"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other.refresh_from_db()
+        self.assertEqual((other.rented_count, other.available_count), (0, 1))
+
+    def test_reopening_returned_rental_takes_a_copy(self):
+        rental = checkout(self.users[0], self.game.pk)
+        url = reverse("rental-detail", args=[rental.pk])
+        self.client.patch(url, {"status": "zwrócona"}, format="json")
+        self.assertEqual(self.counts(), (2, 0, 2))
+
+        response = self.client.patch(url, {"status": "wypożyczona"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["return_date"])
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+        self.client.patch(url, {"status": "zwrócona"}, format="json")
+        checkout(self.users[1], self.game.pk)
+        checkout(self.users[2], self.game.pk)
+        response = self.client.patch(url, {"status": "wypożyczona"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Rental.objects.get(pk=rental.pk).status, "zwrócona")
+        self.assertEqual(self.counts(), (2, 2, 0))
+
+    def test_availability_uses_partial_index(self):
+        plan = Game.available.filter(pk__gte=0).values_list("id", flat=True).explain()
+        self.assertIn("game_available_idx", plan)
+
+    def test_rebuild_counts_active_rentals(self):
+        # Wypożyczenia zapisane z pominięciem checkout - np. ładowane ze zrzutu
+        for user in self.users:
+            Rental.objects.create(user=user, game=self.game)
+        rebuild_inventory()
+        self.assertEqual(self.counts(), (3, 3, 0))
+
+
+# Testy kolejki rezerwacji
+class ReservationTests(APITestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.admin = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+        self.users = [
+            CustomUser.objects.create(username=f"user{n}", email=f"user{n}@example.com", password="secret")
+            for n in range(4)
+        ]
+        self.game = Game.objects.create(title="Wiedźmin", genre="RPG", platform="PC", release_date="2015-05-19")
+        self.rental = checkout(self.users[0], self.game.pk)
+
+    def reserve(self, user):
+        response = self.client.post(reverse("reservation-list"), {"user": user.pk, "game": self.game.pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data
+
+    def reservation(self, data):
+        return self.client.get(reverse("reservation-detail", args=[data["id"]])).data
+
+    def counts(self):
+        self.game.refresh_from_db()
+        return self.game.rented_count, self.game.reserved_count, self.game.available_count
+
+    def return_rental(self):
+        self.rental.status = "zwrócona"
+        self.rental.save()
+
+    def test_return_holds_copy_for_head_of_queue(self):
+        first, second = self.reserve(self.users[1]), self.reserve(self.users[2])
+        self.assertEqual((first["status"], first["position"], second["position"]), ("oczekuje", 1, 2))
+        duplicate = self.client.post(reverse("reservation-list"), {"user": self.users[1].pk, "game": self.game.pk})
+        self.assertEqual(duplicate.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.return_rental()
+        first, second = self.reservation(first), self.reservation(second)
+        self.assertEqual((first["status"], first["position"]), ("odłożona", None))
+        self.assertIsNotNone(first["held_until"])
+        self.assertEqual(second["position"], 1)
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+        # Odłożony egzemplarz wypożyczy tylko właściciel rezerwacji
+        with self.assertRaises(GameUnavailable):
+            checkout(self.users[2], self.game.pk)
+        checkout(self.users[1], self.game.pk)
+        self.assertEqual(self.reservation(first)["status"], "zrealizowana")
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_bulk_checkout_claims_held_copy(self):
+        first = self.reserve(self.users[1])
+        self.return_rental()
+        items = [{"user": self.users[2].pk, "game": self.game.pk}, {"user": self.users[1].pk, "game": self.game.pk},
+                 {"user": self.users[1].pk, "game": self.game.pk + 100}]
+        response = self.client.post(reverse("rental-bulk-checkout"), {"items": items}, format="json")
+        self.assertEqual([r["status"] for r in response.data["results"]],
+                         ["unavailable", "created", "game_not_found"])
+        self.assertEqual(self.reservation(first)["status"], "zrealizowana")
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_expired_and_cancelled_holds_pass_to_next(self):
+        first, second, third = (self.reserve(user) for user in self.users[1:])
+        with override_settings(GAME_RENTAL={"RESERVATION_HOLD_TTL": 0}):
+            self.return_rental()
+        self.assertEqual(self.reservation(first)["status"], "odłożona")
+
+        out = StringIO()
+        call_command("expire_reservations", stdout=out)
+        self.assertIn("Wygaszono 1", out.getvalue())
+        self.assertEqual(self.reservation(first)["status"], "wygasła")
+        self.assertEqual(self.reservation(second)["status"], "odłożona")
+
+        response = self.client.delete(reverse("reservation-detail", args=[second["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.reservation(second)["status"], "anulowana")
+        self.assertEqual(self.reservation(third)["status"], "odłożona")
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+    def test_available_copy_is_held_at_once(self):
+        self.return_rental()
+        self.assertEqual(self.reserve(self.users[1])["status"], "odłożona")
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+        # Nowy egzemplarz przekazuje oczekującym polecenie expire_reservations
+        waiting = self.reserve(self.users[2])
+        self.game.total_copies = 2
+        self.game.save()
+        call_command("expire_reservations", stdout=StringIO())
+        self.assertEqual(self.reservation(waiting)["status"], "odłożona")
+        self.assertEqual(self.counts(), (0, 2, 0))
+
+    def test_cancel_uses_status_from_database(self):
+        first, second = self.reserve(self.users[1]), self.reserve(self.users[2])
+        stale = Reservation.objects.get(pk=first["id"])
+        self.return_rental()
+        self.assertEqual(stale.status, "oczekuje")
+
+        self.assertTrue(cancel(stale))
+        self.assertEqual(self.reservation(first)["status"], "anulowana")
+        self.assertEqual(self.reservation(second)["status"], "odłożona")
+        self.assertEqual(self.counts(), (0, 1, 0))
+        self.assertFalse(cancel(stale))
+
+    def test_hand_over_reads_only_head_of_queue(self):
+        for user in self.users[1:]:
+            self.reserve(user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.return_rental()
+        queue_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "Reservation"' in q["sql"]]
+        self.assertFalse(any("ROW_NUMBER" in sql for sql in queue_queries))
+        self.assertTrue(any("LIMIT 1" in sql for sql in queue_queries))
+        self.assertEqual(Reservation.objects.filter(status="odłożona").get().user_id, self.users[1].pk)
+
+    def test_users_see_only_own_reservations(self):
+        own, other = (self.reserve(user) for user in self.users[1:3])
+        owner = User.objects.create_user(username="user1", password="secret")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=owner).key}")
+
+        response = self.client.get(reverse("reservation-list"))
+        self.assertEqual([(r["id"], r["position"]) for r in response.data["results"]], [(own["id"], 1)])
+        response = self.client.delete(reverse("reservation-detail", args=[other["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from rest_framework.throttling import BaseThrottle
+
+from .cache import LRUCache
+from .conf import app_setting
+
+
+# Kubełek żetonów w pamięci procesu: klucz ma najwyżej `capacity` żetonów, przybywa ich
+# `rate` na sekundę, każda próba zabiera jeden. Stan to dwie liczby na klucz - bez zapytań
+# do bazy ani cache Django. Limit jest osobny w każdym procesie serwera.
+class TokenBucket:
+    def __init__(self, capacity, rate, maxsize=10000, timer=time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self.timer = timer
+        self._buckets = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        # Wynik - 0, gdy żeton był, w przeciwnym razie liczba sekund do następnego żetonu
+        now = self.timer()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets.set(key, (tokens, now))
+                return (1 - tokens) / self.rate
+            self._buckets.set(key, (tokens - 1, now))
+            return 0
+
+    def clear(self):
+        self._buckets.clear()
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(scope):
+    # Kubełek odtwarzany po zmianie limitu w ustawieniach
+    capacity, per_minute = app_setting('LOGIN_RATE_LIMITS')[scope]
+    with _buckets_lock:
+        current = _buckets.get(scope)
+        if current is None or (current.capacity, current.rate) != (capacity, per_minute / 60):
+            current = _buckets[scope] = TokenBucket(
+                capacity, per_minute / 60, maxsize=app_setting('LOGIN_RATE_CACHE_SIZE'),
+            )
+        return current
+
+
+# Limit prób logowania - osobno dla adresu IP i dla nazwy użytkownika, sprawdzany
+# przed kosztownym sprawdzeniem hasła
+class LoginRateThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        self.wait_time = bucket('ip').consume(self.get_ident(request))
+        if not self.wait_time:
+            username = str(request.data.get('username', '')).lower()
+            self.wait_time = bucket('username').consume(username)
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import (MonthlyOrdersSummaryView, RegisterUser, UserRentals, GamesByTitle,
-                    UserViewSet, GameViewSet, RentalViewSet, ReviewViewSet, PaymentViewSet, LoginUser)
+from .views import (LeaderboardView, MetricsView, MonthlyOrdersSummaryView, RegisterUser, UserRentals, GamesByTitle,
+                    GameSearch, UserViewSet, GameViewSet, RentalViewSet, ReviewViewSet, PaymentViewSet,
+                    ReservationViewSet, LoginUser)
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -9,6 +10,7 @@ router.register(r'games', GameViewSet, basename='game')
 router.register(r'rentals', RentalViewSet, basename='rental')
 router.register(r'reviews', ReviewViewSet, basename='review')
 router.register(r'payments', PaymentViewSet, basename='payment')
+router.register(r'reservations', ReservationViewSet, basename='reservation')
 
 urlpatterns = [
     path('monthly-orders-summary/', MonthlyOrdersSummaryView.as_view(), name='monthly-orders-summary'),
@@ -16,5 +18,8 @@ urlpatterns = [
     path('login/', LoginUser.as_view(), name='login'),
     path('user-rentals/<int:user_id>/', UserRentals.as_view(), name='user-rentals'),
     path('games-by-title/<str:letter>/', GamesByTitle.as_view(), name='games-by-title'),
+    path('games-search/', GameSearch.as_view(), name='games-search'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
 ]
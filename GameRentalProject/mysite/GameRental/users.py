@@ -0,0 +1,67 @@
+from django.db.models import OuterRef, Subquery
+
+from .cache import LRUCache
+from .conf import app_setting
+from .models import User
+
+
+# Powiązanie użytkownika django.contrib.auth z użytkownikiem wypożyczalni (GameRental.User).
+# Cache procesu trzyma rozwiązane obiekty po kluczu auth_user.pk przez DOMAIN_USER_CACHE_TTL
+# sekund, a wynik jest dodatkowo zapamiętywany na obiekcie żądania.
+_domain_users = LRUCache(maxsize=app_setting('DOMAIN_USER_CACHE_SIZE'), ttl=app_setting('DOMAIN_USER_CACHE_TTL'))
+_MISSING = object()
+
+
+def get_domain_user(request):
+    domain_user = getattr(request, '_domain_user', _MISSING)
+    if domain_user is _MISSING:
+        domain_user = resolve_domain_user(request.user)
+        request._domain_user = domain_user
+    return domain_user
+
+
+def resolve_domain_user(auth_user):
+    if auth_user is None or not auth_user.is_authenticated:
+        return None
+
+    domain_user = _domain_users.get(auth_user.pk)
+    if domain_user is not None:
+        return domain_user
+
+    domain_user = User.objects.filter(auth_user_id=auth_user.pk).first()
+    if domain_user is None:
+        # Konta sprzed powiązania - dopasowanie po nazwie i uzupełnienie klucza
+        domain_user = User.objects.filter(username=auth_user.username, auth_user__isnull=True).first()
+        if domain_user is None:
+            return None
+        User.objects.filter(pk=domain_user.pk).update(auth_user=auth_user.pk)
+        domain_user.auth_user_id = auth_user.pk
+
+    _domain_users.set(auth_user.pk, domain_user)
+    return domain_user
+
+
+def link_auth_users(using='default'):
+    # Powiązanie kont po nazwie użytkownika dla wierszy bez auth_user (np. po imporcie danych)
+    from django.contrib.auth import get_user_model
+
+    auth_users = get_user_model().objects.filter(username=OuterRef('username'), game_rental_user__isnull=True)
+    return User.objects.using(using).filter(auth_user__isnull=True).update(
+        auth_user=Subquery(auth_users.values('pk')[:1]),
+    )
+
+
+def forget_domain_user(domain_user):
+    _domain_users.discard_if(lambda cached: cached.pk == domain_user.pk)
+
+
+def forget_auth_user(auth_user):
+    _domain_users.discard(auth_user.pk)
+
+
+def domain_user_cache_stats():
+    return _domain_users.stats()
+
+
+def clear_domain_user_cache():
+    _domain_users.clear()
@@ -0,0 +1,64 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TableVersion
+
+
+GAME_CATALOG = 'game'
+
+
+# Wersja pojedynczej gry - podbijana przez zmiany liczników (egzemplarze), bez podbijania
+# wersji całego katalogu
+def game_version(game_id):
+    return f'{GAME_CATALOG}:{game_id}'
+
+
+# Bez using - odczyt z tej samej bazy co dane katalogu (routers.ReplicaRouter)
+def get_version(name, using=None):
+    row = TableVersion.objects.db_manager(using).filter(name=name).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+async def aget_version(name, using=None):
+    row = await TableVersion.objects.db_manager(using).filter(name=name).values_list('version', 'updated_at').afirst()
+    return row or (0, None)
+
+
+def get_versions(names, using=None):
+    return {
+        name: (version, updated_at) for name, version, updated_at
+        in TableVersion.objects.db_manager(using).filter(name__in=names).values_list('name', 'version', 'updated_at')
+    }
+
+
+async def aget_versions(names, using=None):
+    rows = TableVersion.objects.db_manager(using).filter(name__in=names).values_list('name', 'version', 'updated_at')
+    return {name: (version, updated_at) async for name, version, updated_at in rows}
+
+
+def bump_version(name, using='default'):
+    now = timezone.now()
+    rows = TableVersion.objects.using(using).filter(name=name)
+    if rows.update(version=F('version') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic(using=using):
+            TableVersion.objects.using(using).create(name=name, version=1, updated_at=now)
+    except IntegrityError:
+        rows.update(version=F('version') + 1, updated_at=now)
+
+
+def bump_versions(names, using='default'):
+    # Brakujące wiersze wstawiane z wersją 0 - równoległe wstawienia się nie dublują,
+    # a jedno UPDATE podbija wszystkie wersje
+    names = set(names)
+    if not names:
+        return
+    rows = TableVersion.objects.using(using).filter(name__in=names)
+    missing = names.difference(rows.values_list('name', flat=True))
+    if missing:
+        TableVersion.objects.using(using).bulk_create(
+            [TableVersion(name=name, version=0) for name in missing], ignore_conflicts=True,
+        )
+    rows.update(version=F('version') + 1, updated_at=timezone.now())
@@ -1,17 +1,36 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User as AuthUser
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.decorators import action
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
+from rest_framework import mixins
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
-from .models import User, Game, Rental, Review, Payment
-from .serializers import UserSerializer, GameSerializer, RentalSerializer, ReviewSerializer, PaymentSerializer
+from rest_framework.exceptions import Throttled
+from rest_framework.utils.urls import replace_query_param
+from .models import User, Game, Rental, Review, Payment, MonthlyRentalSummary, Reservation
+from .serializers import (UserSerializer, GameSerializer, RentalSerializer, ReviewSerializer, PaymentSerializer,
+                          ReservationSerializer, BulkReturnSerializer, BulkCheckoutSerializer)
+from . import leaderboard, reservations, services
+from .conf import app_setting
 from .permissions import IsAdminOrOwner, IsOwnerOrReadOnly
+from .authentication import CachedTokenAuthentication
+from .passwords import hash_password
+from .throttling import LoginRateThrottle
+from .users import get_domain_user
+from .filters import RentDateRangeFilter, StableOrderingFilter, filter_rent_date
+from .search import games_with_prefix, search_games
+from .metrics import registry
+from .mixins import (CatalogCacheMixin, CatalogCachedViewSetMixin, FastListMixin, SparseFieldsMixin,
+                     StreamingExportMixin, row_serializer)
+from .pagination import (UserPagination, GamePagination, RentalPagination, ReviewPagination, PaymentPagination,
+                         ReservationPagination)
 from datetime import datetime
-from django.db.models import Count
+from django.db.models import Sum
 
 
 # Rejestracja użytkownika
@@ -20,15 +39,21 @@ class RegisterUser(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        serializer = UserSerializer(data=request.data)
+        # Hasło haszowane raz (poza transakcją) - ten sam skrót trafia do obu tabel użytkowników
+        serializer = UserSerializer(data=request.data, context={'password_hashed': True})
         if serializer.is_valid():
-            game_rental_user = serializer.save()
-
-            auth_user = AuthUser.objects.create_user(
-                username=game_rental_user.username,
-                email=game_rental_user.email,
-                password=request.data.get('password')
-            )
+            password = hash_password(serializer.validated_data['password'])
+            try:
+                with transaction.atomic():
+                    auth_user = AuthUser(
+                        username=AuthUser.normalize_username(serializer.validated_data['username']),
+                        email=AuthUser.objects.normalize_email(serializer.validated_data['email']),
+                        password=password,
+                    )
+                    auth_user.save()
+                    serializer.save(password=password, auth_user=auth_user)
+            except IntegrityError:
+                return Response({"error": "Nazwa użytkownika jest już zajęta."}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response({"message": "Użytkownik zarejestrowany pomyślnie!"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -37,20 +62,41 @@ class RegisterUser(APIView):
 class LoginUser(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
-        user = authenticate(username=request.data['username'], password=request.data['password'])
+        username, password = request.data.get('username'), request.data.get('password')
+        if not username or password is None:
+            return Response({"error": "Podaj nazwę użytkownika i hasło."}, status=status.HTTP_400_BAD_REQUEST)
+        user = authenticate(request, username=username, password=password)
         if user is not None:
+            # rotate=true unieważnia dotychczasowy token i wydaje nowy
+            if str(request.data.get('rotate', '')).lower() in ('1', 'true'):
+                Token.objects.filter(user=user).delete()
             token, created = Token.objects.get_or_create(user=user)
             return Response({"token": token.key, "user": user.username}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Nieprawidłowe dane uwierzytelniania"}, status=status.HTTP_401_UNAUTHORIZED)
 
+    def throttled(self, request, wait):
+        raise Throttled(wait, detail="Zbyt wiele prób logowania, spróbuj ponownie później.")
+
+
+# Metryki żądań w formacie Prometheusa
+class MetricsView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 # Zestawienie miesięczne zamówień
 class MonthlyOrdersSummaryView(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
+    # Raport - z repliki także zaraz po zapisie klienta
+    read_replica = True
 
     def get(self, request):
         month = request.query_params.get('month', datetime.now().month)
@@ -64,82 +110,219 @@ class MonthlyOrdersSummaryView(APIView):
         except ValueError:
             return Response({"error": "Nieprawidłowe parametry miesiąca lub roku."}, status=status.HTTP_400_BAD_REQUEST)
 
-        rentals = Rental.objects.filter(
-            rent_date__year=year, rent_date__month=month
-        ).values('game__title').annotate(total=Count('id'))
+        # Odczyt z zestawienia utrzymywanego przy zapisie wypożyczeń - O(gier), nie O(wypożyczeń)
+        rentals = MonthlyRentalSummary.objects.filter(
+            year=year, month=month, total__gt=0
+        ).values('game__title').annotate(total_rentals=Sum('total'))
 
-        summary = [{"title": r['game__title'], "total_rentals": r['total']} for r in rentals]
+        summary = [{"title": r['game__title'], "total_rentals": r['total_rentals']} for r in rentals]
         return Response(summary, status=status.HTTP_200_OK)
 
 
+# Ranking wypożyczeń (popularne w oknie czasowym / na czasie) dla gier, gatunków i platform
+class LeaderboardView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    read_replica = True
+    default_window = 'week'
+    default_limit = 10
+
+    def get(self, request):
+        window = request.query_params.get('window', self.default_window)
+        dimension = request.query_params.get('dimension', 'game')
+        if window not in leaderboard.windows():
+            return Response({"error": f"Nieznane okno. Dostępne: {', '.join(leaderboard.windows())}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if dimension not in leaderboard.DIMENSIONS:
+            return Response({"error": f"Nieznany wymiar. Dostępne: {', '.join(leaderboard.DIMENSIONS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+            if not (1 <= limit <= app_setting('LEADERBOARD_CACHE_SIZE')):
+                raise ValueError(limit)
+        except ValueError:
+            return Response({"error": "Nieprawidłowy limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = leaderboard.top(window, dimension, limit)
+        if dimension == 'game':
+            titles = dict(Game.objects.filter(pk__in=[int(key) for key, _ in entries]).values_list('pk', 'title'))
+            entries = [(int(key), score) for key, score in entries if int(key) in titles]
+        results = [{"rank": rank, dimension: key, "score": round(score, 4)}
+                   for rank, (key, score) in enumerate(entries, start=1)]
+        if dimension == 'game':
+            for result in results:
+                result["title"] = titles[result["game"]]
+        return Response({
+            "window": window,
+            "half_life_hours": leaderboard.windows()[window],
+            "dimension": dimension,
+            "results": results,
+        })
+
+
 # User CRUD
-class UserViewSet(ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+class UserViewSet(SparseFieldsMixin, ModelViewSet):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = UserPagination
 
 # Lista gier zaczynająca się na określoną literę
-class GamesByTitle(APIView):
-    authentication_classes = [TokenAuthentication]
+class GamesByTitle(CatalogCacheMixin, APIView):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, letter):
-        games = Game.objects.filter(title__istartswith=letter)
-        if not games.exists():
+        return self.catalog_response(request, lambda: self.games_by_title(letter))
+
+    def games_by_title(self, letter):
+        games = list(games_with_prefix(letter))
+        if not games:
             return Response({"message": "Brak gier zaczynających się na podaną literę."}, status=status.HTTP_404_NOT_FOUND)
         serializer = GameSerializer(games, many=True)
         return Response(serializer.data)
 
+# Wyszukiwanie pełnotekstowe gier po tytule, gatunku i platformie
+class GameSearch(CatalogCacheMixin, APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', self.page_size)), self.max_page_size)
+            offset = int(request.query_params.get('offset', 0))
+            if limit < 1 or offset < 0:
+                raise ValueError(limit, offset)
+        except ValueError:
+            return Response({"error": "Nieprawidłowe parametry stronicowania."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.catalog_response(request, lambda: self.search_page(request, query, limit, offset))
+
+    def search_page(self, request, query, limit, offset):
+        # Jeden wiersz ponad stronę mówi, czy istnieje następna strona, bez liczenia wszystkich trafień
+        games = search_games(query, limit + 1, offset)
+        url = request.build_absolute_uri()
+        return Response({
+            "next": replace_query_param(url, 'offset', offset + limit) if len(games) > limit else None,
+            "previous": replace_query_param(url, 'offset', max(offset - limit, 0)) if offset else None,
+            "results": GameSerializer(games[:limit], many=True).data,
+        })
+
 # Game CRUD
-class GameViewSet(ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+class GameViewSet(CatalogCachedViewSetMixin, FastListMixin, ModelViewSet):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    pagination_class = GamePagination
+    filter_backends = [StableOrderingFilter]
+    ordering_fields = ['average_rating', 'review_count', 'title', 'release_date', 'id']
 
 # Lista wypożyczeń użytkownika
 class UserRentals(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminOrOwner]
 
     def get(self, request, user_id):
-        rentals = Rental.objects.filter(user_id=user_id)
+        rentals = filter_rent_date(Rental.objects.filter(user_id=user_id), request.query_params)
+        rentals = rentals.order_by('-rent_date', '-id')
+        rows = row_serializer(RentalSerializer)
+        if rows is not None:
+            return Response(rows.data(rows.queryset(rentals)))
         serializer = RentalSerializer(rentals, many=True)
         return Response(serializer.data)
 
 # Rental CRUD
-class RentalViewSet(ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+class RentalViewSet(StreamingExportMixin, FastListMixin, ModelViewSet):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminOrOwner]
     queryset = Rental.objects.all()
     serializer_class = RentalSerializer
+    pagination_class = RentalPagination
+    filter_backends = [RentDateRangeFilter]
+    export_kind = 'rentals'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return Rental.objects.all()
-        return Rental.objects.filter(user=self.request.user)
+        return Rental.objects.filter(user=get_domain_user(self.request))
+
+    # Masowy zwrot - lista identyfikatorów wypożyczeń i/lub par użytkownik/gra
+    @action(detail=False, methods=['post'], url_path='bulk-return')
+    def bulk_return(self, request):
+        serializer = BulkReturnSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        owner = None if request.user.is_staff else get_domain_user(request)
+        results = services.bulk_return(
+            rental_ids=serializer.validated_data['ids'],
+            pairs=[(item['user'], item['game']) for item in serializer.validated_data['items']],
+            owner=owner,
+        )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    # Masowe wypożyczenie - lista par użytkownik/gra
+    @action(detail=False, methods=['post'], url_path='bulk-checkout')
+    def bulk_checkout(self, request):
+        serializer = BulkCheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        allowed_user = None if request.user.is_staff else get_domain_user(request)
+        results = services.bulk_checkout(
+            [(item['user'], item['game']) for item in serializer.validated_data['items']],
+            allowed_user=allowed_user,
+        )
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
 # Review CRUD
-class ReviewViewSet(ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+class ReviewViewSet(SparseFieldsMixin, ModelViewSet):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewPagination
 
     def perform_create(self, serializer):
-        custom_user = User.objects.get(username=self.request.user.username)
-        serializer.save(user=custom_user)
+        serializer.save(user=get_domain_user(self.request))
 
 # Payment CRUD
-class PaymentViewSet(ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+class PaymentViewSet(StreamingExportMixin, FastListMixin, ModelViewSet):
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminOrOwner]
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    pagination_class = PaymentPagination
+    export_kind = 'payments'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return Payment.objects.all()
-        custom_user = User.objects.get(username=self.request.user.username)
-        return Payment.objects.filter(user=custom_user)
\ No newline at end of file
+        return Payment.objects.filter(user=get_domain_user(self.request))
+# Kolejka rezerwacji niedostępnych gier - zamiast odpytywania katalogu klient sprawdza swoją
+# pozycję w kolejce (position) albo termin odbioru odłożonego egzemplarza (held_until)
+class ReservationViewSet(SparseFieldsMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                         mixins.ListModelMixin, mixins.DestroyModelMixin, GenericViewSet):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrOwner]
+    queryset = Reservation.objects.all()
+    serializer_class = ReservationSerializer
+    pagination_class = ReservationPagination
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            queryset = Reservation.objects.all()
+        else:
+            queryset = Reservation.objects.filter(user=get_domain_user(self.request))
+        return reservations.with_queue_position(queryset)
+
+    def perform_create(self, serializer):
+        if self.request.user.is_staff:
+            serializer.save()
+        else:
+            serializer.save(user=get_domain_user(self.request))
+
+    # Anulowanie - rezerwacja zostaje w historii, odłożony egzemplarz przechodzi na następnego w kolejce
+    def perform_destroy(self, instance):
+        reservations.cancel(instance)
@@ -0,0 +1,13 @@
+"""
+URL configuration used for requests served under ASGI.
+
+GameRental read routes go to async views first; everything else falls
+through to mysite.urls.
+"""
+from django.urls import include, path
+
+from . import urls
+
+urlpatterns = [
+    path("GameRental/", include("GameRental.async_urls")),
+] + urls.urlpatterns
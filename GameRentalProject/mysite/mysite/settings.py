@@ -10,22 +10,61 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+# Profil uruchomieniowy ze zmiennych środowiskowych: DJANGO_ENV=dev (domyślnie) lub prod.
+# Pojedyncze ustawienia można nadpisać zmiennymi DJANGO_* opisanymi niżej.
+def env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def env_list(name, default):
+    value = os.environ.get(name)
+    return default if value is None else [item.strip() for item in value.split(',') if item.strip()]
+
+
+PROFILE = env('DJANGO_ENV', 'dev')
+if PROFILE not in ('dev', 'prod'):
+    raise ImproperlyConfigured(f"Nieznany profil DJANGO_ENV={PROFILE!r} (dozwolone: dev, prod).")
+PRODUCTION = PROFILE == 'prod'
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-b24jlral(o77ha6wlqd3fadtvdfmp&kswgqi_%h#q$jat+8jy&'
+SECRET_KEY = env('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    if PRODUCTION:
+        raise ImproperlyConfigured("Profil prod wymaga zmiennej DJANGO_SECRET_KEY.")
+    SECRET_KEY = 'django-insecure-b24jlral(o77ha6wlqd3fadtvdfmp&kswgqi_%h#q$jat+8jy&'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool('DJANGO_DEBUG', not PRODUCTION)
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', [])
+
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = env_bool('DJANGO_SECURE_COOKIES', PRODUCTION)
 
-ALLOWED_HOSTS = []
+# Pasek debug_toolbar (i jego adresy) tylko w profilu dev
+DEBUG_TOOLBAR = env_bool('DJANGO_DEBUG_TOOLBAR', not PRODUCTION)
 
 
 # Application definition
@@ -38,31 +77,67 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'GameRental',
-    'debug_toolbar',
     'rest_framework',
     'rest_framework.authtoken',
 ]
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'GameRental.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Przeglądarkowe API DRF tylko w dev - w produkcji same odpowiedzi JSON
+    'DEFAULT_RENDERER_CLASSES': [
+        'GameRental.renderers.MeasuredJSONRenderer',
+    ] + ([] if PRODUCTION else ['rest_framework.renderers.BrowsableAPIRenderer']),
+    'DEFAULT_PAGINATION_CLASS': 'GameRental.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+GAME_RENTAL = {
+    # Pragmy SQLite ustawiane na każdym nowym połączeniu. WAL pozwala czytać w trakcie
+    # zapisu, a synchronous=NORMAL jest w trybie WAL bezpieczne dla pojedynczego serwera.
+    'SQLITE_PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': env_int('DJANGO_SQLITE_BUSY_TIMEOUT', 5000),
+        'cache_size': -20000,
+        'temp_store': 'memory',
+        'mmap_size': 134217728,
+    } if PRODUCTION or env_bool('DJANGO_SQLITE_WAL', False) else {},
+    # Pod ASGI trasy odczytu obsługują widoki asynchroniczne (GameRental.async_views)
+    'ASGI_URLCONF': 'mysite.asgi_urls',
+    # Zadania kolejki (ranking, powiadomienia o rezerwacjach) w dev wykonują wątki serwera zaraz
+    # po zapisie. W profilu prod domyślnie 0 - wymagany jest wtedy osobny proces
+    # `manage.py outbox_worker`, inaczej zadania czekają w tabeli OutboxTask.
+    'OUTBOX_LOCAL_WORKERS': env_int('DJANGO_OUTBOX_LOCAL_WORKERS', 0 if PRODUCTION else 2),
 }
 
+# Powiadomienia e-mail wysyłane przez kolejkę zadań; w profilu dev wypisywane na konsolę
+EMAIL_BACKEND = env('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend' if PRODUCTION
+                    else 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = env('DJANGO_DEFAULT_FROM_EMAIL', 'wypozyczalnia@localhost')
+
 MIDDLEWARE = [
+    'GameRental.middleware.MetricsMiddleware',
+    'GameRental.middleware.ASGIURLConfMiddleware',
+    'GameRental.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if DEBUG_TOOLBAR:
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.messages.middleware.MessageMiddleware'),
+                      'debug_toolbar.middleware.DebugToolbarMiddleware')
 
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -74,7 +149,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -82,6 +156,16 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # W produkcji szablony kompilowane raz na proces
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ] if PRODUCTION else [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
         },
     },
 ]
@@ -92,12 +176,72 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB_ENGINE=sqlite (domyślnie) lub postgresql. Połączenia są utrzymywane między
+# żądaniami przez DJANGO_CONN_MAX_AGE sekund i sprawdzane przed ponownym użyciem.
+DB_ENGINE = env('DJANGO_DB_ENGINE', 'sqlite')
+CONN_MAX_AGE = env_int('DJANGO_CONN_MAX_AGE', 60 if PRODUCTION else 0)
+CONN_HEALTH_CHECKS = env_bool('DJANGO_CONN_HEALTH_CHECKS', PRODUCTION)
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DJANGO_DB_NAME', 'gamerental'),
+            'USER': env('DJANGO_DB_USER', 'gamerental'),
+            'PASSWORD': env('DJANGO_DB_PASSWORD', ''),
+            'HOST': env('DJANGO_DB_HOST', 'localhost'),
+            'PORT': env('DJANGO_DB_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'connect_timeout': env_int('DJANGO_DB_CONNECT_TIMEOUT', 5),
+            },
+        }
     }
-}
+    if env('DJANGO_DB_REPLICA_HOST'):
+        DATABASES['replica'] = dict(
+            DATABASES['default'],
+            HOST=env('DJANGO_DB_REPLICA_HOST'),
+            PORT=env('DJANGO_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            TEST={'MIRROR': 'default'},
+        )
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                # czas oczekiwania na blokadę zapisu przy równoległych transakcjach
+                'timeout': 20,
+            },
+            'TEST': {
+                # plikowa baza testowa - testy współbieżności potrzebują osobnych połączeń wątków
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+    # Replika - drugi plik SQLite, kopia pliku bazy głównej (np. przez litestream)
+    if env('DJANGO_DB_REPLICA_NAME'):
+        DATABASES['replica'] = dict(
+            DATABASES['default'],
+            NAME=env('DJANGO_DB_REPLICA_NAME'),
+            TEST={'NAME': BASE_DIR / 'test_replica.sqlite3'},
+        )
+else:
+    raise ImproperlyConfigured(f"Nieobsługiwany DJANGO_DB_ENGINE={DB_ENGINE!r} (dozwolone: sqlite, postgresql).")
+
+# Odczyty z repliki (GameRental.routers) tylko przy wskazanej replice: DJANGO_DB_REPLICA_HOST
+# dla PostgreSQL lub DJANGO_DB_REPLICA_NAME dla SQLite
+DATABASE_ROUTERS = ['GameRental.routers.ReplicaRouter']
+if env('DJANGO_DB_REPLICA_HOST') or env('DJANGO_DB_REPLICA_NAME'):
+    GAME_RENTAL['REPLICA_DATABASE'] = 'replica'
+    GAME_RENTAL['REPLICA_LAG_TOLERANCE'] = env_int('DJANGO_DB_REPLICA_LAG_TOLERANCE', 5)
+
+
+# Sprawdzanie hasła przy logowaniu w puli procesów haszujących (GameRental.passwords)
+AUTHENTICATION_BACKENDS = ['GameRental.authentication.PooledModelBackend']
 
 
 # Password validation
@@ -0,0 +1,13 @@
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, DB_ENGINE, GAME_RENTAL
+
+# Ustawienia testów (manage.py test, pytest-django: DJANGO_SETTINGS_MODULE=mysite.test_settings).
+# Testy odczytów z repliki i ładowania danych do innej bazy potrzebują osobnej bazy repliki
+# z tym samym schematem; odczyty kierują do niej same testy przez override_settings.
+if 'replica' not in DATABASES or DATABASES['replica'].get('TEST', {}).get('MIRROR'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        TEST={'NAME': BASE_DIR / 'test_replica.sqlite3' if DB_ENGINE == 'sqlite'
+              else f"test_{DATABASES['default']['NAME']}_replica"},
+    )
+GAME_RENTAL.pop('REPLICA_DATABASE', None)